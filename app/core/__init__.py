@@ -3,6 +3,6 @@ Core modules for AI Research Paper Assistant
 """
 
 from .pdf_processor import PDFProcessor
-from .gemini_analyzer import GeminiAnalyzer
+from .gemini_analyzer import GeminiAnalyzer, get_shared_analyzer
 
-__all__ = ['PDFProcessor', 'GeminiAnalyzer']
\ No newline at end of file
+__all__ = ['PDFProcessor', 'GeminiAnalyzer', 'get_shared_analyzer']
\ No newline at end of file
@@ -0,0 +1,114 @@
+"""
+Async Bridge Module
+Shared background event loop that lets synchronous callers drive the async analyzer
+"""
+
+import asyncio
+import queue
+import threading
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator, Optional, TypeVar
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    Get the process-wide event loop, starting its thread on first use.
+
+    Every synchronous analyzer call in the process is scheduled on this one
+    loop, so hundreds of in-flight model calls share a single thread instead
+    of holding one thread each.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="gemini-event-loop", daemon=True).start()
+            logger.info("Started shared event loop for Gemini calls")
+        return _loop
+
+
+def run_sync(coroutine: Awaitable[T]) -> T:
+    """
+    Run a coroutine on the shared loop and block until it finishes.
+
+    If the calling thread is interrupted while waiting, the coroutine is
+    cancelled so its model calls and retries stop as well.
+
+    Args:
+        coroutine: Coroutine to run
+
+    Returns:
+        The coroutine's result (exceptions propagate to the caller)
+    """
+    loop = get_event_loop()
+    if _running_on(loop):
+        raise RuntimeError("run_sync cannot be called from the shared event loop; await the coroutine instead")
+    future = asyncio.run_coroutine_threadsafe(coroutine, loop)
+    try:
+        return future.result()
+    except BaseException:
+        future.cancel()
+        raise
+
+
+def iterate_sync(iterable: AsyncIterator[T]) -> Iterator[T]:
+    """
+    Consume an async iterator from synchronous code.
+
+    Items are handed over through a queue as the shared loop produces them.
+    Closing the returned generator early (for example when a Streamlit
+    script stops) cancels the async iterator.
+
+    Args:
+        iterable: Async iterator to drain
+
+    Yields:
+        Items in the order the async iterator produced them
+    """
+    loop = get_event_loop()
+    if _running_on(loop):
+        raise RuntimeError("iterate_sync cannot be called from the shared event loop; use async for instead")
+    items: "queue.Queue[Any]" = queue.Queue()
+    done = object()
+
+    async def pump() -> None:
+        try:
+            async for item in iterable:
+                items.put((True, item))
+        except BaseException as e:
+            items.put((False, e))
+            raise
+        finally:
+            items.put((True, done))
+
+    future = asyncio.run_coroutine_threadsafe(pump(), loop)
+    try:
+        while True:
+            ok, item = items.get()
+            if not ok:
+                raise item
+            if item is done:
+                return
+            yield item
+    finally:
+        future.cancel()
+
+
+def call_in_thread(function: Callable[..., T], *args: Any, **kwargs: Any) -> Awaitable[T]:
+    """Run a blocking function in the loop's default executor."""
+    return asyncio.get_running_loop().run_in_executor(None, lambda: function(*args, **kwargs))
+
+
+def _running_on(loop: asyncio.AbstractEventLoop) -> bool:
+    try:
+        return asyncio.get_running_loop() is loop
+    except RuntimeError:
+        return False
@@ -0,0 +1,92 @@
+"""
+Model Backends Module
+Pluggable sources of generative models used by the model registry
+"""
+
+import os
+import threading
+from typing import Any, Dict, List, Optional
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class ModelBackend:
+    """
+    Interface between the analyzer and whatever serves model responses.
+
+    Models returned by create_model must offer
+    ``generate_content(prompt, generation_config=None, stream=False)``
+    returning an object with ``.text`` (or an iterable of such chunks when
+    streaming) and an awaitable ``generate_content_async`` with the same
+    arguments (streams consumed with ``async for``), like
+    google.generativeai.GenerativeModel.
+    """
+
+    name = "base"
+    # Whether the analyzer must refuse to start without a real API key
+    requires_api_key = True
+    # Whether server-side context caching (GEMINI_CONTEXT_CACHE=gemini) is available
+    supports_context_cache = False
+
+    def configure(self, api_key: str) -> None:
+        """Authenticate the backend for an API key."""
+        raise NotImplementedError
+
+    def list_models(self) -> List[str]:
+        """List model names that support content generation."""
+        raise NotImplementedError
+
+    def create_model(self, model_name: str) -> Any:
+        """Create a model handle for a model name."""
+        raise NotImplementedError
+
+
+class GeminiBackend(ModelBackend):
+    """Google Gemini through the google.generativeai SDK."""
+
+    name = "gemini"
+    supports_context_cache = True
+
+    def configure(self, api_key: str) -> None:
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+
+    def list_models(self) -> List[str]:
+        import google.generativeai as genai
+        return [model.name for model in genai.list_models()
+                if 'generateContent' in model.supported_generation_methods]
+
+    def create_model(self, model_name: str) -> Any:
+        import google.generativeai as genai
+        return genai.GenerativeModel(model_name)
+
+
+_backends: Dict[str, ModelBackend] = {}
+_backends_lock = threading.Lock()
+
+def get_backend(name: Optional[str] = None) -> ModelBackend:
+    """
+    Get the shared backend instance.
+
+    Args:
+        name: 'gemini' or 'fake' (defaults to GEMINI_BACKEND)
+
+    Returns:
+        Backend instance, created on first use
+    """
+    name = (name or os.getenv('GEMINI_BACKEND', 'gemini')).lower()
+    with _backends_lock:
+        backend = _backends.get(name)
+        if backend is None:
+            if name == 'gemini':
+                backend = GeminiBackend()
+            elif name == 'fake':
+                from .fake_backend import FakeBackend
+                backend = FakeBackend()
+            else:
+                raise ValueError(f"Unknown GEMINI_BACKEND '{name}' (expected 'gemini' or 'fake')")
+            _backends[name] = backend
+            logger.info(f"Using model backend: {name}")
+        return backend
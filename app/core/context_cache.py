@@ -0,0 +1,198 @@
+"""
+Document Context Cache Module
+Uploads a document once per analysis run so section prompts only carry their instructions
+"""
+
+import datetime
+import hashlib
+import os
+import threading
+from typing import Any, Dict, Optional
+import logging
+
+from .rate_limiter import estimate_tokens
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class LocalCachedModel:
+    """
+    Offline stand-in for a model bound to server-side cached content.
+
+    It accepts instruction-only prompts like the real cached model and
+    expands them with the stored document before delegating to the wrapped
+    model, so the context-cache flow can be exercised without the caching API.
+    """
+
+    def __init__(self, model: Any, document: str):
+        """
+        Args:
+            model: Model that actually answers (the analyzer's regular model)
+            document: Document text held by the stand-in cache
+        """
+        self.model = model
+        self.document = document
+
+    def generate_content(self, prompt: str, **kwargs) -> Any:
+        """Answer an instruction-only prompt as if the document were cached server-side."""
+        return self.model.generate_content(self._expand(prompt), **kwargs)
+
+    async def generate_content_async(self, prompt: str, **kwargs) -> Any:
+        """Async variant of generate_content."""
+        return await self.model.generate_content_async(self._expand(prompt), **kwargs)
+
+    def _expand(self, prompt: str) -> str:
+        return f"{prompt}\n\nCACHED DOCUMENT:\n{self.document}"
+
+
+class DocumentContext:
+    """
+    A document uploaded once for an analysis run.
+
+    Prompts sent through ``model`` omit the document, and every prompt is
+    recorded together with the size the same request would have had with
+    the document embedded, so each run can report the tokens it saved. The
+    local stand-in still sends the document with every prompt, so it saves
+    nothing and only reports what the caching API would have saved.
+    """
+
+    def __init__(self, document: str, model: Any, mode: str, document_tokens: int,
+                 cached_content: Any = None, model_name: str = ''):
+        """
+        Args:
+            document: Cached document text
+            model: Model to send instruction-only prompts to
+            mode: 'gemini' for the caching API or 'local' for the stand-in
+            document_tokens: Tokens stored in the cache
+            cached_content: Remote CachedContent handle, deleted on close
+            model_name: Name of the model that answers prompts sent through model
+        """
+        self.document = document
+        self.model = model
+        self.model_name = model_name
+        self.mode = mode
+        self.document_tokens = document_tokens
+        self.cached_content = cached_content
+        # Content address of the document, used in response cache keys
+        self.key = hashlib.sha256(document.encode('utf-8')).hexdigest()
+
+        self._lock = threading.Lock()
+        self.prompts = 0
+        self.instruction_tokens = 0
+        self.baseline_tokens = 0
+
+    def record(self, prompt: str, baseline_prompt: str) -> None:
+        """
+        Account for one prompt sent against the cached document.
+
+        Args:
+            prompt: Instruction-only prompt actually sent
+            baseline_prompt: The prompt that would have been sent without the cache
+        """
+        with self._lock:
+            self.prompts += 1
+            self.instruction_tokens += estimate_tokens(prompt)
+            self.baseline_tokens += estimate_tokens(baseline_prompt)
+
+    def _tokens_sent(self) -> int:
+        if self.mode == 'local':
+            # LocalCachedModel appends the document to every prompt it forwards
+            return self.instruction_tokens + self.prompts * self.document_tokens
+        return self.document_tokens + self.instruction_tokens
+
+    def usage(self) -> Dict[str, Any]:
+        """
+        Get token accounting for the run so far.
+
+        Returns:
+            Dictionary with the cache mode, prompt count, document tokens, tokens
+            actually sent, tokens the same prompts would have sent with the
+            document embedded, and the difference ('tokens_saved'). In local
+            mode, 'projected_tokens_saved' holds what caching the document once
+            would have saved; nothing is saved by the stand-in itself.
+        """
+        with self._lock:
+            sent = self._tokens_sent()
+            usage = {
+                'mode': self.mode,
+                'prompts': self.prompts,
+                'document_tokens': self.document_tokens,
+                'tokens_sent': sent,
+                'tokens_without_cache': self.baseline_tokens,
+                'tokens_saved': self.baseline_tokens - sent
+            }
+            if self.mode == 'local':
+                usage['projected_tokens_saved'] = (self.baseline_tokens - self.document_tokens
+                                                   - self.instruction_tokens)
+            return usage
+
+    def close(self) -> None:
+        """Release the remote cache entry, if any."""
+        if self.cached_content is not None:
+            try:
+                self.cached_content.delete()
+            except Exception as e:
+                logger.warning(f"Could not delete cached context {self.cached_content.name}: {e}")
+            self.cached_content = None
+        logger.info(f"Context cache closed: {self.usage()}")
+
+
+def context_cache_mode() -> str:
+    """Get the configured context cache mode ('off', 'gemini' or 'local')."""
+    return os.getenv('GEMINI_CONTEXT_CACHE', 'off').lower()
+
+
+def open_document_context(model_name: str, model: Any, document: str,
+                          mode: Optional[str] = None) -> Optional[DocumentContext]:
+    """
+    Upload a document once for an analysis run.
+
+    Args:
+        model_name: Resolved model name the cache is created for
+        model: The analyzer's regular model (wrapped by the local stand-in)
+        document: Text to cache - the whole document for the caching API, or the
+            excerpt the local stand-in resends with every prompt
+        mode: 'gemini', 'local' or 'off' (defaults to GEMINI_CONTEXT_CACHE)
+
+    Returns:
+        DocumentContext, or None when caching is off, the document is below
+        GEMINI_CONTEXT_CACHE_MIN_TOKENS, or the caching API rejected it
+    """
+    if mode is None:
+        mode = context_cache_mode()
+    if mode not in ('gemini', 'local'):
+        return None
+
+    document_tokens = estimate_tokens(document)
+    if mode == 'local':
+        return DocumentContext(document, LocalCachedModel(model, document), mode, document_tokens,
+                               model_name=model_name)
+
+    # The caching API refuses contents below the model's minimum size
+    min_tokens = int(os.getenv('GEMINI_CONTEXT_CACHE_MIN_TOKENS', '4096'))
+    if document_tokens < min_tokens:
+        logger.info(f"Document too small for context caching ({document_tokens} < {min_tokens} tokens)")
+        return None
+
+    try:
+        import google.generativeai as genai
+        from google.generativeai import caching
+
+        cached_content = caching.CachedContent.create(
+            model=model_name,
+            display_name=f"document-{hashlib.sha256(document.encode('utf-8')).hexdigest()[:16]}",
+            system_instruction="The DOCUMENT to analyze is the cached content of this conversation.",
+            contents=[f"DOCUMENT:\n{document}"],
+            ttl=datetime.timedelta(seconds=int(os.getenv('GEMINI_CONTEXT_CACHE_TTL', '600')))
+        )
+        cached_model = genai.GenerativeModel.from_cached_content(cached_content=cached_content)
+        usage = getattr(cached_content, 'usage_metadata', None)
+        if usage is not None and getattr(usage, 'total_token_count', 0):
+            document_tokens = usage.total_token_count
+    except Exception as e:
+        logger.warning(f"Context caching unavailable, sending the document with every prompt: {str(e)[:200]}")
+        return None
+
+    logger.info(f"Cached document context {cached_content.name} ({document_tokens} tokens)")
+    return DocumentContext(document, cached_model, mode, document_tokens, cached_content, model_name)
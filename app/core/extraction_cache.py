@@ -0,0 +1,343 @@
+"""
+Extraction Cache Module
+Document model built by one extraction pass, and its persistent cache keyed by file content and extraction settings
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Headings that open the usual sections of academic documents, optionally numbered ("2.", "II.")
+_SECTION_HEADINGS = re.compile(
+    r'^[ \t]*(?:(?:\d+(?:\.\d+)*|[IVX]+)\.?[ \t]+)?'
+    r'(abstract|introduction|background|related work|materials and methods|methodology|methods?|'
+    r'results|findings|discussion|conclusions?|summary|acknowledge?ments|references|bibliography)'
+    r'[ \t]*(?:[:.\-][ \t]*|$)',
+    re.IGNORECASE | re.MULTILINE
+)
+_SECTION_NAMES = {
+    'related work': 'related_work', 'materials and methods': 'methods', 'methodology': 'methods',
+    'method': 'methods', 'findings': 'results', 'conclusions': 'conclusion', 'summary': 'conclusion',
+    'acknowledgments': 'acknowledgements', 'bibliography': 'references'
+}
+# Citation markers, figure mentions and table mentions, counted in one scan
+_MENTIONS = re.compile(r'(?P<reference>\[\d+(?:\s*[,\-]\s*\d+)*\])|(?P<figure>\b(?:figure|fig\.)\s*\d+)|'
+                       r'(?P<table>\btable\s*\d+)', re.IGNORECASE)
+
+
+class ExtractedDocument:
+    """
+    Everything one extraction pass learns about a document.
+
+    Holds the cleaned text with the offset where each page starts (PDF
+    pages, or the blocks Word and text files are read in), the file's
+    metadata and table of contents, the spans of recognised sections and
+    the document statistics. Sections and statistics are computed once when
+    the document is built and travel with it through the extraction cache.
+    """
+
+    def __init__(self, text: str, page_offsets: List[int], file_type: str = '',
+                 metadata: Optional[Dict[str, str]] = None, toc: Optional[List[List[Any]]] = None,
+                 sections: Optional[Dict[str, List[int]]] = None, statistics: Optional[Dict[str, int]] = None):
+        """
+        Args:
+            text: Cleaned text with pages joined by blank lines
+            page_offsets: Offset in text where each page starts
+            file_type: File extension the document was extracted from
+            metadata: Title, author and similar properties of the file
+            toc: Table of contents as [level, title, page] entries (pages one-based)
+            sections: Section name -> [start, end] offsets of its body in text
+            statistics: Counts from stats() (computed from the text if missing)
+        """
+        self.text = text
+        self.page_offsets = page_offsets
+        self.file_type = file_type
+        self.metadata = metadata or {}
+        self.toc = toc or []
+        self.sections = sections if sections is not None else self._find_sections(text)
+        self._statistics = statistics or self._count(text, len(page_offsets))
+
+    @classmethod
+    def from_pages(cls, pages: List[str], file_type: str = '', metadata: Optional[Dict[str, str]] = None,
+                   toc: Optional[List[List[Any]]] = None) -> "ExtractedDocument":
+        """Join cleaned pages with blank lines, recording where each page starts."""
+        offsets = []
+        position = 0
+        for page in pages:
+            offsets.append(position)
+            position += len(page) + 2
+        text = "\n\n".join(pages)
+        lead = len(text) - len(text.lstrip())
+        text = text.strip()
+        return cls(text, [min(len(text), max(0, offset - lead)) for offset in offsets], file_type, metadata, toc)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ExtractedDocument":
+        return cls(data['text'], data['page_offsets'], data.get('file_type', ''), data.get('metadata'),
+                   data.get('toc'), data.get('sections'), data.get('statistics'))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'text': self.text, 'page_offsets': self.page_offsets, 'file_type': self.file_type,
+                'metadata': self.metadata, 'toc': self.toc, 'sections': self.sections,
+                'statistics': self._statistics}
+
+    @property
+    def page_count(self) -> int:
+        return len(self.page_offsets)
+
+    @property
+    def pages(self) -> List[str]:
+        return [self.page_text(page) for page in range(self.page_count)]
+
+    def page_text(self, page: int) -> str:
+        """Get the cleaned text of one page (zero-based)."""
+        end = self.page_offsets[page + 1] if page + 1 < len(self.page_offsets) else len(self.text)
+        return self.text[self.page_offsets[page]:end].strip()
+
+    def section_text(self, name: str) -> Optional[str]:
+        """Get the body of a recognised section such as 'abstract' or 'methods', or None."""
+        span = self.sections.get(name)
+        return self.text[span[0]:span[1]].strip() if span else None
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the document statistics.
+
+        Returns:
+            Dictionary with character, word, page and paragraph counts plus
+            the number of citation markers, figure mentions and table mentions
+        """
+        return dict(self._statistics)
+
+    @staticmethod
+    def _count(text: str, page_count: int) -> Dict[str, int]:
+        mentions = {'reference': 0, 'figure': 0, 'table': 0}
+        for match in _MENTIONS.finditer(text):
+            mentions[match.lastgroup] += 1
+        return {
+            'character_count': len(text),
+            'word_count': len(text.split()),
+            'page_count': page_count,
+            'paragraph_count': sum(1 for paragraph in text.split("\n\n") if paragraph.strip()),
+            'reference_count': mentions['reference'],
+            'figure_mention_count': mentions['figure'],
+            'table_mention_count': mentions['table']
+        }
+
+    @staticmethod
+    def _find_sections(text: str) -> Dict[str, List[int]]:
+        """
+        Locate section bodies from their headings.
+
+        A section runs from its heading to the next recognised heading. When
+        a name appears more than once (a contents page, a running header),
+        its longest span is kept.
+        """
+        headings = [(match.start(), match.end(), match.group(1).lower()) for match in _SECTION_HEADINGS.finditer(text)]
+        sections: Dict[str, List[int]] = {}
+        for number, (_, body_start, heading) in enumerate(headings):
+            name = _SECTION_NAMES.get(heading, heading)
+            end = headings[number + 1][0] if number + 1 < len(headings) else len(text)
+            current = sections.get(name)
+            if current is None or end - body_start > current[1] - current[0]:
+                sections[name] = [body_start, end]
+        return sections
+
+
+class ExtractionCache:
+    """
+    Disk-backed cache of extracted documents keyed by a hash of the file
+    bytes and the settings that shape the extracted text.
+
+    Entries are evicted least-recently-used first once the stored text exceeds
+    the size limit. Every operation opens its own SQLite connection so the
+    cache can be shared by threads, Streamlit sessions and separate processes.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_size_mb: Optional[float] = None):
+        """
+        Initialize the extraction cache.
+
+        Args:
+            path: SQLite database file (defaults to EXTRACTION_CACHE_PATH)
+            max_size_mb: Maximum size of cached text in MB (defaults to EXTRACTION_CACHE_MAX_MB)
+        """
+        self.path = path or os.getenv('EXTRACTION_CACHE_PATH', '.cache/extractions.db')
+        if max_size_mb is None:
+            max_size_mb = float(os.getenv('EXTRACTION_CACHE_MAX_MB', '200'))
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS extractions (
+                    key TEXT PRIMARY KEY,
+                    text TEXT NOT NULL,
+                    page_offsets TEXT NOT NULL,
+                    file_type TEXT NOT NULL,
+                    details TEXT NOT NULL DEFAULT '{}',
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(extractions)")}
+            if 'details' not in columns:
+                # Databases from before documents carried metadata, sections and statistics
+                conn.execute("ALTER TABLE extractions ADD COLUMN details TEXT NOT NULL DEFAULT '{}'")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_extractions_accessed ON extractions (accessed_at)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Open a short-lived connection that waits on locks held by other sessions or processes."""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key: str) -> Optional[ExtractedDocument]:
+        """
+        Look up an extracted document and mark it as recently used.
+
+        Args:
+            key: Content key from DocumentProcessor.document_key
+
+        Returns:
+            The cached document, or None on a miss
+        """
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT text, page_offsets, file_type, details FROM extractions WHERE key = ?", (key,)
+                ).fetchone()
+                if row:
+                    conn.execute("UPDATE extractions SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        except sqlite3.Error as e:
+            logger.warning(f"Extraction cache lookup failed: {e}")
+            row = None
+
+        with self._lock:
+            if row:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if not row:
+            return None
+        return ExtractedDocument.from_dict(dict(json.loads(row[3]), text=row[0], page_offsets=json.loads(row[1]),
+                                                file_type=row[2]))
+
+    def set(self, key: str, document: ExtractedDocument) -> None:
+        """
+        Store an extracted document and evict least-recently-used entries beyond the size limit.
+
+        Args:
+            key: Content key from DocumentProcessor.document_key
+            document: The extracted document
+        """
+        now = time.time()
+        size = len(document.text.encode('utf-8'))
+        if size > self.max_size_bytes:
+            return
+        details = {name: value for name, value in document.to_dict().items()
+                   if name not in ('text', 'page_offsets', 'file_type')}
+        evicted = 0
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO extractions "
+                    "(key, text, page_offsets, file_type, details, size, created_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, document.text, json.dumps(document.page_offsets), document.file_type,
+                     json.dumps(details, ensure_ascii=False), size, now, now)
+                )
+
+                total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM extractions").fetchone()[0]
+                if total > self.max_size_bytes:
+                    for old_key, old_size in conn.execute(
+                        "SELECT key, size FROM extractions WHERE key != ? ORDER BY accessed_at", (key,)
+                    ).fetchall():
+                        if total <= self.max_size_bytes:
+                            break
+                        conn.execute("DELETE FROM extractions WHERE key = ?", (old_key,))
+                        total -= old_size
+                        evicted += 1
+        except sqlite3.Error as e:
+            logger.warning(f"Extraction cache write failed: {e}")
+
+        if evicted:
+            with self._lock:
+                self.evictions += evicted
+            logger.info(f"Extraction cache evicted {evicted} documents")
+
+    def clear(self) -> None:
+        """Remove every cached document."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM extractions")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache counters for this process and the current on-disk footprint.
+
+        Returns:
+            Dictionary with hits, misses, evictions, entries and size in bytes
+        """
+        try:
+            with self._connect() as conn:
+                entries, size = conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM extractions"
+                ).fetchone()
+        except sqlite3.Error:
+            entries, size = 0, 0
+
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': entries,
+                'size_bytes': size
+            }
+
+
+_shared_cache: Optional[ExtractionCache] = None
+_shared_cache_lock = threading.Lock()
+
+def get_extraction_cache() -> Optional[ExtractionCache]:
+    """
+    Get the process-wide extraction cache.
+
+    Returns:
+        Shared ExtractionCache, or None when EXTRACTION_CACHE_ENABLED is false
+        or the cache database cannot be opened
+    """
+    global _shared_cache
+    if os.getenv('EXTRACTION_CACHE_ENABLED', 'true').lower() not in ('1', 'true', 'yes'):
+        return None
+
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            try:
+                _shared_cache = ExtractionCache()
+            except (sqlite3.Error, OSError) as e:
+                logger.warning(f"Extraction cache disabled: {e}")
+                return None
+        return _shared_cache
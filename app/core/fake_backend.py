@@ -0,0 +1,417 @@
+"""
+Fake Model Backend Module
+In-process stand-in for Gemini with deterministic responses, latency and failure injection
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+import logging
+
+from .backends import ModelBackend, get_backend
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+FILLER_WORDS = [
+    "analysis", "evidence", "framework", "concept", "results", "method", "context",
+    "principle", "argument", "structure", "finding", "approach", "theory", "example"
+]
+
+
+class FakeRateLimitError(Exception):
+    """Injected quota error, worded like the API's 429 response."""
+    code = 429
+
+
+class FakeServerError(Exception):
+    """Injected transient server error."""
+    code = 500
+
+
+class FakeNotFoundError(Exception):
+    """Model missing from the account, like the SDK's NotFound (404)."""
+    code = 404
+
+
+class LatencyDistribution:
+    """
+    Time-to-first-token distribution parsed from a spec string:
+    ``fixed:S``, ``uniform:LOW:HIGH``, ``normal:MEAN:SD``,
+    ``lognormal:MEDIAN:SIGMA`` or ``exponential:MEAN`` (seconds).
+    """
+
+    def __init__(self, spec: str):
+        kind, *params = spec.split(':')
+        self.kind = kind.strip().lower()
+        self.params = [float(value) for value in params]
+        expected = {'fixed': 1, 'uniform': 2, 'normal': 2, 'lognormal': 2, 'exponential': 1}
+        if expected.get(self.kind) != len(self.params):
+            raise ValueError(f"Invalid latency spec '{spec}'")
+        self.spec = spec
+
+    def sample(self, rng: random.Random) -> float:
+        """Draw one latency in seconds (never negative)."""
+        if self.kind == 'fixed':
+            value = self.params[0]
+        elif self.kind == 'uniform':
+            value = rng.uniform(*self.params)
+        elif self.kind == 'normal':
+            value = rng.gauss(*self.params)
+        elif self.kind == 'lognormal':
+            value = rng.lognormvariate(math.log(max(self.params[0], 1e-6)), self.params[1])
+        else:
+            value = rng.expovariate(1 / self.params[0]) if self.params[0] > 0 else 0.0
+        return max(0.0, value)
+
+
+class FakeModelProfile:
+    """Behaviour of one fake model: latency, throughput and injected failures."""
+
+    def __init__(self, latency: str = "lognormal:0.6:0.5", tokens_per_second: float = 150.0,
+                 rate_limit_rate: float = 0.0, error_rate: float = 0.0, max_concurrency: int = 0,
+                 unavailable: bool = False):
+        """
+        Args:
+            latency: Time-to-first-token spec for LatencyDistribution
+            tokens_per_second: Output speed after the first token (0 = instant)
+            rate_limit_rate: Probability of a 429 per request
+            error_rate: Probability of a 500 per request
+            max_concurrency: Requests in flight before further ones get a 429 (0 = unlimited)
+            unavailable: Fail every request with a 404, as a model missing from the account would
+        """
+        self.latency = LatencyDistribution(latency)
+        self.tokens_per_second = tokens_per_second
+        self.rate_limit_rate = rate_limit_rate
+        self.error_rate = error_rate
+        self.max_concurrency = max_concurrency
+        self.unavailable = unavailable
+
+    @classmethod
+    def from_env(cls, overrides: Optional[Dict[str, Any]] = None) -> "FakeModelProfile":
+        """Build a profile from GEMINI_FAKE_* variables, then apply per-model overrides."""
+        settings = {
+            'latency': os.getenv('GEMINI_FAKE_LATENCY', 'lognormal:0.6:0.5'),
+            'tokens_per_second': float(os.getenv('GEMINI_FAKE_TOKENS_PER_SECOND', '150')),
+            'rate_limit_rate': float(os.getenv('GEMINI_FAKE_RATE_LIMIT_RATE', '0')),
+            'error_rate': float(os.getenv('GEMINI_FAKE_ERROR_RATE', '0')),
+            'max_concurrency': int(os.getenv('GEMINI_FAKE_MAX_CONCURRENCY', '0')),
+            'unavailable': False
+        }
+        settings.update(overrides or {})
+        return cls(**settings)
+
+
+class FakeUsageMetadata:
+    """Token counts shaped like the API's usage_metadata."""
+
+    def __init__(self, prompt_token_count: int, candidates_token_count: int):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+        self.total_token_count = prompt_token_count + candidates_token_count
+
+
+class FakeResponse:
+    """Response or stream chunk with the attributes the analyzer reads."""
+
+    def __init__(self, text: str, usage_metadata: Optional[FakeUsageMetadata] = None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+class FakeGenerativeModel:
+    """
+    Drop-in for GenerativeModel that answers locally.
+
+    Responses are deterministic per prompt and shaped like the prompt asks:
+    a JSON array for flashcards, a JSON object for bundled analyses, the
+    practice-question layout, or Markdown built from the prompt's headings
+    and bullet labels.
+    """
+
+    def __init__(self, model_name: str, profile: FakeModelProfile, rng: random.Random):
+        self.model_name = model_name
+        self.profile = profile
+        self._rng = rng
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.requests = 0
+
+    def generate_content(self, prompt: Any, generation_config: Optional[Dict[str, Any]] = None,
+                         stream: bool = False, **kwargs) -> Any:
+        """Answer a prompt after the sampled latency, or raise an injected failure."""
+        text, first_token, usage = self._begin(prompt, generation_config, hold=not stream)
+        if stream:
+            return self._stream(text, first_token, usage)
+        try:
+            time.sleep(first_token + self._generation_seconds(text))
+        finally:
+            self._end()
+        return FakeResponse(text, usage)
+
+    async def generate_content_async(self, prompt: Any, generation_config: Optional[Dict[str, Any]] = None,
+                                     stream: bool = False, **kwargs) -> Any:
+        """Async variant of generate_content; streams are consumed with ``async for``."""
+        text, first_token, usage = self._begin(prompt, generation_config, hold=not stream)
+        if stream:
+            return self._stream_async(text, first_token, usage)
+        try:
+            await asyncio.sleep(first_token + self._generation_seconds(text))
+        finally:
+            self._end()
+        return FakeResponse(text, usage)
+
+    def _begin(self, prompt: Any, generation_config: Optional[Dict[str, Any]],
+               hold: bool = True) -> Tuple[str, float, FakeUsageMetadata]:
+        """
+        Admit a request or raise an injected failure, then build its response.
+
+        Streams pass ``hold=False`` and take their in-flight slot when first
+        iterated, so a stream that is never started never holds one.
+        """
+        prompt = prompt if isinstance(prompt, str) else "\n".join(str(part) for part in prompt)
+        generation_config = generation_config or {}
+
+        with self._lock:
+            self.requests += 1
+            roll = self._rng.random()
+            first_token = self.profile.latency.sample(self._rng)
+            busy = bool(self.profile.max_concurrency) and self._in_flight >= self.profile.max_concurrency
+            if self.profile.unavailable:
+                raise FakeNotFoundError(f"404 Model {self.model_name} is not found (fake backend)")
+            if busy or roll < self.profile.rate_limit_rate:
+                raise FakeRateLimitError("429 Resource has been exhausted (e.g. check quota). (fake backend)")
+            if roll < self.profile.rate_limit_rate + self.profile.error_rate:
+                raise FakeServerError("500 An internal error has occurred. (fake backend)")
+            if hold:
+                self._in_flight += 1
+
+        text = fake_response_text(prompt, generation_config)
+        max_chars = int(generation_config.get('max_output_tokens', 8192)) * 4
+        text = text[:max_chars]
+        usage = FakeUsageMetadata(max(1, len(prompt) // 4), max(1, len(text) // 4))
+        return text, first_token, usage
+
+    def _hold(self) -> None:
+        with self._lock:
+            self._in_flight += 1
+
+    def _end(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    def _generation_seconds(self, text: str) -> float:
+        if not self.profile.tokens_per_second:
+            return 0.0
+        return (len(text) / 4) / self.profile.tokens_per_second
+
+    def _stream(self, text: str, first_token: float, usage: FakeUsageMetadata) -> Iterator[FakeResponse]:
+        """Yield the response in chunks of a few words at the profile's output speed."""
+        self._hold()
+        try:
+            time.sleep(first_token)
+            for position, chunk in enumerate(_stream_chunks(text, usage)):
+                if position:
+                    time.sleep(self._generation_seconds(chunk.text))
+                yield chunk
+        finally:
+            self._end()
+
+    async def _stream_async(self, text: str, first_token: float,
+                            usage: FakeUsageMetadata) -> AsyncIterator[FakeResponse]:
+        """Async variant of _stream."""
+        self._hold()
+        try:
+            await asyncio.sleep(first_token)
+            for position, chunk in enumerate(_stream_chunks(text, usage)):
+                if position:
+                    await asyncio.sleep(self._generation_seconds(chunk.text))
+                yield chunk
+        finally:
+            self._end()
+
+
+class FakeBackend(ModelBackend):
+    """
+    Backend serving FakeGenerativeModel instances, selected with GEMINI_BACKEND=fake.
+
+    GEMINI_FAKE_MODELS holds per-model overrides as JSON, for example
+    ``{"models/gemini-1.5-flash-latest": {"unavailable": true},
+    "models/gemini-2.0-flash-exp": {"latency": "fixed:0.2", "rate_limit_rate": 0.1}}``.
+    GEMINI_FAKE_SEED makes latencies and failures reproducible.
+    """
+
+    name = "fake"
+    requires_api_key = False
+
+    def __init__(self, model_overrides: Optional[Dict[str, Dict[str, Any]]] = None, seed: Optional[int] = None):
+        """
+        Args:
+            model_overrides: Per-model profile settings (defaults to GEMINI_FAKE_MODELS)
+            seed: Random seed (defaults to GEMINI_FAKE_SEED, unseeded if unset)
+        """
+        if model_overrides is None:
+            model_overrides = json.loads(os.getenv('GEMINI_FAKE_MODELS', '{}') or '{}')
+        if seed is None and os.getenv('GEMINI_FAKE_SEED'):
+            seed = int(os.getenv('GEMINI_FAKE_SEED'))
+        self.model_overrides = model_overrides
+        self._rng = random.Random(seed)
+        self._models: Dict[str, FakeGenerativeModel] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, api_key: str) -> None:
+        logger.info("Fake backend configured; no requests leave the process")
+
+    def list_models(self) -> List[str]:
+        from .model_registry import ModelRegistry
+        return [name for name in ModelRegistry.WORKING_MODELS
+                if not self.model_overrides.get(name, {}).get('unavailable')]
+
+    def create_model(self, model_name: str) -> FakeGenerativeModel:
+        with self._lock:
+            model = self._models.get(model_name)
+            if model is None:
+                profile = FakeModelProfile.from_env(self.model_overrides.get(model_name))
+                model = FakeGenerativeModel(model_name, profile, random.Random(self._rng.random()))
+                self._models[model_name] = model
+            return model
+
+    def stats(self) -> Dict[str, int]:
+        """Get the number of requests each fake model received."""
+        with self._lock:
+            return {name: model.requests for name, model in self._models.items()}
+
+
+def fake_response_text(prompt: str, generation_config: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Build the deterministic response the fake model gives for a prompt.
+
+    Args:
+        prompt: Prompt text
+        generation_config: Generation configuration sent with the prompt
+
+    Returns:
+        Response text shaped like the prompt's requested format
+    """
+    generation_config = generation_config or {}
+    rng = random.Random(hashlib.sha256(prompt.encode('utf-8')).hexdigest())
+    words = _material_words(prompt)
+
+    def sentence(length: int = 12) -> str:
+        chosen = [rng.choice(words) for _ in range(length)]
+        return " ".join(chosen).capitalize() + "."
+
+    if prompt.strip() == "Hello":
+        return "Hello!"
+
+    card_match = re.search(r"Create (\d+) high-quality flashcards", prompt)
+    if card_match and '"front"' in prompt:
+        cards = [{'front': f"What is {rng.choice(words)}?", 'back': sentence()}
+                 for _ in range(int(card_match.group(1)))]
+        return json.dumps(cards, indent=2)
+
+    keys_match = re.search(r"whose keys are exactly: (.+?)\.\s*$", prompt, re.MULTILINE)
+    if keys_match and generation_config.get('response_mime_type') == 'application/json':
+        keys = re.findall(r'"([^"]+)"', keys_match.group(1))
+        return json.dumps({key: f"## {key.replace('_', ' ').title()}\n\n{sentence(20)}" for key in keys})
+
+    types_match = re.search(r"QUESTION TYPES TO CREATE:\*\*\s*\n\s*(.+)", prompt)
+    if types_match and '"type": "multiple_choice"' in prompt:
+        questions = []
+        for kind, count in (('multiple_choice', 5), ('short_answer', 5), ('essay', 3)):
+            if kind not in types_match.group(1):
+                continue
+            for _ in range(count):
+                questions.append({
+                    'type': kind, 'question': f"{sentence(8)[:-1]}?",
+                    'options': [sentence(4) for _ in range(4)] if kind == 'multiple_choice' else [],
+                    'answer': rng.choice('ABCD') if kind == 'multiple_choice' else sentence(16),
+                    'difficulty': rng.choice(['basic', 'intermediate', 'advanced'])
+                })
+        return json.dumps(questions, indent=2)
+
+    # Markdown mirroring the headings and bullet labels the prompt asks for
+    lines = []
+    for line in prompt.splitlines():
+        line = line.strip()
+        heading = re.match(r"^([^\w\s*]+\s*)?([A-Z][A-Z &/'-]{3,}):?$", line)
+        label = re.match(r"^[•\-]\s*\*\*(.+?)\*\*", line)
+        if heading:
+            lines += ["", f"## {line.rstrip(':')}", ""]
+        elif label:
+            lines.append(f"- **{label.group(1)}**: {sentence(rng.randint(12, 30))}")
+    if not any(line.startswith('- ') for line in lines):
+        lines = [sentence(rng.randint(15, 30)) for _ in range(5)]
+    return "\n".join(lines).strip()
+
+
+def _stream_chunks(text: str, usage: FakeUsageMetadata) -> List[FakeResponse]:
+    """Split a response into chunks of a few words; the last one carries usage metadata."""
+    words = re.findall(r"\S+\s*", text) or [text]
+    chunks = [FakeResponse("".join(words[start:start + 8])) for start in range(0, len(words), 8)]
+    chunks[-1].usage_metadata = usage
+    return chunks
+
+
+def _material_words(prompt: str) -> List[str]:
+    """Collect the document's vocabulary so responses mention its terms."""
+    parts = re.split(r"(?:PAPER TEXT|ACADEMIC MATERIAL|DOCUMENT|CONTENT|TEXT):\s*\n", prompt)
+    material = parts[-1] if len(parts) > 1 else prompt
+    words = sorted(set(re.findall(r"[A-Za-z]{5,}", material.lower())))
+    return words[:200] or FILLER_WORDS
+
+
+def run_load_test(runs: int = 3, sections: Optional[List[str]] = None,
+                  max_workers: Optional[int] = None) -> Dict[str, float]:
+    """
+    Measure analyze_paper throughput against the fake backend.
+
+    Args:
+        runs: Number of analyze_paper calls to time
+        sections: Section keys to analyze (defaults to every section)
+        max_workers: Concurrency passed to analyze_paper
+
+    Returns:
+        Dictionary with wall time per run, sections per second and fake request count
+    """
+    os.environ['GEMINI_BACKEND'] = 'fake'
+    os.environ.setdefault('GEMINI_CACHE_ENABLED', 'false')
+    os.environ.setdefault('GEMINI_RPM', '0')
+    from .gemini_analyzer import GeminiAnalyzer
+
+    analyzer = GeminiAnalyzer()
+    sections = sections or list(analyzer.ANALYSIS_SECTIONS)
+    options = dict({key: True for key in sections}, document_type="🔬 Research Paper")
+    paper = "\n\n".join(
+        f"Section {number}. The experiment measured participant response under condition {number}; "
+        f"results show a significant effect of the intervention on retention and transfer."
+        for number in range(200)
+    )
+
+    timings = []
+    for run in range(runs):
+        start = time.perf_counter()
+        analyzer.analyze_paper(f"Run {run}\n\n{paper}", options, max_workers=max_workers)
+        timings.append(time.perf_counter() - start)
+
+    total = sum(timings)
+    return {
+        'runs': runs,
+        'sections_per_run': len(sections),
+        'mean_seconds_per_run': round(total / runs, 3),
+        'sections_per_second': round(runs * len(sections) / total, 2) if total else 0.0,
+        'fake_requests': sum(get_backend('fake').stats().values()),
+    }
+
+
+# Example usage and testing
+if __name__ == "__main__":
+    print(json.dumps(run_load_test(), indent=2))
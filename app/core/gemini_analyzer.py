@@ -3,13 +3,30 @@ Gemini AI Analyzer Module
 Handles all interactions with Google's Gemini AI for research paper analysis
 """
 
-import google.generativeai as genai
 import os
 import json
 import logging
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, AsyncIterator, Callable, Iterator, Tuple
 from dotenv import load_dotenv
+import asyncio
 import time
+import threading
+import queue
+
+from .async_bridge import call_in_thread, get_event_loop, iterate_sync, run_sync
+from .backends import get_backend
+from .context_cache import DocumentContext, context_cache_mode, open_document_context
+from .document_processor import DocumentProcessor
+from .model_registry import get_model_registry
+from .model_router import get_model_router, hedge_mode
+from .rate_limiter import DailyQuotaExceeded, estimate_tokens, get_rate_limiter
+from .response_cache import ResponseCache, get_response_cache
+from .retry_policy import (RATE_LIMITED, RETRYABLE, TERMINAL, classify_error, get_retry_policy, new_run_deadline,
+                           run_deadline)
+from .single_flight import get_single_flight
+from .structured_output import FLASHCARD_SCHEMA, PRACTICE_QUESTION_SCHEMA
+from .token_accounting import (PromptBudget, RunLedger, append_usage_log, current_budget, current_ledger,
+                               current_section, get_token_estimator, run_scope, section_scope)
 
 # Load environment variables
 load_dotenv()
@@ -24,6 +41,142 @@ class GeminiAnalyzer:
     Provides specialized prompts and analysis functions for academic content.
     """
     
+    # Analysis sections in the order analyze_paper runs and reports them.
+    # 'window' is how many characters of the document each prompt receives,
+    # 'output_tokens' caps the length of its answer (never above GEMINI_MAX_TOKENS) and
+    # 'query' is the profile used to pick passages when excerpts are retrieved.
+    # 'inputs' makes a section a node of the analysis graph: when any of those sections
+    # run in the same analysis, it waits for them and is built from their outputs
+    # instead of the document (see _section_inputs).
+    # Every section retries under the shared retry policy; once it gives up, sections
+    # with an 'operation' return the standard quota/error message and the others
+    # their 'error' prefix with the last error.
+    ANALYSIS_SECTIONS = {
+        'summary': {
+            'title': 'Summary', 'window': 4000, 'output_tokens': 2048,
+            'operation': 'summary generation',
+            'query': ['abstract', 'introduction', 'objective', 'purpose', 'results', 'findings',
+                      'conclusion'],
+        },
+        'methodology': {
+            'title': 'Methodology Analysis', 'window': 4000, 'output_tokens': 2048,
+            'operation': 'methodology analysis',
+            'query': ['method', 'methods', 'methodology', 'design', 'participants', 'sample', 'data',
+                      'procedure', 'experiment', 'measure', 'variables', 'statistical', 'analysis'],
+        },
+        'gaps': {
+            'title': 'Research Gaps', 'window': 4000, 'output_tokens': 2048,
+            'error': 'Error identifying research gaps',
+            'query': ['limitation', 'limitations', 'gap', 'however', 'unclear', 'lack', 'unknown',
+                      'further research', 'future work', 'not addressed'],
+        },
+        'future_work': {
+            'title': 'Future Research Directions', 'window': 4000, 'output_tokens': 2048,
+            'error': 'Error suggesting future research',
+            'query': ['future', 'further', 'extend', 'extension', 'next', 'open', 'limitation',
+                      'directions', 'remains'],
+            'inputs': ['gaps', 'methodology', 'findings'],
+        },
+        'concepts': {
+            'title': 'Key Concepts', 'window': 4000, 'output_tokens': 2048,
+            'operation': 'key concepts extraction',
+            'query': ['definition', 'defined', 'concept', 'principle', 'theory', 'refers', 'means', 'term',
+                      'called', 'known as'],
+        },
+        'examples': {
+            'title': 'Examples & Cases', 'window': 4000, 'output_tokens': 2048,
+            'error': 'Error extracting examples',
+            'query': ['example', 'examples', 'instance', 'such as', 'case', 'case study', 'illustrate',
+                      'consider', 'suppose', 'problem'],
+        },
+        'questions': {
+            'title': 'Study Questions', 'window': 4000, 'output_tokens': 2048,
+            'operation': 'study questions generation',
+            'query': ['definition', 'concept', 'principle', 'important', 'key', 'explain', 'why', 'how'],
+        },
+        'difficulty': {
+            'title': 'Difficulty Assessment', 'window': 4000, 'output_tokens': 1536,
+            'error': 'Error assessing difficulty',
+            'query': ['prerequisite', 'assume', 'advanced', 'complex', 'formula', 'equation', 'theorem',
+                      'proof', 'derivation'],
+        },
+        'structure': {
+            'title': 'Structure Analysis', 'window': 4000, 'output_tokens': 1536,
+            'error': 'Error analyzing structure',
+            'query': ['introduction', 'section', 'chapter', 'part', 'overview', 'first', 'second',
+                      'finally', 'conclusion', 'summary'],
+        },
+        'arguments': {
+            'title': 'Key Arguments', 'window': 4000, 'output_tokens': 2048,
+            'error': 'Error analyzing arguments',
+            'query': ['argue', 'argues', 'claim', 'evidence', 'therefore', 'because', 'thus', 'suggests',
+                      'support', 'contrary', 'counter'],
+        },
+        'improvements': {
+            'title': 'Improvement Suggestions', 'window': 4000, 'output_tokens': 2048,
+            'error': 'Error suggesting improvements',
+            'query': ['argue', 'claim', 'evidence', 'thesis', 'conclusion', 'introduction', 'therefore',
+                      'because'],
+        },
+        'findings': {
+            'title': 'Key Findings', 'window': 4000, 'output_tokens': 2048,
+            'error': 'Error extracting findings',
+            'query': ['result', 'results', 'found', 'finding', 'findings', 'significant', 'show', 'shows',
+                      'demonstrate', 'increase', 'decrease', 'percent'],
+        },
+        'recommendations': {
+            'title': 'Recommendations', 'window': 4000, 'output_tokens': 1536,
+            'error': 'Error extracting recommendations',
+            'query': ['recommend', 'recommendation', 'recommendations', 'should', 'suggest', 'propose',
+                      'must', 'action', 'implement'],
+        },
+        'main_points': {
+            'title': 'Main Points', 'window': 4000, 'output_tokens': 1536,
+            'error': 'Error extracting main points',
+            'query': ['key', 'important', 'main', 'central', 'conclusion', 'summary', 'overview'],
+        },
+        'context': {
+            'title': 'Context Analysis', 'window': 4000, 'output_tokens': 1536,
+            'error': 'Error analyzing context',
+            'query': ['background', 'history', 'historical', 'introduction', 'field', 'purpose', 'audience',
+                      'motivation'],
+        },
+        'citations': {
+            'title': 'Citations & References', 'window': 4000, 'output_tokens': 3072,
+            'error': 'Error extracting references',
+            'query': ['references', 'bibliography', 'et al', 'journal', 'proceedings', 'doi', 'vol', 'pp',
+                      'press', 'conference', 'cited'],
+        },
+        'keywords': {
+            'title': 'Key Terms & Concepts', 'window': 4000, 'output_tokens': 1536,
+            'error': 'Error extracting keywords',
+            'query': ['keywords', 'abstract', 'definition', 'defined', 'term', 'concept', 'called'],
+        },
+        'detailed': {
+            'title': 'Detailed Analysis', 'window': 4000, 'output_tokens': 4096,
+            'error': 'Error in detailed analysis',
+            'query': ['abstract', 'introduction', 'method', 'results', 'discussion', 'conclusion',
+                      'contribution', 'limitation'],
+            'inputs': ['summary', 'methodology', 'gaps', 'findings', 'concepts', 'main_points', 'keywords'],
+        },
+    }
+    
+    # Earlier analyses the research and study tools are built from when they are passed in
+    TOOL_INPUTS = {
+        'hypotheses': ['summary', 'methodology', 'findings', 'gaps'],
+        'proposal': ['summary', 'methodology', 'gaps', 'future_work'],
+        'study_guide': ['summary', 'concepts', 'keywords', 'main_points', 'examples'],
+    }
+    
+    # Stands in for the excerpt when several section prompts share one document block
+    SHARED_DOCUMENT_REFERENCE = "[Use the DOCUMENT provided at the end of this request]"
+    # Stands in for the excerpt when the document was uploaded once as cached context
+    CACHED_DOCUMENT_REFERENCE = "[Use the DOCUMENT provided in the cached context]"
+    # Stands in for the excerpt when a reduce prompt merges per-chunk analyses
+    PARTIAL_ANALYSES_REFERENCE = "[Use the PARTIAL ANALYSES provided at the end of this request]"
+    # Introduces the earlier section outputs a derived prompt carries instead of the document
+    UPSTREAM_ANALYSES_NOTE = "(Earlier analyses of this document, given instead of its text - build on them.)"
+    
     def __init__(self, model_name: str = "gemini-1.5-flash"):
         """
         Initialize Gemini analyzer with API configuration.
@@ -42,74 +195,24 @@ class GeminiAnalyzer:
             self.api_key = os.getenv("GOOGLE_API_KEY")
         
         if not self.api_key or self.api_key == "your_google_api_key_here":
-            raise ValueError("Please set GOOGLE_API_KEY in Streamlit secrets or .env file")
-        
-        # Configure Gemini API
-        genai.configure(api_key=self.api_key)
+            # The offline fake backend runs without credentials
+            if get_backend().requires_api_key:
+                raise ValueError("Please set GOOGLE_API_KEY in Streamlit secrets or .env file")
+            self.api_key = "offline"
         
-        # List available models to debug
+        # Resolve the working model once per process; later analyzers reuse it
+        self._model_lock = threading.Lock()
         try:
-            available_models = []
-            for model in genai.list_models():
-                if 'generateContent' in model.supported_generation_methods:
-                    available_models.append(model.name)
-            logger.info(f"Available models: {available_models}")
-            
-            # Use the first available Gemini model if the specified one doesn't work
-            if available_models:
-                # Try to find a flash model first
-                flash_models = [m for m in available_models if 'flash' in m.lower()]
-                if flash_models:
-                    actual_model = flash_models[0]
-                else:
-                    actual_model = available_models[0]
-                logger.info(f"Using model: {actual_model}")
-            else:
-                actual_model = model_name
-                
-        except Exception as e:
-            logger.warning(f"Could not list models: {e}, using default: {model_name}")
-            actual_model = model_name
-        
-        # Initialize model - use exact model name from API
-        try:
-            # Use models that are confirmed to be available based on the list_models output
-            working_models = [
-                "models/gemini-1.5-flash-latest",
-                "models/gemini-2.0-flash-exp",
-                "models/gemini-2.5-flash",
-                "models/gemini-2.0-flash",
-                "models/gemini-1.5-flash-8b-latest",
-                "models/gemini-flash-latest"
-            ]
-            
-            for test_model in working_models:
-                try:
-                    self.model = genai.GenerativeModel(test_model)
-                    # Test the model with a very simple prompt to verify it works
-                    test_response = self.model.generate_content(
-                        "Hello", 
-                        generation_config={
-                            'temperature': 0.1,
-                            'max_output_tokens': 5,
-                            'top_p': 0.8,
-                            'top_k': 40
-                        }
-                    )
-                    if test_response and test_response.text:
-                        logger.info(f"Successfully initialized and tested model: {test_model}")
-                        actual_model = test_model
-                        break
-                except Exception as model_error:
-                    logger.warning(f"Model {test_model} failed: {str(model_error)[:200]}")
-                    continue
-            else:
-                raise Exception("No working model found - please check your API key quota")
-                
+            self.resolved_model_name, self.model = get_model_registry().resolve(self.api_key, model_name)
         except Exception as e:
             logger.error(f"Failed to initialize any model: {e}")
             raise Exception(f"Could not initialize Gemini model: {e}")
         
+        # Calls are routed to the resolved model while it stays healthy, then to the next verified one
+        self.router = get_model_router(self.api_key)
+        self.router.register(self.resolved_model_name, self.model,
+                             get_model_registry().verified_models(self.api_key))
+        
         # Generation configuration
         self.generation_config = {
             'temperature': float(os.getenv('GEMINI_TEMPERATURE', '0.1')),
@@ -118,68 +221,467 @@ class GeminiAnalyzer:
             'top_k': 40
         }
         
-        logger.info(f"Gemini analyzer initialized with model: {actual_model}")
+        # Persistent response cache; bypassing skips lookups but still refreshes entries
+        self.response_cache = get_response_cache()
+        self.bypass_cache = os.getenv('GEMINI_CACHE_BYPASS', 'false').lower() in ('1', 'true', 'yes')
+        
+        # 'prefix' sends the start of the document, 'retrieval' the most relevant passages
+        self.excerpt_strategy = os.getenv('GEMINI_EXCERPT_STRATEGY', 'prefix').lower()
+        
+        # Build sections with 'inputs' from earlier outputs of the same run instead of the document
+        self.derived_sections = os.getenv('GEMINI_DERIVED_SECTIONS', 'true').lower() in ('1', 'true', 'yes')
+        self.derived_input_chars = int(os.getenv('GEMINI_DERIVED_INPUT_CHARS', '3000'))
+        
+        logger.info(f"Gemini analyzer initialized with model: {self.resolved_model_name}")
+    
+    def refresh_model(self) -> None:
+        """
+        Re-resolve the model if the shared registry entry expired or was invalidated.
+        
+        The registry probe runs without holding the analyzer's lock; only the
+        swap of model name and model does, so threads using the analyzer
+        always see a matching pair.
+        """
+        registry = get_model_registry()
+        if registry.is_valid(self.api_key, self.resolved_model_name):
+            return
+        resolved_name, model = registry.resolve(self.api_key, self.model_name)
+        with self._model_lock:
+            if resolved_name == self.resolved_model_name and model is self.model:
+                return
+            self.resolved_model_name, self.model = resolved_name, model
+        self.router.register(resolved_name, model, registry.verified_models(self.api_key))
+        logger.info(f"Gemini analyzer switched to model: {resolved_name}")
+    
+    def _generate_text(self, prompt: str, generation_config: Optional[Dict[str, Any]] = None,
+                       context: Optional[DocumentContext] = None) -> str:
+        """Synchronous wrapper around _generate_text_async."""
+        return run_sync(self._generate_text_async(prompt, generation_config, context))
+    
+    async def _generate_text_async(self, prompt: str, generation_config: Optional[Dict[str, Any]] = None,
+                                   context: Optional[DocumentContext] = None) -> str:
+        """
+        Send a prompt to the model, answering from the response cache when possible.
+        
+        Only non-empty model responses are cached; exceptions propagate to the
+        caller untouched so error and quota messages are never stored. An
+        identical request already in flight (from any session) is joined
+        instead of being sent again.
+        
+        Args:
+            prompt: The prompt to send to the model
+            generation_config: Overrides the default generation configuration
+            context: Cached document the prompt refers to instead of embedding it
+        
+        Returns:
+            Generated text (empty if the model returned nothing)
+        """
+        if generation_config is None:
+            generation_config = self.generation_config
+        
+        cache_key = None
+        if self.response_cache is not None:
+            cache_key = self._response_cache_key(prompt, generation_config, context)
+            if not self.bypass_cache:
+                cached = await call_in_thread(self.response_cache.get, cache_key)
+                if cached is not None:
+                    self._record_usage(prompt, cached, None, 0.0, cached=True)
+                    return cached
+        
+        flight_key = cache_key or self._response_cache_key(prompt, generation_config, context)
+        text, shared = await get_single_flight().do(
+            flight_key, lambda: self._send_text_async(prompt, generation_config, context, cache_key)
+        )
+        if shared:
+            self._record_usage(prompt, text, None, 0.0, cached=True, coalesced=True)
+        return text
     
-    def _make_api_call_with_retry(self, prompt: str, max_retries: int = 5, operation_name: str = "API call") -> str:
+    async def _send_text_async(self, prompt: str, generation_config: Dict[str, Any],
+                               context: Optional[DocumentContext], cache_key: Optional[str]) -> str:
+        """Send one request to the model and store a non-empty answer in the response cache."""
+        # Queue behind other sessions sharing the API key instead of provoking 429s
+        tokens = estimate_tokens(prompt)
+        await get_rate_limiter().acquire_async(tokens)
+        start = time.perf_counter()
+        if context is not None:
+            # Cached content is bound to the model it was created for
+            response = await context.model.generate_content_async(prompt, generation_config=generation_config)
+            route = context.model_name
+        else:
+            route, response = await self.router.generate_async(prompt, generation_config, hedge=self._hedge(),
+                                                               tokens=tokens)
+        text = response.text if response else ""
+        self._record_usage(prompt, text, getattr(response, 'usage_metadata', None), time.perf_counter() - start,
+                           calibrate=context is None)
+        
+        if cache_key is not None and text:
+            # A fallback model's answer is stored under that model, never as the resolved model's
+            await call_in_thread(self.response_cache.set,
+                                 self._response_cache_key(prompt, generation_config, context, route), text)
+        return text
+    
+    def _generate_stream(self, prompt: str, generation_config: Optional[Dict[str, Any]] = None,
+                         context: Optional[DocumentContext] = None) -> Iterator[str]:
+        """Synchronous wrapper around _generate_stream_async."""
+        return iterate_sync(self._generate_stream_async(prompt, generation_config, context))
+    
+    async def _generate_stream_async(self, prompt: str, generation_config: Optional[Dict[str, Any]] = None,
+                                     context: Optional[DocumentContext] = None) -> AsyncIterator[str]:
         """
-        Make API call with intelligent retry logic for quota errors.
+        Stream the model's response as it is generated, answering from the response cache when possible.
+        
+        Subscribers to an identical stream already in flight receive its
+        chunks so far and then follow it live.
         
         Args:
             prompt: The prompt to send to the model
-            max_retries: Maximum number of retries (default 5)
+            generation_config: Overrides the default generation configuration
+            context: Cached document the prompt refers to instead of embedding it
+        
+        Yields:
+            Text chunks in the order the model emits them
+        """
+        if generation_config is None:
+            generation_config = self.generation_config
+        
+        cache_key = None
+        if self.response_cache is not None:
+            cache_key = self._response_cache_key(prompt, generation_config, context)
+            if not self.bypass_cache:
+                cached = await call_in_thread(self.response_cache.get, cache_key)
+                if cached is not None:
+                    self._record_usage(prompt, cached, None, 0.0, cached=True)
+                    yield cached
+                    return
+        
+        flight_key = cache_key or self._response_cache_key(prompt, generation_config, context)
+        parts = []
+        shared = False
+        async for text, shared in get_single_flight().stream(
+            flight_key, lambda: self._send_stream_async(prompt, generation_config, context, cache_key)
+        ):
+            parts.append(text)
+            yield text
+        if shared:
+            self._record_usage(prompt, "".join(parts), None, 0.0, cached=True, coalesced=True)
+    
+    async def _send_stream_async(self, prompt: str, generation_config: Dict[str, Any],
+                                 context: Optional[DocumentContext], cache_key: Optional[str]) -> AsyncIterator[str]:
+        """Stream one request from the model and store the complete answer in the response cache."""
+        await get_rate_limiter().acquire_async(estimate_tokens(prompt))
+        start = time.perf_counter()
+        route = None
+        if context is not None:
+            response = await context.model.generate_content_async(prompt, generation_config=generation_config,
+                                                                   stream=True)
+        else:
+            route, response = await self.router.stream_async(prompt, generation_config)
+        
+        parts = []
+        usage = None
+        try:
+            async for chunk in response:
+                # The final chunk carries the usage totals for the whole response
+                usage = getattr(chunk, 'usage_metadata', None) or usage
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # Chunks without text parts (e.g. trailing safety metadata) have nothing to show
+                    continue
+                if text:
+                    parts.append(text)
+                    yield text
+        except Exception as e:
+            if route is not None:
+                self.router.record(route, time.perf_counter() - start, e)
+            raise
+        except BaseException:
+            # Closed or cancelled by the consumer: no verdict on the model
+            if route is not None:
+                self.router.release(route)
+            raise
+        if route is not None:
+            self.router.record(route, time.perf_counter() - start)
+        
+        self._record_usage(prompt, "".join(parts), usage, time.perf_counter() - start, calibrate=context is None)
+        if cache_key is not None and parts:
+            await call_in_thread(self.response_cache.set,
+                                 self._response_cache_key(prompt, generation_config, context, route), "".join(parts))
+    
+    def _hedge(self) -> bool:
+        """Whether a call should be hedged under GEMINI_HEDGE."""
+        mode = hedge_mode()
+        # Interactive calls are the ones made outside a multi-section analysis run
+        return mode == 'all' or (mode == 'interactive' and current_ledger() is None)
+    
+    def _record_usage(self, prompt: str, text: str, usage: Any, seconds: float, cached: bool = False,
+                      calibrate: bool = False, coalesced: bool = False) -> None:
+        """
+        Book one model call in the ledger of the current run.
+        
+        Counts come from the response's usage metadata when the API reports
+        them and from the local estimator otherwise. Only prompts sent without
+        a cached document calibrate the estimator, since cached tokens are
+        reported with the prompt but never appear in its text.
+        """
+        prompt_tokens = getattr(usage, 'prompt_token_count', 0) or 0
+        output_tokens = getattr(usage, 'candidates_token_count', 0) or 0
+        measured = bool(prompt_tokens)
+        if measured and calibrate:
+            get_token_estimator().observe(len(prompt), prompt_tokens)
+        elif not measured:
+            prompt_tokens = estimate_tokens(prompt)
+        if not output_tokens and text:
+            output_tokens = estimate_tokens(text)
+        
+        ledger = current_ledger()
+        if ledger is not None:
+            ledger.record(current_section(), prompt_tokens, output_tokens, seconds, measured, cached, coalesced)
+    
+    async def _close_ledger_async(self, ledger: RunLedger, budget: Optional[PromptBudget], document_type: str,
+                                  token_usage: Optional[Dict[str, Any]]) -> None:
+        """Report a finished run's token accounting and append it to the usage log."""
+        usage = ledger.summary()
+        usage['token_budget'] = budget.token_budget if budget is not None else None
+        logger.info(f"Run used {usage['total_tokens']} tokens in {usage['calls']} calls "
+                    f"({usage['prompt_tokens']} prompt, {usage['output_tokens']} output)")
+        if token_usage is not None:
+            token_usage.update(usage)
+        await call_in_thread(append_usage_log, dict(
+            usage, timestamp=time.strftime('%Y-%m-%dT%H:%M:%S'), model=self.resolved_model_name,
+            document_type=document_type
+        ))
+    
+    def _response_cache_key(self, prompt: str, generation_config: Dict[str, Any],
+                            context: Optional[DocumentContext] = None, model_name: Optional[str] = None) -> str:
+        """
+        Address a request by everything the model sees, including a cached document.
+        
+        Args:
+            prompt: The prompt sent to the model
+            generation_config: Generation configuration of the call
+            context: Cached document the prompt refers to
+            model_name: Model that answered (defaults to the context's model, else
+                the resolved model, which is where lookups go)
+        """
+        if context is not None:
+            prompt = f"{context.key}\n{prompt}"
+            model_name = model_name or context.model_name
+        return ResponseCache.make_key(model_name or self.resolved_model_name, prompt, generation_config)
+    
+    def _stream_prompt(self, prompt: str, operation_name: str,
+                       metrics: Optional[Dict[str, Any]] = None,
+                       context: Optional[DocumentContext] = None,
+                       generation_config: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+        """Synchronous wrapper around _stream_prompt_async."""
+        return iterate_sync(self._stream_prompt_async(prompt, operation_name, metrics, context, generation_config))
+    
+    async def _stream_prompt_async(self, prompt: str, operation_name: str,
+                                   metrics: Optional[Dict[str, Any]] = None,
+                                   context: Optional[DocumentContext] = None,
+                                   generation_config: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        """
+        Stream a prompt and measure time-to-first-token.
+        
+        If the stream fails before anything was shown, the prompt is retried
+        through _make_api_call_with_retry_async and its full answer is yielded at once.
+        
+        Args:
+            prompt: The prompt to send to the model
+            operation_name: Name of the operation for logging
+            metrics: Optional dictionary filled with 'time_to_first_token' and
+                'total_seconds' once the stream completes
+            context: Cached document the prompt refers to instead of embedding it
+            generation_config: Overrides the default generation configuration
+        
+        Yields:
+            Text chunks
+        """
+        start = time.perf_counter()
+        first_token = None
+        
+        try:
+            async for chunk in self._generate_stream_async(prompt, generation_config, context):
+                if first_token is None:
+                    first_token = time.perf_counter() - start
+                    logger.info(f"⚡ {operation_name} first token after {first_token:.2f}s")
+                yield chunk
+        except Exception as e:
+            if first_token is not None:
+                logger.error(f"❌ {operation_name} stream interrupted: {str(e)}")
+                yield f"\n\n❌ **Error in {operation_name}**: {str(e)}"
+            elif classify_error(e) == TERMINAL:
+                # Sending the same request again cannot succeed
+                logger.error(f"❌ {operation_name} failed: {str(e)}")
+                first_token = time.perf_counter() - start
+                yield f"❌ **Error in {operation_name}**\n\n{str(e)}"
+            else:
+                logger.warning(f"🔄 {operation_name} stream failed ({str(e)[:200]}), retrying without streaming")
+                text = await self._make_api_call_with_retry_async(prompt, operation_name=operation_name,
+                                                                  generation_config=generation_config,
+                                                                  context=context)
+                first_token = time.perf_counter() - start
+                yield text
+        
+        if metrics is not None:
+            metrics['time_to_first_token'] = first_token
+            metrics['total_seconds'] = time.perf_counter() - start
+    
+    def _make_api_call_with_retry(self, prompt: str, max_retries: Optional[int] = None,
+                                  operation_name: str = "API call",
+                                  generation_config: Optional[Dict[str, Any]] = None,
+                                  context: Optional[DocumentContext] = None) -> str:
+        """Synchronous wrapper around _make_api_call_with_retry_async."""
+        return run_sync(self._make_api_call_with_retry_async(prompt, max_retries, operation_name,
+                                                             generation_config, context))
+    
+    async def _make_api_call_with_retry_async(self, prompt: str, max_retries: Optional[int] = None,
+                                              operation_name: str = "API call",
+                                              generation_config: Optional[Dict[str, Any]] = None,
+                                              context: Optional[DocumentContext] = None) -> str:
+        """
+        Make an API call under the retry policy and turn failures into a readable result.
+        
+        Waits between attempts are asyncio sleeps, so cancelling the calling
+        task also stops any pending retries.
+        
+        Args:
+            prompt: The prompt to send to the model
+            max_retries: Retries after the first attempt (defaults to GEMINI_RETRY_MAX_ATTEMPTS - 1)
             operation_name: Name of the operation for logging
+            generation_config: Overrides the default generation configuration
+            context: Cached document the prompt refers to instead of embedding it
+        
+        Returns:
+            Generated text response, or a warning/error message if the call failed
+        """
+        try:
+            response_text = await self._generate_with_retry_async(prompt, operation_name, generation_config,
+                                                                  context, max_retries)
+        except Exception as e:
+            error_msg = str(e)
+            error_class = classify_error(e)
+            if isinstance(e, DailyQuotaExceeded) or error_class == RATE_LIMITED:
+                logger.error(f"❌ {operation_name} failed: quota exceeded")
+                return f"⚠️ **API Quota Exceeded**\n\nThe Gemini API free tier has reached its daily limit (50 requests). This is normal for free accounts.\n\n**Solutions:**\n• Wait 24 hours for quota reset\n• Upgrade to paid API plan for higher limits\n• Try using fewer analysis options at once\n\n**Note:** Your document was processed successfully, but AI analysis is temporarily limited."
             
+            logger.error(f"❌ {operation_name} failed ({error_class}): {error_msg}")
+            if error_class == RETRYABLE:
+                # Have the next shared analyzer lookup re-validate the model
+                get_model_registry().invalidate(self.resolved_model_name)
+            return f"❌ **Error in {operation_name}**\n\n{error_msg}\n\nPlease try again or contact support if the issue persists."
+        
+        if not response_text:
+            return f"⚠️ No response generated for {operation_name}"
+        return response_text
+    
+    async def _generate_with_retry_async(self, prompt: str, operation_name: str = "API call",
+                                         generation_config: Optional[Dict[str, Any]] = None,
+                                         context: Optional[DocumentContext] = None,
+                                         max_retries: Optional[int] = None) -> str:
+        """
+        Send a prompt under the shared retry policy.
+        
+        Terminal errors (invalid requests, safety blocks) fail at once; rate
+        limits and transient errors are retried with jittered backoff or the
+        server's retry delay, inside the call and run deadlines.
+        
+        Args:
+            prompt: The prompt to send to the model
+            operation_name: Name of the operation for logging
+            generation_config: Overrides the default generation configuration
+            context: Cached document the prompt refers to instead of embedding it
+            max_retries: Retries after the first attempt (defaults to the policy)
+        
         Returns:
-            Generated text response
+            Generated text (empty if the model returned nothing)
+        
+        Raises:
+            Exception: The last error once the policy gives up
         """
-        for attempt in range(max_retries + 1):
-            try:
-                response = self.model.generate_content(prompt, generation_config=self.generation_config)
-                if response and response.text:
-                    if attempt > 0:
-                        logger.info(f"✅ {operation_name} succeeded on attempt {attempt + 1}")
-                    return response.text
-                else:
-                    return f"⚠️ No response generated for {operation_name}"
-                    
-            except Exception as e:
-                error_msg = str(e)
-                
-                # Check for quota/rate limit errors (429 status)
-                if ("429" in error_msg or "quota" in error_msg.lower() or 
-                    "rate limit" in error_msg.lower() or "exceeded" in error_msg.lower()):
-                    
-                    if attempt < max_retries:
-                        # Progressive backoff: 2, 5, 10, 20, 40 seconds
-                        wait_time = min(2 ** (attempt + 1), 40)
-                        logger.warning(f"🔄 {operation_name} - Quota exceeded, attempt {attempt + 1}/{max_retries + 1}. Retrying in {wait_time}s...")
-                        time.sleep(wait_time)
-                        continue
-                    else:
-                        logger.error(f"❌ {operation_name} failed after {max_retries + 1} attempts")
-                        return f"⚠️ **API Quota Exceeded**\n\nThe Gemini API free tier has reached its daily limit (50 requests). This is normal for free accounts.\n\n**Solutions:**\n• Wait 24 hours for quota reset\n• Upgrade to paid API plan for higher limits\n• Try using fewer analysis options at once\n\n**Note:** Your document was processed successfully, but AI analysis is temporarily limited."
-                
-                # Other errors (not quota related)
-                else:
-                    if attempt < max_retries:
-                        wait_time = 2 * (attempt + 1)  # Simple backoff for other errors
-                        logger.warning(f"🔄 {operation_name} error (attempt {attempt + 1}/{max_retries + 1}): {error_msg}. Retrying in {wait_time}s...")
-                        time.sleep(wait_time)
-                        continue
-                    else:
-                        logger.error(f"❌ {operation_name} failed: {error_msg}")
-                        return f"❌ **Error in {operation_name}**\n\n{error_msg}\n\nPlease try again or contact support if the issue persists."
+        def on_rate_limited(delay: float) -> float:
+            if context is None and self.router.has_healthy_route():
+                # The router opened this model's circuit; retry right away on another one
+                return 0.0
+            # Pause every caller through the rate limiter so the next attempt queues instead of sleeping
+            get_rate_limiter().backoff(delay)
+            return 0.0
+        
+        return await get_retry_policy().call(
+            lambda: self._generate_text_async(prompt, generation_config, context), operation_name,
+            max_attempts=max_retries + 1 if max_retries is not None else None, on_rate_limited=on_rate_limited
+        )
+    
+    def analyze_paper(self, paper_text: str, analysis_options: Dict[str, bool],
+                      max_workers: Optional[int] = None,
+                      on_section_complete: Optional[Callable[[str, str, int, int], None]] = None,
+                      bundled: Optional[bool] = None, long_document: Optional[bool] = None,
+                      context_usage: Optional[Dict[str, Any]] = None,
+                      token_usage: Optional[Dict[str, Any]] = None) -> Dict[str, str]:
+        """
+        Synchronous wrapper around analyze_paper_async.
         
-        return f"❌ Failed to complete {operation_name} after {max_retries + 1} attempts"
+        on_section_complete is still invoked in the calling thread: section
+        completions are handed over from the event loop as they happen.
+        """
+        events: "queue.Queue[Optional[Tuple[str, str, int, int]]]" = queue.Queue()
+        callback = (lambda *event: events.put(event)) if on_section_complete else None
+        future = asyncio.run_coroutine_threadsafe(
+            self.analyze_paper_async(paper_text, analysis_options, max_workers, callback, bundled,
+                                     long_document, context_usage, token_usage),
+            get_event_loop()
+        )
+        future.add_done_callback(lambda _: events.put(None))
+        try:
+            while on_section_complete:
+                event = events.get()
+                if event is None:
+                    break
+                on_section_complete(*event)
+            return future.result()
+        except BaseException:
+            future.cancel()
+            raise
     
-    def analyze_paper(self, paper_text: str, analysis_options: Dict[str, bool]) -> Dict[str, str]:
+    async def analyze_paper_async(self, paper_text: str, analysis_options: Dict[str, bool],
+                                  max_workers: Optional[int] = None,
+                                  on_section_complete: Optional[Callable[[str, str, int, int], None]] = None,
+                                  bundled: Optional[bool] = None, long_document: Optional[bool] = None,
+                                  context_usage: Optional[Dict[str, Any]] = None,
+                                  token_usage: Optional[Dict[str, Any]] = None) -> Dict[str, str]:
         """
         Comprehensive analysis of academic content.
         
+        Selected analyses run as concurrent tasks, at most max_workers model
+        calls at a time, so the run takes roughly as long as the slowest
+        section instead of the sum of all of them. Cancelling the task
+        cancels every section still in flight.
+        In bundled mode the sections are first requested together as one JSON
+        response, and only missing or malformed sections are analyzed individually.
+        With GEMINI_CONTEXT_CACHE enabled the document is uploaded once and the
+        individual section prompts carry only their instructions.
+        Sections that declare 'inputs' wait for those sections when they run
+        in the same analysis and are built from their outputs; every other
+        section starts at once.
+        Every model call is booked per section in a token ledger, and with
+        GEMINI_RUN_TOKEN_BUDGET set the excerpts and output caps are sized so
+        the whole run stays inside that budget.
+        
         Args:
             paper_text: Extracted text from the document
             analysis_options: Dictionary specifying which analyses to perform
-            
+            max_workers: Maximum concurrent model calls (defaults to GEMINI_MAX_CONCURRENCY,
+                1 runs the sections one after another)
+            on_section_complete: Optional callback invoked as
+                ``(section, result, completed, total)`` whenever a section finishes
+            bundled: Request all sections in a single call (defaults to GEMINI_BUNDLED_ANALYSIS)
+            long_document: Map-reduce sections over the whole text when it exceeds the
+                section window (defaults to GEMINI_LONG_DOCUMENT)
+            context_usage: Optional dictionary filled with the run's context cache
+                token accounting (left empty when no context was cached)
+            token_usage: Optional dictionary filled with the run's per-section token
+                and latency totals (also appended to GEMINI_USAGE_LOG)
+        
         Returns:
             Dictionary containing analysis results
         """
@@ -189,98 +691,752 @@ class GeminiAnalyzer:
         # Store document type in results for later use
         results['document_type'] = document_type
         
-        try:
-            # Generate summary if requested
-            if analysis_options.get('summary', False):
-                results['summary'] = self.generate_summary(paper_text, document_type)
-                time.sleep(1)  # Rate limiting
-            
-            # Research paper specific analyses
-            if analysis_options.get('methodology', False):
-                results['methodology'] = self.analyze_methodology(paper_text)
-                time.sleep(1)
-            
-            if analysis_options.get('gaps', False):
-                results['gaps'] = self.identify_research_gaps(paper_text)
-                time.sleep(1)
+        if max_workers is None:
+            max_workers = int(os.getenv('GEMINI_MAX_CONCURRENCY', '4'))
+        max_workers = max(1, max_workers)
+        if bundled is None:
+            bundled = os.getenv('GEMINI_BUNDLED_ANALYSIS', 'false').lower() in ('1', 'true', 'yes')
+        
+        if long_document is None:
+            long_document = self._long_document_default()
+        
+        selected = [key for key in self.ANALYSIS_SECTIONS if analysis_options.get(key, False)]
+        graph = self._analysis_graph(selected)
+        section_results = {}
+        context = None
+        tasks: List["asyncio.Task[Tuple[str, str]]"] = []
+        tasks_by_key: Dict[str, "asyncio.Task[Tuple[str, str]]"] = {}
+        ledger = RunLedger()
+        budget = self._plan_budget(paper_text, selected, document_type)
+        deadline = new_run_deadline()
+        
+        def report(key: str) -> None:
+            logger.info(f"Section '{key}' finished ({len(section_results)}/{len(selected)})")
+            if on_section_complete:
+                on_section_complete(key, section_results[key], len(section_results), len(selected))
+        
+        with run_scope(ledger, budget), run_deadline(deadline):
+            try:
+                if bundled and selected:
+                    with section_scope('bundled'):
+                        bundle_results = await self.analyze_bundled_async(paper_text, selected, document_type,
+                                                                          max_workers)
+                    for key, result in bundle_results.items():
+                        section_results[key] = result
+                        report(key)
                 
-            if analysis_options.get('future_work', False):
-                results['future_work'] = self.suggest_future_research(paper_text)
-                time.sleep(1)
-            
-            # Study material specific analyses
-            if analysis_options.get('concepts', False):
-                results['concepts'] = self.extract_key_concepts(paper_text, document_type)
-                time.sleep(1)
+                # Sections not produced by a bundle are analyzed one prompt each
+                pending = [key for key in selected if key not in section_results]
                 
-            if analysis_options.get('examples', False):
-                results['examples'] = self.extract_examples_cases(paper_text, document_type)
-                time.sleep(1)
+                if not long_document:
+                    context = await self._open_run_context_async(paper_text, [key for key in pending
+                                                                             if not graph[key]])
+                semaphore = asyncio.Semaphore(max_workers)
                 
-            if analysis_options.get('questions', False):
-                results['questions'] = self.generate_study_questions(paper_text, document_type)
-                time.sleep(1)
+                async def run(key: str) -> Tuple[str, str]:
+                    # Upstream sections are awaited before taking a worker slot
+                    outputs = {}
+                    for dependency in graph[key]:
+                        if dependency in section_results:
+                            outputs[dependency] = section_results[dependency]
+                        else:
+                            outputs[dependency] = (await asyncio.shield(tasks_by_key[dependency]))[1]
+                    upstream = self._section_inputs(key, outputs)
+                    async with semaphore:
+                        with section_scope(key):
+                            if upstream:
+                                return key, await self.analyze_section_async(key, paper_text, document_type,
+                                                                             upstream=upstream)
+                            if long_document:
+                                return key, await self.analyze_long_section_async(key, paper_text, document_type)
+                            if context is not None:
+                                return key, await self._analyze_with_context_async(key, paper_text, document_type,
+                                                                                   context)
+                            return key, await self.analyze_section_async(key, paper_text, document_type)
                 
-            if analysis_options.get('difficulty', False):
-                results['difficulty'] = self.assess_difficulty(paper_text, document_type)
-                time.sleep(1)
-            
-            # Assignment/Essay specific analyses
-            if analysis_options.get('structure', False):
-                results['structure'] = self.analyze_structure(paper_text, document_type)
-                time.sleep(1)
+                tasks_by_key = {key: asyncio.ensure_future(run(key)) for key in pending}
+                tasks = list(tasks_by_key.values())
+                for finished in asyncio.as_completed(tasks):
+                    key, result = await finished
+                    section_results[key] = result
+                    report(key)
                 
-            if analysis_options.get('arguments', False):
-                results['arguments'] = self.analyze_arguments(paper_text, document_type)
-                time.sleep(1)
+                # Keep the familiar section order regardless of completion order
+                for key in selected:
+                    results[key] = section_results[key]
                 
-            if analysis_options.get('improvements', False):
-                results['improvements'] = self.suggest_improvements(paper_text, document_type)
-                time.sleep(1)
+                logger.info(f"Analysis completed with {len(results)} components")
+                return results
             
-            # Report/Guide specific analyses
-            if analysis_options.get('findings', False):
-                results['findings'] = self.extract_findings(paper_text, document_type)
-                time.sleep(1)
-                
-            if analysis_options.get('recommendations', False):
-                results['recommendations'] = self.extract_recommendations(paper_text, document_type)
-                time.sleep(1)
-            
-            # General analyses
-            if analysis_options.get('main_points', False):
-                results['main_points'] = self.extract_main_points(paper_text, document_type)
-                time.sleep(1)
-                
-            if analysis_options.get('context', False):
-                results['context'] = self.analyze_context(paper_text, document_type)
-                time.sleep(1)
+            except Exception as e:
+                logger.error(f"Error during document analysis: {str(e)}")
+                raise Exception(f"Analysis failed: {str(e)}")
             
-            # Extract citations/references if requested
-            if analysis_options.get('citations', False):
-                results['citations'] = self.extract_citations(paper_text, document_type)
-                time.sleep(1)
+            finally:
+                for task in tasks:
+                    task.cancel()
+                if context is not None:
+                    await call_in_thread(context.close)
+                    if context_usage is not None:
+                        context_usage.update(context.usage())
+                await self._close_ledger_async(ledger, budget, document_type, token_usage)
+    
+    def stream_analysis(self, paper_text: str, analysis_options: Dict[str, bool],
+                        max_workers: Optional[int] = None, bundled: Optional[bool] = None,
+                        metrics: Optional[Dict[str, Dict[str, Any]]] = None,
+                        long_document: Optional[bool] = None,
+                        context_usage: Optional[Dict[str, Any]] = None,
+                        token_usage: Optional[Dict[str, Any]] = None) -> Iterator[Tuple[str, Optional[str]]]:
+        """Synchronous wrapper around stream_analysis_async; closing it cancels the run."""
+        return iterate_sync(self.stream_analysis_async(paper_text, analysis_options, max_workers, bundled,
+                                                       metrics, long_document, context_usage, token_usage))
+    
+    async def stream_analysis_async(self, paper_text: str, analysis_options: Dict[str, bool],
+                                    max_workers: Optional[int] = None, bundled: Optional[bool] = None,
+                                    metrics: Optional[Dict[str, Dict[str, Any]]] = None,
+                                    long_document: Optional[bool] = None,
+                                    context_usage: Optional[Dict[str, Any]] = None,
+                                    token_usage: Optional[Dict[str, Any]] = None
+                                    ) -> AsyncIterator[Tuple[str, Optional[str]]]:
+        """
+        Streaming variant of analyze_paper_async.
+        
+        Sections stream concurrently, at most max_workers at a time, and their
+        chunks are interleaved in arrival order. Bundled sections arrive as a
+        single chunk each. Sections built from other sections' outputs start
+        streaming once those have finished.
+        
+        Args:
+            paper_text: Extracted text from the document
+            analysis_options: Dictionary specifying which analyses to perform
+            max_workers: Maximum concurrent model calls (defaults to GEMINI_MAX_CONCURRENCY)
+            bundled: Request sections in bundles first (defaults to GEMINI_BUNDLED_ANALYSIS)
+            metrics: Optional dictionary filled per section with time-to-first-token
+                and total time
+            long_document: Map-reduce long documents, streaming the reduce step
+                (defaults to GEMINI_LONG_DOCUMENT)
+            context_usage: Optional dictionary filled with the run's context cache
+                token accounting once the stream is finished
+            token_usage: Optional dictionary filled with the run's per-section token
+                and latency totals once the stream is finished
+        
+        Yields:
+            ``(section, chunk)`` pairs; a chunk of None marks the section as finished
+        """
+        document_type = analysis_options.get('document_type', '📖 Other Academic Material')
+        if max_workers is None:
+            max_workers = int(os.getenv('GEMINI_MAX_CONCURRENCY', '4'))
+        if bundled is None:
+            bundled = os.getenv('GEMINI_BUNDLED_ANALYSIS', 'false').lower() in ('1', 'true', 'yes')
+        if metrics is None:
+            metrics = {}
+        if long_document is None:
+            long_document = self._long_document_default()
+        
+        pending = [key for key in self.ANALYSIS_SECTIONS if analysis_options.get(key, False)]
+        graph = self._analysis_graph(pending)
+        # Scopes are entered inside each task rather than around the yields below,
+        # since the consumer may resume this generator from a different context
+        ledger = RunLedger()
+        budget = self._plan_budget(paper_text, pending, document_type)
+        deadline = new_run_deadline()
+        tasks: List["asyncio.Task[None]"] = []
+        context = None
+        # Full text of every finished section, for the sections built from it
+        outputs: Dict[str, str] = {}
+        
+        try:
+            if bundled and pending:
+                start = time.perf_counter()
+                with run_scope(ledger, budget), run_deadline(deadline), section_scope('bundled'):
+                    bundle_results = await self.analyze_bundled_async(paper_text, pending, document_type,
+                                                                      max_workers)
+                outputs.update(bundle_results)
+                for key, result in bundle_results.items():
+                    elapsed = time.perf_counter() - start
+                    metrics[key] = {'time_to_first_token': elapsed, 'total_seconds': elapsed}
+                    yield key, result
+                    yield key, None
+                pending = [key for key in pending if key not in metrics]
             
-            # Extract keywords if requested
-            if analysis_options.get('keywords', False):
-                results['keywords'] = self.extract_keywords(paper_text, document_type)
-                time.sleep(1)
+            if not pending:
+                return
             
-            # Detailed analysis if requested
-            if analysis_options.get('detailed', False):
-                results['detailed'] = self.detailed_analysis(paper_text, document_type)
-                time.sleep(1)
+            events: "asyncio.Queue[Tuple[str, Optional[str]]]" = asyncio.Queue()
+            context = None if long_document else await self._open_run_context_async(
+                paper_text, [key for key in pending if not graph[key]]
+            )
+            semaphore = asyncio.Semaphore(max(1, max_workers))
+            finished_sections = {key: asyncio.Event() for key in pending}
             
-            logger.info(f"Analysis completed with {len(results)} components")
-            return results
+            async def stream_one(key: str) -> None:
+                metrics[key] = {}
+                parts: List[str] = []
+                try:
+                    # Upstream sections are awaited before taking a worker slot
+                    for dependency in graph[key]:
+                        if dependency in finished_sections:
+                            await finished_sections[dependency].wait()
+                    upstream = self._section_inputs(key, outputs)
+                    async with semaphore:
+                        with run_scope(ledger, budget), run_deadline(deadline), section_scope(key):
+                            async for chunk in self.stream_section_async(key, paper_text, document_type,
+                                                                         metrics=metrics[key],
+                                                                         long_document=long_document,
+                                                                         context=context, upstream=upstream):
+                                parts.append(chunk)
+                                await events.put((key, chunk))
+                except Exception as e:
+                    logger.error(f"Error streaming {key}: {str(e)}")
+                    parts = [f"❌ Error in {self.ANALYSIS_SECTIONS[key]['title']}: {str(e)}"]
+                    await events.put((key, parts[0]))
+                finally:
+                    outputs[key] = "".join(parts)
+                    finished_sections[key].set()
+                    events.put_nowait((key, None))
             
+            tasks = [asyncio.ensure_future(stream_one(key)) for key in pending]
+            finished = 0
+            while finished < len(pending):
+                key, chunk = await events.get()
+                if chunk is None:
+                    finished += 1
+                yield key, chunk
+        finally:
+            for task in tasks:
+                task.cancel()
+            if context is not None:
+                await call_in_thread(context.close)
+                if context_usage is not None:
+                    context_usage.update(context.usage())
+            await self._close_ledger_async(ledger, budget, document_type, token_usage)
+    
+    def stream_section(self, section: str, paper_text: str, document_type: str = "🔬 Research Paper",
+                       metrics: Optional[Dict[str, Any]] = None, long_document: bool = False,
+                       context: Optional[DocumentContext] = None,
+                       upstream: Optional[Dict[str, str]] = None) -> Iterator[str]:
+        """Synchronous wrapper around stream_section_async."""
+        return iterate_sync(self.stream_section_async(section, paper_text, document_type, metrics,
+                                                      long_document, context, upstream))
+    
+    async def stream_section_async(self, section: str, paper_text: str, document_type: str = "🔬 Research Paper",
+                                   metrics: Optional[Dict[str, Any]] = None, long_document: bool = False,
+                                   context: Optional[DocumentContext] = None,
+                                   upstream: Optional[Dict[str, str]] = None) -> AsyncIterator[str]:
+        """
+        Stream a single analysis section as the model writes it.
+        
+        Args:
+            section: Key from ANALYSIS_SECTIONS
+            paper_text: Extracted text from the document
+            document_type: Selected document type
+            metrics: Optional dictionary filled with time-to-first-token and total time
+            long_document: Map over the whole document first and stream the reduce step
+            context: Cached document from _open_run_context_async; the prompt then
+                carries only the section instructions
+            upstream: Outputs of the section's inputs from _section_inputs; the
+                prompt is then built from them instead of the document
+        
+        Yields:
+            Text chunks
+        """
+        title = self.ANALYSIS_SECTIONS[section]['title']
+        config = self._section_config(section)
+        if upstream:
+            async for chunk in self._stream_prompt_async(self._derived_prompt(section, upstream, document_type),
+                                                         title, metrics, generation_config=config):
+                yield chunk
+            return
+        partials = await self._map_section_async(section, paper_text, document_type) if long_document else None
+        if partials is None and context is not None:
+            prompt = self._cached_section_prompt(section, paper_text, document_type, context)
+            async for chunk in self._stream_prompt_async(prompt, title, metrics, context, config):
+                yield chunk
+            return
+        if partials is None:
+            prompt = self._section_prompt(section, paper_text, document_type)
+        elif len(partials) == 1:
+            yield partials[0]
+            return
+        else:
+            prompt = self._reduce_prompt(section, partials, document_type)
+        async for chunk in self._stream_prompt_async(prompt, title, metrics, generation_config=config):
+            yield chunk
+    
+    def _long_document_default(self) -> bool:
+        return os.getenv('GEMINI_LONG_DOCUMENT', 'false').lower() in ('1', 'true', 'yes')
+    
+    def analyze_long_section(self, section: str, paper_text: str, document_type: str = "🔬 Research Paper") -> str:
+        """Synchronous wrapper around analyze_long_section_async."""
+        return run_sync(self.analyze_long_section_async(section, paper_text, document_type))
+    
+    async def analyze_long_section_async(self, section: str, paper_text: str,
+                                         document_type: str = "🔬 Research Paper") -> str:
+        """
+        Analyze one section over the whole document with a map-reduce pass.
+        
+        The document is split with DocumentProcessor.chunk_text, the section
+        prompt runs over every chunk concurrently, and a reduce prompt merges
+        the partial outputs. Documents that fit the section window use the
+        regular single prompt.
+        
+        Args:
+            section: Key from ANALYSIS_SECTIONS
+            paper_text: Extracted text from the document
+            document_type: Selected document type
+        
+        Returns:
+            Merged analysis text
+        """
+        partials = await self._map_section_async(section, paper_text, document_type)
+        if partials is None:
+            return await self.analyze_section_async(section, paper_text, document_type)
+        if len(partials) == 1:
+            return partials[0]
+        
+        return await self._make_api_call_with_retry_async(
+            self._reduce_prompt(section, partials, document_type),
+            operation_name=f"{self.ANALYSIS_SECTIONS[section]['title']} (reduce)",
+            generation_config=self._section_config(section)
+        )
+    
+    def _long_document_chunks(self, paper_text: str, window: int) -> List[str]:
+        """
+        Split a document into at most GEMINI_LONG_DOC_MAX_FANOUT chunks.
+        
+        Chunks grow beyond the section window so the whole document fits the
+        fan-out, but never beyond the share of GEMINI_LONG_DOC_TOKEN_BUDGET each
+        map call may use. If the document is still too long, chunks are sampled
+        evenly from start to end so methods, results and references all appear.
+        """
+        max_fanout = max(1, int(os.getenv('GEMINI_LONG_DOC_MAX_FANOUT', '8')))
+        budget_chars = get_token_estimator().chars_for(int(os.getenv('GEMINI_LONG_DOC_TOKEN_BUDGET', '32000')))
+        
+        chunk_size = max(window, -(-len(paper_text) // max_fanout))
+        chunk_size = min(chunk_size, max(window, budget_chars // max_fanout))
+        chunks = DocumentProcessor(max_chunk_size=chunk_size).chunk_text(paper_text)
+        
+        if len(chunks) > max_fanout:
+            step = (len(chunks) - 1) / (max_fanout - 1) if max_fanout > 1 else 0
+            chunks = [chunks[round(i * step)] for i in range(max_fanout)]
+        return chunks
+    
+    async def _map_section_async(self, section: str, paper_text: str, document_type: str) -> Optional[List[str]]:
+        """
+        Run a section prompt over every chunk of a long document concurrently.
+        
+        Args:
+            section: Key from ANALYSIS_SECTIONS
+            paper_text: Extracted text from the document
+            document_type: Selected document type
+        
+        Returns:
+            Successful partial analyses in document order, or None if the
+            document fits in a single prompt
+        """
+        window = self.ANALYSIS_SECTIONS[section]['window']
+        if len(paper_text) <= window:
+            return None
+        
+        chunks = self._long_document_chunks(paper_text, window)
+        builder = getattr(self, f"_{section}_prompt")
+        title = self.ANALYSIS_SECTIONS[section]['title']
+        config = self._section_config(section)
+        
+        async def map_chunk(number: int, chunk: str) -> str:
+            excerpt = (f"(Part {number} of {len(chunks)} of a longer document - "
+                       f"analyze only what this part contains.)\n{chunk}")
+            return await self._make_api_call_with_retry_async(
+                builder(excerpt, document_type),
+                operation_name=f"{title} (part {number}/{len(chunks)})", generation_config=config
+            )
+        
+        outputs = await asyncio.gather(*(map_chunk(number, chunk) for number, chunk in enumerate(chunks, 1)))
+        
+        partials = [output for output in outputs if output and not output.startswith(('⚠️', '❌'))]
+        logger.info(f"{title}: mapped {len(chunks)} chunks, {len(partials)} succeeded")
+        # If every part failed, surface the first error instead of reducing nothing
+        return partials or list(outputs[:1])
+    
+    def _reduce_prompt(self, section: str, partials: List[str], document_type: str) -> str:
+        """Build the prompt that merges per-chunk analyses into one section result."""
+        budget_chars = get_token_estimator().chars_for(int(os.getenv('GEMINI_LONG_DOC_TOKEN_BUDGET', '32000')))
+        per_partial = max(1, budget_chars // len(partials))
+        instructions = getattr(self, f"_{section}_prompt")(self.PARTIAL_ANALYSES_REFERENCE, document_type)
+        combined = "\n\n".join(
+            f"--- PART {number} ANALYSIS ---\n{partial[:per_partial]}"
+            for number, partial in enumerate(partials, 1)
+        )
+        
+        return f"""
+        The document was too long to analyze at once, so it was split into {len(partials)} consecutive
+        parts and each part was analyzed separately with the instructions below.
+        Merge the partial analyses into ONE final analysis of the whole document that follows the
+        instructions exactly. Combine overlapping points, keep specific details from every part,
+        and resolve contradictions in favor of the more specific evidence.
+        
+        {instructions}
+        
+        PARTIAL ANALYSES:
+        {combined}
+        """
+    
+    async def analyze_section_async(self, section: str, paper_text: str,
+                                    document_type: str = "🔬 Research Paper",
+                                    upstream: Optional[Dict[str, str]] = None) -> str:
+        """
+        Run one analysis section with its usual prompt and error handling.
+        
+        Every section retries under the retry policy. When it gives up,
+        sections with an 'operation' in ANALYSIS_SECTIONS report the standard
+        quota/error message and the others their 'error' prefix.
+        
+        Args:
+            section: Key from ANALYSIS_SECTIONS
+            paper_text: Extracted text from the document
+            document_type: Selected document type
+            upstream: Outputs of the section's inputs from _section_inputs; the
+                prompt is then built from them instead of the document
+        
+        Returns:
+            Section result text
+        """
+        spec = self.ANALYSIS_SECTIONS[section]
+        if upstream:
+            prompt = self._derived_prompt(section, upstream, document_type)
+        else:
+            prompt = self._section_prompt(section, paper_text, document_type)
+        config = self._section_config(section)
+        
+        if 'operation' in spec:
+            return await self._make_api_call_with_retry_async(prompt, operation_name=spec['operation'],
+                                                              generation_config=config)
+        try:
+            return await self._generate_with_retry_async(prompt, spec['title'], config)
         except Exception as e:
-            logger.error(f"Error during document analysis: {str(e)}")
-            raise Exception(f"Analysis failed: {str(e)}")
+            logger.error(f"{spec['error']}: {str(e)}")
+            return f"{spec['error']}: {str(e)}"
+
+    def _section_prompt(self, section: str, paper_text: str, document_type: str = "🔬 Research Paper") -> str:
+        """
+        Build the prompt for one analysis section.
+        
+        Args:
+            section: Key from ANALYSIS_SECTIONS
+            paper_text: Extracted text from the document
+            document_type: Selected document type
+            
+        Returns:
+            Prompt containing the section instructions and document excerpt
+        """
+        return getattr(self, f"_{section}_prompt")(self._section_excerpt(section, paper_text), document_type)
+    
+    def _section_excerpt(self, section: str, paper_text: str) -> str:
+        """
+        Choose the part of the document a section prompt receives.
+        
+        With GEMINI_EXCERPT_STRATEGY=retrieval, documents longer than the
+        section window are represented by their highest-scoring BM25 passages
+        for the section's query profile; otherwise the document prefix is used.
+        
+        Args:
+            section: Key from ANALYSIS_SECTIONS
+            paper_text: Extracted text from the document
+            
+        Returns:
+            Excerpt of at most the section's excerpt size in characters
+        """
+        spec = self.ANALYSIS_SECTIONS[section]
+        window = self._excerpt_chars(section)
+        if self.excerpt_strategy == 'retrieval' and len(paper_text) > window:
+            index = DocumentProcessor.build_passage_index(paper_text)
+            return index.select_excerpt(spec['query'], window)
+        return paper_text[:window]
+    
+    def _analysis_graph(self, sections: List[str]) -> Dict[str, List[str]]:
+        """
+        Resolve which sections of a run are built from other sections' outputs.
+        
+        Args:
+            sections: Section keys the run will analyze
+            
+        Returns:
+            Dictionary mapping every section to the declared inputs that run
+            with it (empty for sections that read the document)
+        """
+        if not self.derived_sections:
+            return {key: [] for key in sections}
+        return {key: [dependency for dependency in self.ANALYSIS_SECTIONS[key].get('inputs', [])
+                      if dependency in sections]
+                for key in sections}
+    
+    def _section_inputs(self, section: str, outputs: Dict[str, str], inputs: Optional[List[str]] = None
+                        ) -> Dict[str, str]:
+        """
+        Pick the usable outputs a derived prompt can be built from.
+        
+        Args:
+            section: Key from ANALYSIS_SECTIONS or TOOL_INPUTS
+            outputs: Finished section outputs by section key
+            inputs: Section keys to use (defaults to the section's declared 'inputs')
+            
+        Returns:
+            Outputs of the inputs that succeeded, in declaration order; empty
+            when none did, so the caller falls back to the document
+        """
+        if not self.derived_sections:
+            return {}
+        if inputs is None:
+            inputs = self.ANALYSIS_SECTIONS[section].get('inputs', [])
+        usable = {}
+        for key in inputs:
+            text = (outputs.get(key) or "").strip()
+            error_prefix = self.ANALYSIS_SECTIONS[key].get('error', '❌')
+            if not text or text.startswith(('⚠️', '❌', error_prefix)) or "❌ **Error in" in text:
+                continue
+            usable[key] = text
+        return usable
+    
+    def _upstream_excerpt(self, upstream: Dict[str, str], max_chars: int) -> str:
+        """
+        Combine earlier section outputs into the excerpt of a derived prompt.
+        
+        Each output gets an equal share of max_chars, cut at a line break
+        where possible so the leading points of every analysis survive.
+        """
+        share = max(1, max_chars // len(upstream))
+        parts = []
+        for key, text in upstream.items():
+            if len(text) > share:
+                cut = text.rfind("\n", 0, share)
+                text = text[:cut if cut > share // 2 else share].rstrip()
+            parts.append(f"--- {self.ANALYSIS_SECTIONS[key]['title'].upper()} ---\n{text}")
+        return self.UPSTREAM_ANALYSES_NOTE + "\n\n" + "\n\n".join(parts)
+    
+    def _tool_excerpt(self, tool: str, content: str, prior_results: Optional[Dict[str, Any]], window: int) -> str:
+        """Excerpt for a research or study tool: its TOOL_INPUTS analyses when available, else the text prefix."""
+        upstream = self._section_inputs(tool, prior_results or {}, self.TOOL_INPUTS[tool])
+        if upstream:
+            return self._upstream_excerpt(upstream, min(self.derived_input_chars, window))
+        return content[:window]
+    
+    def _derived_prompt(self, section: str, upstream: Dict[str, str], document_type: str) -> str:
+        """Build a section prompt around the outputs of its inputs instead of the document."""
+        max_chars = min(self.derived_input_chars, self._excerpt_chars(section))
+        return getattr(self, f"_{section}_prompt")(self._upstream_excerpt(upstream, max_chars), document_type)
+    
+    def _excerpt_chars(self, section: str) -> int:
+        """Characters of the document a section prompt may carry under the current run's budget."""
+        budget = current_budget()
+        if budget is not None and section in budget.excerpt_chars:
+            return budget.excerpt_chars[section]
+        return self.ANALYSIS_SECTIONS[section]['window']
+    
+    def _output_cap(self, section: str) -> int:
+        """Output tokens a section may use before any run budget is applied."""
+        return min(self.ANALYSIS_SECTIONS[section]['output_tokens'], self.generation_config['max_output_tokens'])
+    
+    def _section_config(self, section: str) -> Dict[str, Any]:
+        """Generation configuration with the section's output cap under the current run's budget."""
+        budget = current_budget()
+        if budget is not None and section in budget.output_tokens:
+            return dict(self.generation_config, max_output_tokens=budget.output_tokens[section])
+        return dict(self.generation_config, max_output_tokens=self._output_cap(section))
+    
+    def _plan_budget(self, paper_text: str, sections: List[str], document_type: str) -> Optional[PromptBudget]:
+        """
+        Size each section's excerpt and output cap to fit GEMINI_RUN_TOKEN_BUDGET.
+        
+        The instructions of every prompt are counted as they are; the document
+        excerpts and output caps share what is left, scaled down in proportion
+        when the run would otherwise exceed the budget.
+        
+        Args:
+            paper_text: Extracted text from the document
+            sections: Section keys the run will analyze
+            document_type: Selected document type
+            
+        Returns:
+            PromptBudget, or None when no run budget is configured
+        """
+        token_budget = int(os.getenv('GEMINI_RUN_TOKEN_BUDGET', '0'))
+        if token_budget <= 0 or not sections:
+            return None
+        
+        chars_per_token = get_token_estimator().chars_per_token
+        instructions = sum(estimate_tokens(getattr(self, f"_{key}_prompt")("", document_type)) for key in sections)
+        excerpt_chars = {key: min(len(paper_text), self.ANALYSIS_SECTIONS[key]['window']) for key in sections}
+        output_tokens = {key: self._output_cap(key) for key in sections}
+        
+        flexible = sum(excerpt_chars.values()) / chars_per_token + sum(output_tokens.values())
+        if instructions + flexible > token_budget:
+            scale = max(0.0, (token_budget - instructions) / flexible)
+            # Every prompt keeps enough document and answer room to stay useful
+            excerpt_chars = {key: max(min(chars, 1000), int(chars * scale)) for key, chars in excerpt_chars.items()}
+            output_tokens = {key: max(min(cap, 256), int(cap * scale)) for key, cap in output_tokens.items()}
+            if scale < 0.25:
+                logger.warning(f"Run token budget {token_budget} is tight for {len(sections)} sections; "
+                               f"excerpts and answers scaled to {scale:.0%}")
+        
+        logger.info(f"Planned run token budget {token_budget}: {instructions} instruction tokens, "
+                    f"{sum(excerpt_chars.values())} excerpt characters, {sum(output_tokens.values())} output tokens")
+        return PromptBudget(excerpt_chars, output_tokens, token_budget)
+    
+    async def _open_run_context_async(self, paper_text: str, sections: List[str]) -> Optional[DocumentContext]:
+        """
+        Upload the document once for the sections of an analysis run.
+        
+        With the caching API the whole document is cached, so section prompts
+        carry only their instructions and the model reads more than the excerpt
+        they would have embedded; documents below GEMINI_CONTEXT_CACHE_MIN_TOKENS
+        are sent inline as before. The local stand-in holds the prefix excerpt
+        the sections would otherwise embed and resends it with every prompt.
+        Only the prefix excerpt strategy is cached, since retrieval gives every
+        section different passages.
+        
+        Args:
+            paper_text: Extracted text from the document
+            sections: Section keys that will be analyzed one prompt each
+            
+        Returns:
+            DocumentContext, or None if context caching is off or not applicable
+        """
+        mode = context_cache_mode()
+        if not sections or self.excerpt_strategy != 'prefix' or mode not in ('gemini', 'local'):
+            return None
+        if mode == 'gemini' and not get_backend().supports_context_cache:
+            mode = 'local'
+        document = paper_text
+        if mode == 'local':
+            document = paper_text[:max(self._excerpt_chars(key) for key in sections)]
+        with self._model_lock:
+            model_name, model = self.resolved_model_name, self.model
+        return await call_in_thread(open_document_context, model_name, model, document, mode)
+    
+    def _cached_section_prompt(self, section: str, paper_text: str, document_type: str,
+                               context: DocumentContext) -> str:
+        """Build an instruction-only section prompt and account for the excerpt it no longer carries."""
+        prompt = getattr(self, f"_{section}_prompt")(self.CACHED_DOCUMENT_REFERENCE, document_type)
+        context.record(prompt, self._section_prompt(section, paper_text, document_type))
+        return prompt
+    
+    async def _analyze_with_context_async(self, section: str, paper_text: str, document_type: str,
+                                          context: DocumentContext) -> str:
+        """Analyze one section against the cached document."""
+        prompt = self._cached_section_prompt(section, paper_text, document_type, context)
+        return await self._make_api_call_with_retry_async(
+            prompt, operation_name=self.ANALYSIS_SECTIONS[section]['title'],
+            generation_config=self._section_config(section), context=context
+        )
+    
+    def analyze_bundled(self, paper_text: str, sections: List[str], document_type: str = "🔬 Research Paper",
+                        max_workers: int = 1) -> Dict[str, str]:
+        """Synchronous wrapper around analyze_bundled_async."""
+        return run_sync(self.analyze_bundled_async(paper_text, sections, document_type, max_workers))
+    
+    async def analyze_bundled_async(self, paper_text: str, sections: List[str],
+                                    document_type: str = "🔬 Research Paper", max_workers: int = 1) -> Dict[str, str]:
+        """
+        Analyze several sections with one request per bundle instead of one per section.
+        
+        The document is sent once per bundle together with each section's usual
+        instructions, and the model answers with a JSON object keyed by section.
+        Bundles hold at most GEMINI_BUNDLE_SIZE sections so long answers stay
+        inside the output token limit.
+        
+        Args:
+            paper_text: Extracted text from the document
+            sections: Keys from ANALYSIS_SECTIONS to analyze
+            document_type: Selected document type
+            max_workers: Maximum number of bundles requested concurrently
+            
+        Returns:
+            Dictionary with the sections that came back valid; missing or
+            malformed sections are left out for the caller to retry individually
+        """
+        bundle_size = max(1, int(os.getenv('GEMINI_BUNDLE_SIZE', '6')))
+        bundles = [sections[i:i + bundle_size] for i in range(0, len(sections), bundle_size)]
+        semaphore = asyncio.Semaphore(max(1, max_workers))
+        
+        async def run_bundle(bundle: List[str]) -> Dict[str, str]:
+            prompt = self._bundled_prompt(paper_text, bundle, document_type)
+            # One answer holds every section, so the bundle gets the sum of their caps
+            bundle_config = dict(
+                self.generation_config, response_mime_type='application/json',
+                max_output_tokens=min(self.generation_config['max_output_tokens'],
+                                      sum(self._section_config(key)['max_output_tokens'] for key in bundle))
+            )
+            async with semaphore:
+                response_text = await self._make_api_call_with_retry_async(
+                    prompt, operation_name=f"bundled analysis ({', '.join(bundle)})",
+                    generation_config=bundle_config
+                )
+            return self._parse_bundled_response(response_text, bundle)
+        
+        results = {}
+        for bundle_results in await asyncio.gather(*(run_bundle(bundle) for bundle in bundles)):
+            results.update(bundle_results)
+        
+        missing = [key for key in sections if key not in results]
+        if missing:
+            logger.warning(f"Bundled analysis missing sections {missing}, falling back to individual calls")
+        return results
+    
+    def _bundled_prompt(self, paper_text: str, sections: List[str], document_type: str) -> str:
+        """Combine the instructions of several sections around a single copy of the document."""
+        window = max(self._excerpt_chars(key) for key in sections)
+        keys = ', '.join(f'"{key}"' for key in sections)
+        
+        parts = [f"""
+        You are preparing several analyses of the same academic document in a single response.
+        Respond with ONLY a JSON object whose keys are exactly: {keys}.
+        Each value must be a Markdown string containing the complete analysis for that key,
+        written exactly as the matching section instructions below ask.
+        """]
+        for key in sections:
+            instructions = getattr(self, f"_{key}_prompt")(self.SHARED_DOCUMENT_REFERENCE, document_type)
+            parts.append(f"=== SECTION \"{key}\" ({self.ANALYSIS_SECTIONS[key]['title']}) ===\n{instructions}")
+        parts.append(f"DOCUMENT:\n{paper_text[:window]}")
+        
+        return "\n\n".join(parts)
+    
+    def _parse_bundled_response(self, response_text: str, sections: List[str]) -> Dict[str, str]:
+        """
+        Split a bundled JSON response back into per-section results.
+        
+        Args:
+            response_text: Raw model response
+            sections: Section keys the bundle asked for
+            
+        Returns:
+            Dictionary of the sections with a non-empty string value
+        """
+        start, end = response_text.find('{'), response_text.rfind('}')
+        if start == -1 or end <= start:
+            logger.warning("Bundled analysis returned no JSON object")
+            return {}
+        
+        try:
+            payload = json.loads(response_text[start:end + 1])
+        except json.JSONDecodeError as e:
+            logger.warning(f"Could not parse bundled analysis response: {e}")
+            return {}
+        
+        if not isinstance(payload, dict):
+            return {}
+        
+        return {
+            key: payload[key].strip()
+            for key in sections
+            if isinstance(payload.get(key), str) and payload[key].strip()
+        }
     
     def generate_summary(self, paper_text: str, document_type: str = "🔬 Research Paper") -> str:
         """Generate an intelligent summary based on document type."""
-        
+        return run_sync(self.analyze_section_async('summary', paper_text, document_type))
+    
+    def _summary_prompt(self, excerpt: str, document_type: str) -> str:
+        """Build the summary prompt around a document excerpt."""
         if "Research Paper" in document_type:
             # Research paper summary
             prompt = f"""
@@ -298,7 +1454,7 @@ class GeminiAnalyzer:
             Limit to 300-400 words.
 
             PAPER TEXT:
-            {paper_text[:4000]}
+            {excerpt}
             """
         elif document_type in ["📚 Textbook Chapter", "📝 Lecture Notes", "🗒️ Class Handout"]:
             # Study material summary
@@ -317,7 +1473,7 @@ class GeminiAnalyzer:
             Limit to 300-400 words.
 
             STUDY MATERIAL TEXT:
-            {paper_text[:4000]}
+            {excerpt}
             """
         elif document_type in ["📋 Assignment/Homework", "📄 Article/Essay"]:
             # Assignment/Essay summary
@@ -335,7 +1491,7 @@ class GeminiAnalyzer:
             Limit to 300-400 words.
 
             CONTENT TEXT:
-            {paper_text[:4000]}
+            {excerpt}
             """
         elif document_type in ["📊 Report/Thesis", "🎓 Study Guide"]:
             # Report/Guide summary
@@ -353,7 +1509,7 @@ class GeminiAnalyzer:
             Limit to 300-400 words.
 
             DOCUMENT TEXT:
-            {paper_text[:4000]}
+            {excerpt}
             """
         else:
             # General academic material summary
@@ -371,14 +1527,17 @@ class GeminiAnalyzer:
             Limit to 300-400 words.
 
             ACADEMIC TEXT:
-            {paper_text[:4000]}
+            {excerpt}
             """
         
-        return self._make_api_call_with_retry(prompt, max_retries=5, operation_name="summary generation")
+        return prompt
     
     def analyze_methodology(self, paper_text: str) -> str:
         """Analyze the research methodology in detail."""
-        
+        return run_sync(self.analyze_section_async('methodology', paper_text))
+    
+    def _methodology_prompt(self, excerpt: str, document_type: str) -> str:
+        """Build the methodology analysis prompt around a document excerpt."""
         prompt = f"""
         As a research methodology expert, analyze the research methods used in this paper. 
         Provide a detailed breakdown:
@@ -396,14 +1555,17 @@ class GeminiAnalyzer:
         Suggest improvements or alternative approaches.
 
         PAPER TEXT:
-        {paper_text[:4000]}
+        {excerpt}
         """
         
-        return self._make_api_call_with_retry(prompt, max_retries=5, operation_name="methodology analysis")
+        return prompt
     
     def identify_research_gaps(self, paper_text: str) -> str:
         """Identify research gaps and future directions."""
-        
+        return run_sync(self.analyze_section_async('gaps', paper_text))
+    
+    def _gaps_prompt(self, excerpt: str, document_type: str) -> str:
+        """Build the research gaps prompt around a document excerpt."""
         prompt = f"""
         As a research strategist, identify research gaps and future opportunities based on this paper:
 
@@ -420,19 +1582,17 @@ class GeminiAnalyzer:
         Suggest specific research questions for future studies.
 
         PAPER TEXT:
-        {paper_text[:4000]}
+        {excerpt}
         """
         
-        try:
-            response = self.model.generate_content(prompt, generation_config=self.generation_config)
-            return response.text
-        except Exception as e:
-            logger.error(f"Error identifying research gaps: {str(e)}")
-            return f"Error identifying research gaps: {str(e)}"
+        return prompt
     
     def detailed_analysis(self, paper_text: str, document_type: str = "🔬 Research Paper") -> str:
         """Provide comprehensive detailed analysis based on document type."""
-        
+        return run_sync(self.analyze_section_async('detailed', paper_text, document_type))
+    
+    def _detailed_prompt(self, excerpt: str, document_type: str) -> str:
+        """Build the detailed analysis prompt around a document excerpt."""
         if "Research Paper" in document_type:
             # Research paper detailed analysis
             prompt = f"""
@@ -470,7 +1630,7 @@ class GeminiAnalyzer:
             Provide specific examples and evidence for your assessments.
 
             PAPER TEXT:
-            {paper_text[:4000]}
+            {excerpt}
             """
         else:
             # Study material detailed analysis
@@ -508,18 +1668,17 @@ class GeminiAnalyzer:
             Focus on practical study and learning insights.
 
             STUDY MATERIAL TEXT:
-            {paper_text[:4000]}
+            {excerpt}
             """
         
-        try:
-            response = self.model.generate_content(prompt, generation_config=self.generation_config)
-            return response.text
-        except Exception as e:
-            logger.error(f"Error in detailed analysis: {str(e)}")
-            return f"Error in detailed analysis: {str(e)}"
+        return prompt
     
     def compare_papers(self, papers_data: List[Dict[str, str]]) -> str:
         """Compare multiple research papers."""
+        return run_sync(self.compare_papers_async(papers_data))
+    
+    async def compare_papers_async(self, papers_data: List[Dict[str, str]]) -> str:
+        """Async variant of compare_papers."""
         
         # This would be implemented for multi-paper comparison
         prompt = f"""
@@ -537,14 +1696,17 @@ class GeminiAnalyzer:
         """
         
         try:
-            response = self.model.generate_content(prompt, generation_config=self.generation_config)
-            return response.text
+            return await self._generate_with_retry_async(prompt, "paper comparison")
         except Exception as e:
             logger.error(f"Error comparing papers: {str(e)}")
             return f"Error comparing papers: {str(e)}"
     
     def suggest_related_papers(self, paper_text: str) -> str:
         """Generate suggestions for related papers and research areas."""
+        return run_sync(self.suggest_related_papers_async(paper_text))
+    
+    async def suggest_related_papers_async(self, paper_text: str) -> str:
+        """Async variant of suggest_related_papers."""
         
         prompt = f"""
         As a research librarian and academic expert, analyze this research paper and suggest related papers, topics, and search strategies:
@@ -584,14 +1746,17 @@ class GeminiAnalyzer:
         """
         
         try:
-            response = self.model.generate_content(prompt, generation_config=self.generation_config)
-            return response.text
+            return await self._generate_with_retry_async(prompt, "related paper suggestions")
         except Exception as e:
             logger.error(f"Error generating related paper suggestions: {str(e)}")
             return f"Error generating related paper suggestions: {str(e)}"
     
     def generate_research_questions(self, paper_text: str) -> str:
         """Generate potential research questions based on the paper content."""
+        return run_sync(self.generate_research_questions_async(paper_text))
+    
+    async def generate_research_questions_async(self, paper_text: str) -> str:
+        """Async variant of generate_research_questions."""
         
         prompt = f"""
         As a research methodology expert, analyze this paper and generate meaningful research questions for future investigation:
@@ -635,14 +1800,24 @@ class GeminiAnalyzer:
         """
         
         try:
-            response = self.model.generate_content(prompt, generation_config=self.generation_config)
-            return response.text
+            return await self._generate_with_retry_async(prompt, "research question generation")
         except Exception as e:
             logger.error(f"Error generating research questions: {str(e)}")
             return f"Error generating research questions: {str(e)}"
     
-    def build_hypotheses(self, paper_text: str) -> str:
-        """Generate new hypotheses based on the paper's findings and gaps."""
+    def build_hypotheses(self, paper_text: str, prior_results: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Generate new hypotheses based on the paper's findings and gaps.
+        
+        With prior_results (an analyze_paper result) containing any of
+        TOOL_INPUTS['hypotheses'], the prompt is built from those analyses
+        instead of the paper text.
+        """
+        return run_sync(self.build_hypotheses_async(paper_text, prior_results))
+    
+    async def build_hypotheses_async(self, paper_text: str, prior_results: Optional[Dict[str, Any]] = None) -> str:
+        """Async variant of build_hypotheses."""
+        excerpt = self._tool_excerpt('hypotheses', paper_text, prior_results, 4000)
         
         prompt = f"""
         As a scientific theorist and hypothesis developer, analyze this research paper and propose new testable hypotheses:
@@ -682,18 +1857,28 @@ class GeminiAnalyzer:
         Format each hypothesis as: "H: [Testable statement]" followed by brief justification and suggested testing approach.
 
         PAPER TEXT:
-        {paper_text[:4000]}
+        {excerpt}
         """
         
         try:
-            response = self.model.generate_content(prompt, generation_config=self.generation_config)
-            return response.text
+            return await self._generate_with_retry_async(prompt, "hypothesis building")
         except Exception as e:
             logger.error(f"Error building hypotheses: {str(e)}")
             return f"Error building hypotheses: {str(e)}"
     
-    def generate_research_proposal(self, paper_text: str) -> str:
-        """Generate a research proposal based on the paper's findings and gaps."""
+    def generate_research_proposal(self, paper_text: str, prior_results: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Generate a research proposal based on the paper's findings and gaps.
+        
+        With prior_results containing any of TOOL_INPUTS['proposal'], the
+        prompt is built from those analyses instead of the paper text.
+        """
+        return run_sync(self.generate_research_proposal_async(paper_text, prior_results))
+    
+    async def generate_research_proposal_async(self, paper_text: str,
+                                               prior_results: Optional[Dict[str, Any]] = None) -> str:
+        """Async variant of generate_research_proposal."""
+        excerpt = self._tool_excerpt('proposal', paper_text, prior_results, 4000)
         
         prompt = f"""
         As a grant writing expert and research strategist, analyze this paper and draft a compelling research proposal outline:
@@ -746,12 +1931,11 @@ class GeminiAnalyzer:
         Format as a professional research proposal outline ready for grant applications.
 
         PAPER TEXT:
-        {paper_text[:4000]}
+        {excerpt}
         """
         
         try:
-            response = self.model.generate_content(prompt, generation_config=self.generation_config)
-            return response.text
+            return await self._generate_with_retry_async(prompt, "research proposal generation")
         except Exception as e:
             logger.error(f"Error generating research proposal: {str(e)}")
             return f"Error generating research proposal: {str(e)}"
@@ -765,8 +1949,24 @@ class GeminiAnalyzer:
             num_cards: Number of flashcards to generate
             
         Returns:
-            JSON formatted flashcards with term/definition pairs
+            JSON array of {"front", "back"} objects constrained by FLASHCARD_SCHEMA
+            (parse it with parse_flashcards)
         """
+        return run_sync(self.generate_flashcards_async(content, num_cards))
+    
+    async def generate_flashcards_async(self, content: str, num_cards: int = 15) -> str:
+        """Async variant of generate_flashcards."""
+        prompt = self._flashcards_prompt(content[:6000], num_cards)
+        
+        try:
+            return await self._generate_with_retry_async(prompt, "flashcard generation",
+                                                         self._structured_config(FLASHCARD_SCHEMA))
+        except Exception as e:
+            logger.error(f"Error generating flashcards: {str(e)}")
+            return f"Error generating flashcards: {str(e)}"
+    
+    def _flashcards_prompt(self, excerpt: str, num_cards: int) -> str:
+        """Build the flashcards prompt around a material excerpt."""
         prompt = f"""
         You are an educational content expert. Create {num_cards} high-quality flashcards from the following academic material.
         
@@ -800,15 +2000,38 @@ class GeminiAnalyzer:
         ]
         
         ACADEMIC MATERIAL:
-        {content[:6000]}
+        {excerpt}
         """
         
-        try:
-            response = self.model.generate_content(prompt, generation_config=self.generation_config)
-            return response.text
-        except Exception as e:
-            logger.error(f"Error generating flashcards: {str(e)}")
-            return f"Error generating flashcards: {str(e)}"
+        return prompt
+    
+    def stream_flashcards(self, content: str, num_cards: int = 15,
+                          metrics: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+        """
+        Streaming variant of generate_flashcards.
+        
+        Args:
+            content: The educational content text
+            num_cards: Number of flashcards to generate
+            metrics: Optional dictionary filled with time-to-first-token and total time
+            
+        Yields:
+            Chunks of the JSON flashcard response; feed them to a
+            JsonArrayStreamParser to get each card as soon as it is complete
+        """
+        return iterate_sync(self.stream_flashcards_async(content, num_cards, metrics))
+    
+    async def stream_flashcards_async(self, content: str, num_cards: int = 15,
+                                      metrics: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        """Async variant of stream_flashcards."""
+        prompt = self._flashcards_prompt(content[:6000], num_cards)
+        async for chunk in self._stream_prompt_async(prompt, "flashcard generation", metrics,
+                                                     generation_config=self._structured_config(FLASHCARD_SCHEMA)):
+            yield chunk
+    
+    def _structured_config(self, schema: Dict[str, Any]) -> Dict[str, Any]:
+        """Generation configuration that constrains the answer to JSON matching a response schema."""
+        return dict(self.generation_config, response_mime_type='application/json', response_schema=schema)
     
     def create_practice_questions(self, content: str, question_types: List[str] = None) -> str:
         """
@@ -819,11 +2042,27 @@ class GeminiAnalyzer:
             question_types: List of question types to include
             
         Returns:
-            Structured practice questions
+            JSON array of question objects constrained by PRACTICE_QUESTION_SCHEMA
+            (parse it with parse_practice_questions)
         """
+        return run_sync(self.create_practice_questions_async(content, question_types))
+    
+    async def create_practice_questions_async(self, content: str, question_types: List[str] = None) -> str:
+        """Async variant of create_practice_questions."""
         if question_types is None:
             question_types = ["multiple_choice", "short_answer", "essay"]
             
+        prompt = self._practice_questions_prompt(content[:6000], question_types)
+        
+        try:
+            return await self._generate_with_retry_async(prompt, "practice question creation",
+                                                         self._structured_config(PRACTICE_QUESTION_SCHEMA))
+        except Exception as e:
+            logger.error(f"Error creating practice questions: {str(e)}")
+            return f"Error creating practice questions: {str(e)}"
+    
+    def _practice_questions_prompt(self, excerpt: str, question_types: List[str]) -> str:
+        """Build the practice questions prompt around a material excerpt."""
         prompt = f"""
         You are an expert educator creating comprehensive practice questions from academic material.
         
@@ -857,48 +2096,77 @@ class GeminiAnalyzer:
         • Test application, not just recall
         • Include Bloom's taxonomy levels
         
-        **FORMAT:**
-        ## MULTIPLE CHOICE QUESTIONS
-        
-        1. Question text
-        A) Option 1
-        B) Option 2  
-        C) Option 3
-        D) Option 4
-        **Answer: B**
-        
-        ## SHORT ANSWER QUESTIONS
+        Only create questions of the selected types.
         
-        1. Question text
-        **Model Answer:** Brief explanation
-        
-        ## ESSAY QUESTIONS
-        
-        1. Question text
-        **Key Points:** Main concepts to address
+        Return as JSON array with one object per question in this exact format:
+        [
+            {{"type": "multiple_choice", "question": "Question text", "options": ["Option 1", "Option 2", "Option 3", "Option 4"], "answer": "B", "difficulty": "basic"}},
+            {{"type": "short_answer", "question": "Question text", "options": [], "answer": "Brief model answer", "difficulty": "intermediate"}},
+            {{"type": "essay", "question": "Question text", "options": [], "answer": "Key points to address", "difficulty": "advanced"}}
+        ]
         
         ACADEMIC MATERIAL:
-        {content[:6000]}
+        {excerpt}
         """
         
-        try:
-            response = self.model.generate_content(prompt, generation_config=self.generation_config)
-            return response.text
-        except Exception as e:
-            logger.error(f"Error creating practice questions: {str(e)}")
-            return f"Error creating practice questions: {str(e)}"
+        return prompt
+    
+    def stream_practice_questions(self, content: str, question_types: List[str] = None,
+                                  metrics: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+        """
+        Streaming variant of create_practice_questions.
+        
+        Args:
+            content: The educational content text
+            question_types: List of question types to include
+            metrics: Optional dictionary filled with time-to-first-token and total time
+            
+        Yields:
+            Chunks of the JSON practice question response
+        """
+        return iterate_sync(self.stream_practice_questions_async(content, question_types, metrics))
+    
+    async def stream_practice_questions_async(self, content: str, question_types: List[str] = None,
+                                              metrics: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        """Async variant of stream_practice_questions."""
+        if question_types is None:
+            question_types = ["multiple_choice", "short_answer", "essay"]
+        prompt = self._practice_questions_prompt(content[:6000], question_types)
+        config = self._structured_config(PRACTICE_QUESTION_SCHEMA)
+        async for chunk in self._stream_prompt_async(prompt, "practice question creation", metrics,
+                                                     generation_config=config):
+            yield chunk
     
-    def build_study_guide(self, content: str, topic_name: str = "Academic Material") -> str:
+    def build_study_guide(self, content: str, topic_name: str = "Academic Material",
+                          prior_results: Optional[Dict[str, Any]] = None) -> str:
         """
         Create a comprehensive study guide from class material.
         
         Args:
             content: The educational content text
             topic_name: Name/title of the academic topic
+            prior_results: Optional analyze_paper result; its TOOL_INPUTS['study_guide']
+                sections replace the material text in the prompt
             
         Returns:
             Formatted study guide
         """
+        return run_sync(self.build_study_guide_async(content, topic_name, prior_results))
+    
+    async def build_study_guide_async(self, content: str, topic_name: str = "Academic Material",
+                                      prior_results: Optional[Dict[str, Any]] = None) -> str:
+        """Async variant of build_study_guide."""
+        prompt = self._study_guide_prompt(self._tool_excerpt('study_guide', content, prior_results, 6000),
+                                          topic_name)
+        
+        try:
+            return await self._generate_with_retry_async(prompt, "study guide creation")
+        except Exception as e:
+            logger.error(f"Error building study guide: {str(e)}")
+            return f"Error building study guide: {str(e)}"
+    
+    def _study_guide_prompt(self, excerpt: str, topic_name: str) -> str:
+        """Build the study guide prompt around a material excerpt."""
         prompt = f"""
         You are an expert academic tutor creating a comprehensive study guide for "{topic_name}".
         
@@ -953,15 +2221,36 @@ class GeminiAnalyzer:
         • Highlight critical information
         
         ACADEMIC MATERIAL:
-        {content[:6000]}
+        {excerpt}
         """
         
-        try:
-            response = self.model.generate_content(prompt, generation_config=self.generation_config)
-            return response.text
-        except Exception as e:
-            logger.error(f"Error building study guide: {str(e)}")
-            return f"Error building study guide: {str(e)}"
+        return prompt
+    
+    def stream_study_guide(self, content: str, topic_name: str = "Academic Material",
+                           metrics: Optional[Dict[str, Any]] = None,
+                           prior_results: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+        """
+        Streaming variant of build_study_guide.
+        
+        Args:
+            content: The educational content text
+            topic_name: Name/title of the academic topic
+            metrics: Optional dictionary filled with time-to-first-token and total time
+            prior_results: Optional analyze_paper result to build the guide from
+            
+        Yields:
+            Chunks of the study guide
+        """
+        return iterate_sync(self.stream_study_guide_async(content, topic_name, metrics, prior_results))
+    
+    async def stream_study_guide_async(self, content: str, topic_name: str = "Academic Material",
+                                       metrics: Optional[Dict[str, Any]] = None,
+                                       prior_results: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        """Async variant of stream_study_guide."""
+        prompt = self._study_guide_prompt(self._tool_excerpt('study_guide', content, prior_results, 6000),
+                                          topic_name)
+        async for chunk in self._stream_prompt_async(prompt, "study guide creation", metrics):
+            yield chunk
     
     def analyze_class_material(self, content: str, material_type: str = "textbook") -> Dict[str, Any]:
         """
@@ -974,6 +2263,10 @@ class GeminiAnalyzer:
         Returns:
             Dictionary with educational analysis
         """
+        return run_sync(self.analyze_class_material_async(content, material_type))
+
+    async def analyze_class_material_async(self, content: str, material_type: str = "textbook") -> Dict[str, Any]:
+        """Async variant of analyze_class_material."""
         prompt = f"""
         You are an educational content analyzer. Analyze this {material_type} material and provide insights for effective studying.
         
@@ -1016,11 +2309,11 @@ class GeminiAnalyzer:
         """
         
         try:
-            response = self.model.generate_content(prompt, generation_config=self.generation_config)
+            analysis_text = await self._generate_with_retry_async(prompt, "class material analysis")
             
             # Return structured analysis
             return {
-                'analysis': response.text,
+                'analysis': analysis_text,
                 'material_type': material_type,
                 'content_length': len(content),
                 'generated_at': time.strftime('%Y-%m-%d %H:%M:%S')
@@ -1038,6 +2331,10 @@ class GeminiAnalyzer:
     # New analysis methods for different document types
     def extract_key_concepts(self, content: str, document_type: str) -> str:
         """Extract key concepts from study materials."""
+        return run_sync(self.analyze_section_async('concepts', content, document_type))
+
+    def _concepts_prompt(self, excerpt: str, document_type: str) -> str:
+        """Build the key concepts prompt around a document excerpt."""
         prompt = f"""
         As an educational expert, identify and explain the key concepts from this study material:
 
@@ -1050,13 +2347,17 @@ class GeminiAnalyzer:
 
         Present in a clear, study-friendly format.
 
-        CONTENT: {content[:4000]}
+        CONTENT: {excerpt}
         """
         
-        return self._make_api_call_with_retry(prompt, max_retries=5, operation_name="key concepts extraction")
+        return prompt
 
     def extract_examples_cases(self, content: str, document_type: str) -> str:
         """Extract examples and case studies."""
+        return run_sync(self.analyze_section_async('examples', content, document_type))
+
+    def _examples_prompt(self, excerpt: str, document_type: str) -> str:
+        """Build the examples and cases prompt around a document excerpt."""
         prompt = f"""
         As an educational content analyst, identify and organize all examples and case studies:
 
@@ -1069,16 +2370,17 @@ class GeminiAnalyzer:
 
         Format for easy reference and study.
 
-        CONTENT: {content[:4000]}
+        CONTENT: {excerpt}
         """
-        try:
-            response = self.model.generate_content(prompt, generation_config=self.generation_config)
-            return response.text
-        except Exception as e:
-            return f"Error extracting examples: {str(e)}"
+        
+        return prompt
 
     def generate_study_questions(self, content: str, document_type: str) -> str:
         """Generate study questions from content."""
+        return run_sync(self.analyze_section_async('questions', content, document_type))
+
+    def _questions_prompt(self, excerpt: str, document_type: str) -> str:
+        """Build the study questions prompt around a document excerpt."""
         prompt = f"""
         As an educational assessment expert, create comprehensive study questions:
 
@@ -1091,13 +2393,17 @@ class GeminiAnalyzer:
 
         Include a mix of multiple choice, short answer, and essay questions.
 
-        CONTENT: {content[:4000]}
+        CONTENT: {excerpt}
         """
         
-        return self._make_api_call_with_retry(prompt, max_retries=5, operation_name="study questions generation")
+        return prompt
 
     def assess_difficulty(self, content: str, document_type: str) -> str:
         """Assess the difficulty level of content."""
+        return run_sync(self.analyze_section_async('difficulty', content, document_type))
+
+    def _difficulty_prompt(self, excerpt: str, document_type: str) -> str:
+        """Build the difficulty assessment prompt around a document excerpt."""
         prompt = f"""
         As an educational psychologist, assess the difficulty level of this content:
 
@@ -1110,16 +2416,17 @@ class GeminiAnalyzer:
 
         Provide practical guidance for students.
 
-        CONTENT: {content[:4000]}
+        CONTENT: {excerpt}
         """
-        try:
-            response = self.model.generate_content(prompt, generation_config=self.generation_config)
-            return response.text
-        except Exception as e:
-            return f"Error assessing difficulty: {str(e)}"
+        
+        return prompt
 
     def analyze_structure(self, content: str, document_type: str) -> str:
         """Analyze document structure."""
+        return run_sync(self.analyze_section_async('structure', content, document_type))
+
+    def _structure_prompt(self, excerpt: str, document_type: str) -> str:
+        """Build the structure analysis prompt around a document excerpt."""
         prompt = f"""
         As a document analysis expert, analyze the structure and organization:
 
@@ -1132,16 +2439,17 @@ class GeminiAnalyzer:
 
         Focus on how structure aids comprehension.
 
-        CONTENT: {content[:4000]}
+        CONTENT: {excerpt}
         """
-        try:
-            response = self.model.generate_content(prompt, generation_config=self.generation_config)
-            return response.text
-        except Exception as e:
-            return f"Error analyzing structure: {str(e)}"
+        
+        return prompt
 
     def analyze_arguments(self, content: str, document_type: str) -> str:
         """Analyze key arguments presented."""
+        return run_sync(self.analyze_section_async('arguments', content, document_type))
+
+    def _arguments_prompt(self, excerpt: str, document_type: str) -> str:
+        """Build the argument analysis prompt around a document excerpt."""
         prompt = f"""
         As an argumentation expert, identify and analyze the key arguments:
 
@@ -1154,16 +2462,17 @@ class GeminiAnalyzer:
 
         Focus on logical reasoning and evidence quality.
 
-        CONTENT: {content[:4000]}
+        CONTENT: {excerpt}
         """
-        try:
-            response = self.model.generate_content(prompt, generation_config=self.generation_config)
-            return response.text
-        except Exception as e:
-            return f"Error analyzing arguments: {str(e)}"
+        
+        return prompt
 
     def suggest_improvements(self, content: str, document_type: str) -> str:
         """Suggest improvements for academic work."""
+        return run_sync(self.analyze_section_async('improvements', content, document_type))
+
+    def _improvements_prompt(self, excerpt: str, document_type: str) -> str:
+        """Build the improvement suggestions prompt around a document excerpt."""
         prompt = f"""
         As an academic writing coach, suggest constructive improvements:
 
@@ -1176,16 +2485,17 @@ class GeminiAnalyzer:
 
         Provide specific, actionable suggestions.
 
-        CONTENT: {content[:4000]}
+        CONTENT: {excerpt}
         """
-        try:
-            response = self.model.generate_content(prompt, generation_config=self.generation_config)
-            return response.text
-        except Exception as e:
-            return f"Error suggesting improvements: {str(e)}"
+        
+        return prompt
 
     def extract_findings(self, content: str, document_type: str) -> str:
         """Extract key findings from reports/documents."""
+        return run_sync(self.analyze_section_async('findings', content, document_type))
+
+    def _findings_prompt(self, excerpt: str, document_type: str) -> str:
+        """Build the key findings prompt around a document excerpt."""
         prompt = f"""
         As a research analyst, identify and summarize key findings:
 
@@ -1198,16 +2508,17 @@ class GeminiAnalyzer:
 
         Present in clear, prioritized format.
 
-        CONTENT: {content[:4000]}
+        CONTENT: {excerpt}
         """
-        try:
-            response = self.model.generate_content(prompt, generation_config=self.generation_config)
-            return response.text
-        except Exception as e:
-            return f"Error extracting findings: {str(e)}"
+        
+        return prompt
 
     def extract_recommendations(self, content: str, document_type: str) -> str:
         """Extract recommendations from documents."""
+        return run_sync(self.analyze_section_async('recommendations', content, document_type))
+
+    def _recommendations_prompt(self, excerpt: str, document_type: str) -> str:
+        """Build the recommendations prompt around a document excerpt."""
         prompt = f"""
         As a policy analyst, identify and organize all recommendations:
 
@@ -1220,16 +2531,17 @@ class GeminiAnalyzer:
 
         Focus on actionable guidance.
 
-        CONTENT: {content[:4000]}
+        CONTENT: {excerpt}
         """
-        try:
-            response = self.model.generate_content(prompt, generation_config=self.generation_config)
-            return response.text
-        except Exception as e:
-            return f"Error extracting recommendations: {str(e)}"
+        
+        return prompt
 
     def extract_main_points(self, content: str, document_type: str) -> str:
         """Extract main points from any academic content."""
+        return run_sync(self.analyze_section_async('main_points', content, document_type))
+
+    def _main_points_prompt(self, excerpt: str, document_type: str) -> str:
+        """Build the main points prompt around a document excerpt."""
         prompt = f"""
         As a content analyst, identify and organize the main points:
 
@@ -1242,16 +2554,17 @@ class GeminiAnalyzer:
 
         Present in a clear, hierarchical format.
 
-        CONTENT: {content[:4000]}
+        CONTENT: {excerpt}
         """
-        try:
-            response = self.model.generate_content(prompt, generation_config=self.generation_config)
-            return response.text
-        except Exception as e:
-            return f"Error extracting main points: {str(e)}"
+        
+        return prompt
 
     def analyze_context(self, content: str, document_type: str) -> str:
         """Analyze the context and background."""
+        return run_sync(self.analyze_section_async('context', content, document_type))
+
+    def _context_prompt(self, excerpt: str, document_type: str) -> str:
+        """Build the context analysis prompt around a document excerpt."""
         prompt = f"""
         As a contextual analyst, provide background and situational context:
 
@@ -1264,16 +2577,17 @@ class GeminiAnalyzer:
 
         Help readers understand the bigger picture.
 
-        CONTENT: {content[:4000]}
+        CONTENT: {excerpt}
         """
-        try:
-            response = self.model.generate_content(prompt, generation_config=self.generation_config)
-            return response.text
-        except Exception as e:
-            return f"Error analyzing context: {str(e)}"
+        
+        return prompt
 
     def suggest_future_research(self, content: str) -> str:
         """Suggest future research directions."""
+        return run_sync(self.analyze_section_async('future_work', content))
+
+    def _future_work_prompt(self, excerpt: str, document_type: str) -> str:
+        """Build the future research prompt around a document excerpt."""
         prompt = f"""
         As a research strategist, suggest future research directions:
 
@@ -1286,16 +2600,17 @@ class GeminiAnalyzer:
 
         Focus on feasible and impactful research directions.
 
-        CONTENT: {content[:4000]}
+        CONTENT: {excerpt}
         """
-        try:
-            response = self.model.generate_content(prompt, generation_config=self.generation_config)
-            return response.text
-        except Exception as e:
-            return f"Error suggesting future research: {str(e)}"
+        
+        return prompt
 
     def extract_citations(self, content: str, document_type: str = "🔬 Research Paper") -> str:
         """Extract citations and references based on document type."""
+        return run_sync(self.analyze_section_async('citations', content, document_type))
+
+    def _citations_prompt(self, excerpt: str, document_type: str) -> str:
+        """Build the citations prompt around a document excerpt."""
         if "Research Paper" in document_type:
             prompt = f"""
             As a bibliography expert, extract and analyze citations:
@@ -1323,16 +2638,16 @@ class GeminiAnalyzer:
             Help readers understand the information foundation.
             """
         
-        prompt += f"\n\nCONTENT: {content[:4000]}"
+        prompt += f"\n\nCONTENT: {excerpt}"
         
-        try:
-            response = self.model.generate_content(prompt, generation_config=self.generation_config)
-            return response.text
-        except Exception as e:
-            return f"Error extracting references: {str(e)}"
+        return prompt
 
     def extract_keywords(self, content: str, document_type: str = "🔬 Research Paper") -> str:
         """Extract keywords and key terms based on document type."""
+        return run_sync(self.analyze_section_async('keywords', content, document_type))
+
+    def _keywords_prompt(self, excerpt: str, document_type: str) -> str:
+        """Build the keywords prompt around a document excerpt."""
         if "Research Paper" in document_type:
             prompt = f"""
             As a domain expert, extract research terminology:
@@ -1360,13 +2675,37 @@ class GeminiAnalyzer:
             Focus on vocabulary important for learning and comprehension.
             """
         
-        prompt += f"\n\nCONTENT: {content[:4000]}"
+        prompt += f"\n\nCONTENT: {excerpt}"
         
-        try:
-            response = self.model.generate_content(prompt, generation_config=self.generation_config)
-            return response.text
-        except Exception as e:
-            return f"Error extracting keywords: {str(e)}"
+        return prompt
+
+_shared_analyzers: Dict[str, GeminiAnalyzer] = {}
+_shared_analyzers_lock = threading.Lock()
+
+def get_shared_analyzer(model_name: str = "gemini-1.5-flash") -> GeminiAnalyzer:
+    """
+    Get the process-wide analyzer for a model, creating it on first use.
+    
+    The analyzer is safe to share across Streamlit sessions and threads. Its
+    model is re-validated through the registry only after a failure or once
+    GEMINI_MODEL_TTL has elapsed.
+    
+    Args:
+        model_name: Name of the Gemini model to use
+        
+    Returns:
+        Shared GeminiAnalyzer instance
+    """
+    with _shared_analyzers_lock:
+        analyzer = _shared_analyzers.get(model_name)
+    # Model probes can take seconds, so they never run under the lock every session takes
+    if analyzer is None:
+        created = GeminiAnalyzer(model_name)
+        with _shared_analyzers_lock:
+            analyzer = _shared_analyzers.setdefault(model_name, created)
+    else:
+        analyzer.refresh_model()
+    return analyzer
 
 # Example usage and testing
 if __name__ == "__main__":
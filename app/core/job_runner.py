@@ -0,0 +1,425 @@
+"""
+Analysis Job Runner Module
+Runs document analyses on a background worker pool with persisted, pollable job state
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class JobCancelled(Exception):
+    """Raised inside a worker when its job was cancelled."""
+
+
+class AnalysisJob:
+    """
+    State of one submitted analysis.
+
+    Status moves from 'queued' to 'extracting', 'analyzing' and finally
+    'completed', 'failed' or 'cancelled'. A job found on disk in a running
+    state after its process died is reported as 'interrupted'.
+    """
+
+    ACTIVE = ('queued', 'extracting', 'analyzing')
+
+    def __init__(self, job_id: str, document_name: str, analysis_options: Dict[str, Any],
+                 long_document: bool = False):
+        self.job_id = job_id
+        self.document_name = document_name
+        self.analysis_options = analysis_options
+        self.long_document = long_document
+        self.status = 'queued'
+        self.message = "Waiting for a free worker..."
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        # section key -> {'title', 'status' ('pending', 'running', 'done'), 'text'}
+        self.sections: Dict[str, Dict[str, Any]] = {}
+        self.results: Dict[str, Any] = {}
+        self.metrics: Dict[str, Dict[str, Any]] = {}
+        self.context_usage: Dict[str, Any] = {}
+        self.token_usage: Dict[str, Any] = {}
+        self.extracted_text = ""
+
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+
+    @property
+    def active(self) -> bool:
+        return self.status in self.ACTIVE
+
+    def progress(self) -> float:
+        """Fraction of the job done: extraction counts for 10%, each finished section for an equal share of the rest."""
+        with self._lock:
+            if self.status == 'completed':
+                return 1.0
+            if self.status in ('queued', 'extracting') or not self.sections:
+                return 0.0 if self.status == 'queued' else 0.05
+            done = sum(1 for section in self.sections.values() if section['status'] == 'done')
+            return 0.1 + 0.9 * done / len(self.sections)
+
+    def request_cancel(self) -> None:
+        """Ask the worker to stop at its next check between model calls."""
+        self._cancel.set()
+
+    def check_cancelled(self) -> None:
+        """Raise JobCancelled if cancellation was requested."""
+        if self._cancel.is_set():
+            raise JobCancelled(f"Job {self.job_id} was cancelled")
+
+    def update(self, **fields: Any) -> None:
+        with self._lock:
+            for name, value in fields.items():
+                setattr(self, name, value)
+
+    def begin_sections(self, sections: Dict[str, str]) -> None:
+        """Register the sections the analysis will produce, keyed by section with their titles."""
+        with self._lock:
+            self.sections = {key: {'title': title, 'status': 'pending', 'text': ""} for key, title in sections.items()}
+
+    def append_chunk(self, section: str, chunk: str) -> None:
+        with self._lock:
+            entry = self.sections[section]
+            entry['status'] = 'running'
+            entry['text'] += chunk
+
+    def finish_section(self, section: str) -> None:
+        with self._lock:
+            self.sections[section]['status'] = 'done'
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Get a consistent copy of the job's state.
+
+        Returns:
+            Dictionary with every persisted field plus 'progress'
+        """
+        progress = self.progress()
+        with self._lock:
+            return {
+                'job_id': self.job_id,
+                'document_name': self.document_name,
+                'analysis_options': dict(self.analysis_options),
+                'long_document': self.long_document,
+                'status': self.status,
+                'message': self.message,
+                'error': self.error,
+                'created_at': self.created_at,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+                'sections': {key: dict(value) for key, value in self.sections.items()},
+                'results': dict(self.results),
+                'metrics': {key: dict(value) for key, value in self.metrics.items()},
+                'context_usage': dict(self.context_usage),
+                'token_usage': dict(self.token_usage),
+                'cancel_requested': self._cancel.is_set(),
+                'progress': progress
+            }
+
+    @classmethod
+    def from_snapshot(cls, data: Dict[str, Any]) -> "AnalysisJob":
+        """Rebuild a job from a persisted snapshot."""
+        job = cls(data['job_id'], data['document_name'], data.get('analysis_options', {}),
+                  data.get('long_document', False))
+        for name in ('status', 'message', 'error', 'created_at', 'started_at', 'finished_at', 'sections',
+                     'results', 'metrics', 'context_usage', 'token_usage'):
+            if name in data:
+                setattr(job, name, data[name])
+        if data.get('cancel_requested'):
+            job._cancel.set()
+        return job
+
+
+class JobStore:
+    """
+    Job snapshots on disk, one JSON file per job plus the extracted text.
+
+    Files are replaced atomically so a reader never sees a half-written
+    snapshot, and jobs older than the retention period are removed.
+    """
+
+    def __init__(self, directory: Optional[str] = None, retention_seconds: Optional[int] = None):
+        """
+        Args:
+            directory: Folder for job files (defaults to GEMINI_JOB_DIR)
+            retention_seconds: How long finished jobs are kept (defaults to GEMINI_JOB_RETENTION)
+        """
+        self.directory = Path(directory or os.getenv('GEMINI_JOB_DIR', '.cache/jobs'))
+        if retention_seconds is None:
+            retention_seconds = int(os.getenv('GEMINI_JOB_RETENTION', '86400'))
+        self.retention_seconds = retention_seconds
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def save(self, job: AnalysisJob, include_text: bool = False) -> bool:
+        """
+        Persist a job's current state.
+
+        Args:
+            job: Job to store
+            include_text: Also store the extracted document text
+
+        Returns:
+            True if the job was written
+        """
+        try:
+            self._write(self.directory / f"{job.job_id}.json", json.dumps(job.snapshot(), ensure_ascii=False))
+            if include_text:
+                self._write(self.directory / f"{job.job_id}.txt", job.extracted_text)
+        except OSError as e:
+            logger.warning(f"Could not persist job {job.job_id}: {e}")
+            return False
+        return True
+
+    def load(self, job_id: str) -> Optional[AnalysisJob]:
+        """
+        Load a persisted job.
+
+        Args:
+            job_id: Job identifier
+
+        Returns:
+            The job, or None if it is unknown or unreadable
+        """
+        try:
+            data = json.loads((self.directory / f"{job_id}.json").read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return None
+        job = AnalysisJob.from_snapshot(data)
+        text_path = self.directory / f"{job_id}.txt"
+        if text_path.exists():
+            job.extracted_text = text_path.read_text(encoding='utf-8')
+        return job
+
+    def prune(self) -> None:
+        """Delete job files older than the retention period."""
+        cutoff = time.time() - self.retention_seconds
+        for path in self.directory.glob('*.*'):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except OSError:
+                pass
+
+    @staticmethod
+    def _write(path: Path, content: str) -> None:
+        temp = path.with_suffix(path.suffix + '.tmp')
+        temp.write_text(content, encoding='utf-8')
+        os.replace(temp, path)
+
+
+class JobRunner:
+    """
+    Worker pool for document analyses.
+
+    Submitting returns a job id at once; the Streamlit script keeps only that
+    id in st.session_state and polls the job on every rerun, so widget
+    interactions and reconnects neither abandon nor duplicate the work.
+    Only the most recently finished jobs stay in memory; older ones are
+    dropped once persisted and read back from disk when asked for.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, store: Optional[JobStore] = None,
+                 max_finished_jobs: Optional[int] = None):
+        """
+        Args:
+            max_workers: Analyses run at the same time (defaults to GEMINI_JOB_WORKERS)
+            store: Where job state is persisted (defaults to a JobStore from the environment)
+            max_finished_jobs: Persisted finished jobs kept in memory (defaults to GEMINI_JOB_MEMORY_LIMIT)
+        """
+        if max_workers is None:
+            max_workers = int(os.getenv('GEMINI_JOB_WORKERS', '2'))
+        if max_finished_jobs is None:
+            max_finished_jobs = int(os.getenv('GEMINI_JOB_MEMORY_LIMIT', '8'))
+        self.store = store or JobStore()
+        self.store.prune()
+        # How often a streaming job's partial text is written to disk
+        self.save_interval = float(os.getenv('GEMINI_JOB_SAVE_INTERVAL', '1.0'))
+        self.max_finished_jobs = max(0, max_finished_jobs)
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="analysis-job")
+        self._jobs: Dict[str, AnalysisJob] = {}
+        # Ids of finished jobs already on disk, oldest first
+        self._finished: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, file_bytes: bytes, file_name: str, analysis_options: Dict[str, Any],
+               long_document: bool = False) -> str:
+        """
+        Queue an analysis of an uploaded document.
+
+        Args:
+            file_bytes: Uploaded file content
+            file_name: Original file name (its extension selects the extractor)
+            analysis_options: Sections to analyze plus 'document_type', as for analyze_paper
+            long_document: Map-reduce long documents over their whole text
+
+        Returns:
+            Job id to poll with get()
+        """
+        job = AnalysisJob(uuid.uuid4().hex, file_name, analysis_options, long_document)
+        with self._lock:
+            self._jobs[job.job_id] = job
+        self.store.save(job)
+        self._executor.submit(self._run, job, file_bytes)
+        logger.info(f"Queued analysis job {job.job_id} for {file_name}")
+        return job.job_id
+
+    def get(self, job_id: str) -> Optional[AnalysisJob]:
+        """
+        Find a job by id, in this process or on disk.
+
+        Args:
+            job_id: Id returned by submit()
+
+        Returns:
+            The job, or None if it is unknown
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return job
+
+        job = self.store.load(job_id)
+        if job is not None and job.active:
+            # No worker in this process owns it, so its process must have stopped
+            job.update(status='interrupted', message="The analysis was interrupted by a server restart")
+        return job
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Request cancellation of a queued or running job.
+
+        Args:
+            job_id: Id returned by submit()
+
+        Returns:
+            True if the job was still active
+        """
+        job = self.get(job_id)
+        if job is None or not job.active:
+            return False
+        job.request_cancel()
+        job.update(message="Cancelling after the current model call...")
+        self.store.save(job)
+        return True
+
+    def _run(self, job: AnalysisJob, file_bytes: bytes) -> None:
+        try:
+            job.check_cancelled()
+            job.update(status='extracting', message="📄 Extracting text from document...", started_at=time.time())
+            self.store.save(job)
+            self._extract(job, file_bytes)
+            job.check_cancelled()
+            self._analyze(job)
+            job.update(status='completed', message="✅ Analysis complete!", finished_at=time.time())
+            logger.info(f"Analysis job {job.job_id} completed")
+        except JobCancelled:
+            job.update(status='cancelled', message="Analysis cancelled", finished_at=time.time())
+            logger.info(f"Analysis job {job.job_id} cancelled")
+        except Exception as e:
+            logger.error(f"Analysis job {job.job_id} failed: {str(e)}")
+            job.update(status='failed', message="❌ Error during analysis", error=str(e), finished_at=time.time())
+        finally:
+            if self.store.save(job, include_text=True):
+                self._retire(job.job_id)
+
+    def _retire(self, job_id: str) -> None:
+        """Drop the oldest finished jobs from memory once more than max_finished_jobs are kept."""
+        with self._lock:
+            self._finished[job_id] = None
+            while len(self._finished) > self.max_finished_jobs:
+                evicted, _ = self._finished.popitem(last=False)
+                # Its text and results stay on disk, where get() finds them
+                self._jobs.pop(evicted, None)
+
+    def _extract(self, job: AnalysisJob, file_bytes: bytes) -> None:
+        from .document_processor import DocumentProcessor
+
+        processor = DocumentProcessor()
+        # A repeated upload of the same document skips extraction entirely
+        key = processor.document_key(job.document_name, file_bytes)
+        document = processor.cached_document(key)
+        if document is None:
+            last_save = time.monotonic()
+
+            # Pages stream in, so progress is visible and a cancel is honoured mid-document
+            def on_page(pages: int, characters: int) -> None:
+                nonlocal last_save
+                job.check_cancelled()
+                job.update(message=f"📄 Extracting text ({characters:,} characters so far)...")
+                if time.monotonic() - last_save >= self.save_interval:
+                    self.store.save(job)
+                    last_save = time.monotonic()
+
+            # The upload is parsed from memory, so nothing is left behind in uploads/ if the job fails
+            document = processor.extract_document(job.document_name, file_bytes, on_page=on_page, key=key)
+        job.update(extracted_text=document.text)
+
+    def _analyze(self, job: AnalysisJob) -> None:
+        from .document_processor import DocumentProcessor
+        from .gemini_analyzer import get_shared_analyzer
+
+        analyzer = get_shared_analyzer()
+        # Index passages once so every section can pull its relevant excerpts; only retrieval uses them
+        if analyzer.excerpt_strategy == 'retrieval' and len(job.extracted_text) > 4000:
+            DocumentProcessor.build_passage_index(job.extracted_text)
+        options = job.analysis_options
+        job.begin_sections({key: spec['title'] for key, spec in analyzer.ANALYSIS_SECTIONS.items()
+                            if options.get(key)})
+        job.update(status='analyzing', message="🧠 Analyzing with Google Gemini AI...")
+        self.store.save(job)
+
+        metrics: Dict[str, Dict[str, Any]] = {}
+        context_usage: Dict[str, Any] = {}
+        token_usage: Dict[str, Any] = {}
+        stream = analyzer.stream_analysis(job.extracted_text, options, metrics=metrics,
+                                          long_document=job.long_document, context_usage=context_usage,
+                                          token_usage=token_usage)
+        last_save = time.monotonic()
+        try:
+            for section, chunk in stream:
+                # Closing the stream below cancels the model calls still in flight
+                job.check_cancelled()
+                if chunk is None:
+                    job.finish_section(section)
+                    done = sum(1 for entry in job.sections.values() if entry['status'] == 'done')
+                    job.update(message=f"🧠 Finished {section.replace('_', ' ')} ({done}/{len(job.sections)})...")
+                else:
+                    job.append_chunk(section, chunk)
+                if chunk is None or time.monotonic() - last_save >= self.save_interval:
+                    self.store.save(job)
+                    last_save = time.monotonic()
+        finally:
+            stream.close()
+
+        results: Dict[str, Any] = {'document_type': options.get('document_type', '📖 Other Academic Material')}
+        results.update({key: entry['text'] for key, entry in job.sections.items()})
+        job.update(results=results, metrics=metrics, context_usage=context_usage, token_usage=token_usage)
+
+    def active_jobs(self) -> List[str]:
+        """Get the ids of jobs this process is still working on."""
+        with self._lock:
+            return [job_id for job_id, job in self._jobs.items() if job.active]
+
+
+_runner: Optional[JobRunner] = None
+_runner_lock = threading.Lock()
+
+def get_job_runner() -> JobRunner:
+    """Get the process-wide job runner, creating it on first use."""
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = JobRunner()
+        return _runner
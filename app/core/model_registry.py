@@ -0,0 +1,211 @@
+"""
+Gemini Model Registry Module
+Resolves a working Gemini model once per process and shares the configured client
+"""
+
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+
+from .backends import get_backend
+from .rate_limiter import get_rate_limiter
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class ModelRegistry:
+    """
+    Process-wide cache of the resolved Gemini model.
+
+    The first analyzer pays for the model listing and the "Hello" probe; every
+    later analyzer, session and thread reuses the same GenerativeModel until
+    the entry expires or a caller reports the model as failing. Models come
+    from the backend selected by GEMINI_BACKEND.
+    """
+
+    # Models confirmed to be available based on the list_models output, in preference order
+    WORKING_MODELS = [
+        "models/gemini-1.5-flash-latest",
+        "models/gemini-2.0-flash-exp",
+        "models/gemini-2.5-flash",
+        "models/gemini-2.0-flash",
+        "models/gemini-1.5-flash-8b-latest",
+        "models/gemini-flash-latest"
+    ]
+
+    def __init__(self, ttl_seconds: Optional[int] = None):
+        """
+        Initialize the registry.
+
+        Args:
+            ttl_seconds: How long a resolved model is trusted before it is
+                probed again (defaults to GEMINI_MODEL_TTL)
+        """
+        if ttl_seconds is None:
+            ttl_seconds = int(os.getenv('GEMINI_MODEL_TTL', '3600'))
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._configured: Optional[Tuple[str, str]] = None
+        # (backend, api key) -> (model name, model, resolved at)
+        self._resolved: Dict[Tuple[str, str], Tuple[str, Any, float]] = {}
+        # (backend, api key) -> WORKING_MODELS entries the last probe verified, resolved model first
+        self._verified: Dict[Tuple[str, str], List[str]] = {}
+        # (backend, api key) -> event set when the probe in progress for that key finishes
+        self._probing: Dict[Tuple[str, str], threading.Event] = {}
+
+    def resolve(self, api_key: str, model_name: str) -> Tuple[str, Any]:
+        """
+        Get the working model for an API key, probing only when needed.
+
+        Concurrent callers for the same key share one probe. If it fails,
+        the next waiter probes again.
+
+        Args:
+            api_key: Google API key
+            model_name: Requested model name, used if model listing fails
+
+        Returns:
+            Tuple of resolved model name and the shared model
+
+        Raises:
+            Exception: If no working model can be found
+        """
+        backend = get_backend()
+        key = (backend.name, api_key)
+        while True:
+            with self._lock:
+                if self._configured != key:
+                    backend.configure(api_key)
+                    self._configured = key
+
+                entry = self._resolved.get(key)
+                if entry and time.time() - entry[2] < self.ttl_seconds:
+                    return entry[0], entry[1]
+
+                probing = self._probing.get(key)
+                if probing is None:
+                    probing = self._probing[key] = threading.Event()
+                    break
+            # Another thread is probing this key; use its result once it finishes
+            probing.wait()
+
+        # Probe outside the lock so callers of is_valid, verified_models and
+        # invalidate never wait on the network or the rate limiter
+        try:
+            resolved_name, model, verified = self._probe(backend, model_name)
+            with self._lock:
+                self._resolved[key] = (resolved_name, model, time.time())
+                self._verified[key] = verified
+            return resolved_name, model
+        finally:
+            with self._lock:
+                del self._probing[key]
+            probing.set()
+
+    def verified_models(self, api_key: str) -> List[str]:
+        """
+        Get the models known to work for an API key.
+
+        Args:
+            api_key: Google API key
+
+        Returns:
+            The resolved model followed by the WORKING_MODELS entries that
+            list_models reported and that did not fail their probe, in
+            preference order (empty before the first resolve)
+        """
+        with self._lock:
+            return list(self._verified.get((get_backend().name, api_key), []))
+
+    def is_valid(self, api_key: str, resolved_name: str) -> bool:
+        """
+        Check whether a previously resolved model is still trusted.
+
+        Args:
+            api_key: Google API key
+            resolved_name: Model name the caller is currently using
+
+        Returns:
+            True if the registry entry exists, matches and has not expired
+        """
+        with self._lock:
+            entry = self._resolved.get((get_backend().name, api_key))
+            return bool(entry and entry[0] == resolved_name
+                        and time.time() - entry[2] < self.ttl_seconds)
+
+    def invalidate(self, resolved_name: Optional[str] = None) -> None:
+        """
+        Force the next resolve to probe again.
+
+        Args:
+            resolved_name: Only drop entries for this model (all entries if None)
+        """
+        with self._lock:
+            for key in [k for k, entry in self._resolved.items()
+                        if resolved_name is None or entry[0] == resolved_name]:
+                del self._resolved[key]
+        logger.info(f"Model registry invalidated: {resolved_name or 'all models'}")
+
+    def _probe(self, backend: Any, model_name: str) -> Tuple[str, Any, List[str]]:
+        """
+        Find the first model in WORKING_MODELS that answers a minimal prompt.
+
+        Returns:
+            Tuple of the model name, the model and the verified models: the
+            one that answered plus later WORKING_MODELS entries list_models
+            reported. Models list_models did not report are never probed or
+            routed to when the listing succeeded.
+        """
+        # List available models to debug
+        listed: Optional[set] = None
+        try:
+            available_models: List[str] = backend.list_models()
+            logger.info(f"Available models: {available_models}")
+            listed = {_bare_name(name) for name in available_models}
+        except Exception as e:
+            logger.warning(f"Could not list models: {e}, using default: {model_name}")
+
+        candidates = [name for name in self.WORKING_MODELS if listed is None or _bare_name(name) in listed]
+        if not candidates:
+            logger.warning("None of the working models were listed; probing all of them")
+            candidates = list(self.WORKING_MODELS)
+
+        for position, test_model in enumerate(candidates):
+            try:
+                model = backend.create_model(test_model)
+                get_rate_limiter().acquire(1)
+                # Test the model with a very simple prompt to verify it works
+                test_response = model.generate_content(
+                    "Hello",
+                    generation_config={
+                        'temperature': 0.1,
+                        'max_output_tokens': 5,
+                        'top_p': 0.8,
+                        'top_k': 40
+                    }
+                )
+                if test_response and test_response.text:
+                    logger.info(f"Successfully initialized and tested model: {test_model}")
+                    # Unprobed fallbacks are only trusted when the listing vouched for them
+                    fallbacks = candidates[position + 1:] if listed is not None else []
+                    return test_model, model, [test_model] + fallbacks
+            except Exception as model_error:
+                logger.warning(f"Model {test_model} failed: {str(model_error)[:200]}")
+                continue
+
+        raise Exception("No working model found - please check your API key quota")
+
+
+def _bare_name(model_name: str) -> str:
+    """Model name without the 'models/' prefix list_models may or may not include."""
+    return model_name[len('models/'):] if model_name.startswith('models/') else model_name
+
+
+_registry = ModelRegistry()
+
+def get_model_registry() -> ModelRegistry:
+    """Get the process-wide model registry."""
+    return _registry
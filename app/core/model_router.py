@@ -0,0 +1,385 @@
+"""
+Model Router Module
+Latency-aware routing across the verified Gemini models with circuit breakers and hedged requests
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+import logging
+
+from .backends import get_backend
+from .rate_limiter import get_rate_limiter
+from .retry_policy import RATE_LIMITED, TERMINAL, classify_error, is_model_unavailable
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class ModelHealth:
+    """
+    Rolling latency and error record of one model plus its circuit breaker.
+
+    The breaker is 'closed' while the model behaves, 'open' after it was
+    rate limited, reported missing or failed too often (no traffic until the
+    cooldown ends) and
+    'half_open' once the cooldown is over, when a single trial call decides
+    whether it closes again.
+    """
+
+    def __init__(self, window: int, error_threshold: float, min_samples: int, cooldown_seconds: float):
+        """
+        Args:
+            window: Number of recent calls the statistics cover
+            error_threshold: Error rate in the window that opens the breaker
+            min_samples: Calls needed before the error rate is trusted
+            cooldown_seconds: How long an open breaker keeps traffic away
+        """
+        self.error_threshold = error_threshold
+        self.min_samples = min_samples
+        self.cooldown_seconds = cooldown_seconds
+        self._samples: Deque[Tuple[float, bool]] = deque(maxlen=window)
+        self.state = 'closed'
+        self.open_until = 0.0
+        self.trial_in_flight = False
+        self.calls = 0
+        self.failures = 0
+
+    def available(self, now: float) -> bool:
+        """Whether a call may be sent to the model now."""
+        if self.state == 'open' and now >= self.open_until:
+            self.state = 'half_open'
+            self.trial_in_flight = False
+        if self.state == 'half_open':
+            return not self.trial_in_flight
+        return self.state == 'closed'
+
+    def record(self, seconds: float, ok: bool, rate_limited: bool, now: float, unavailable: bool = False) -> None:
+        """Add one finished call and update the breaker; a 429 or a missing model opens it at once."""
+        self.calls += 1
+        self._samples.append((seconds, ok))
+        if ok:
+            if self.state != 'closed':
+                logger.info("Circuit closed again after a successful trial call")
+            self.state = 'closed'
+            return
+
+        self.failures += 1
+        errors = sum(1 for _, sample_ok in self._samples if not sample_ok)
+        too_many = len(self._samples) >= self.min_samples and errors / len(self._samples) >= self.error_threshold
+        if rate_limited or unavailable or too_many or self.state == 'half_open':
+            self.state = 'open'
+            self.open_until = now + self.cooldown_seconds
+            self.trial_in_flight = False
+
+    def error_rate(self) -> float:
+        if not self._samples:
+            return 0.0
+        return sum(1 for _, ok in self._samples if not ok) / len(self._samples)
+
+    def latency_percentile(self, percentile: float, min_samples: int = 1) -> Optional[float]:
+        """Latency of successful calls at a percentile (None with fewer than min_samples)."""
+        latencies = sorted(seconds for seconds, ok in self._samples if ok)
+        if not latencies or len(latencies) < min_samples:
+            return None
+        return latencies[min(len(latencies) - 1, int(percentile * len(latencies)))]
+
+
+class ModelRouter:
+    """
+    Sends each request to the preferred healthy model.
+
+    Every call feeds the model's rolling latency and error statistics. A model
+    that is rate limited or keeps failing has its circuit opened and traffic
+    shifts to the next model in preference order until the cooldown is over.
+    Hedged calls fire a second request to the next healthy model when the
+    first has not answered within its p95 latency, and keep whichever answers
+    first.
+    """
+
+    def __init__(self, model_names: List[str], backend: Any = None):
+        """
+        Args:
+            model_names: Candidate model names in preference order
+            backend: Backend that creates the model handles (defaults to GEMINI_BACKEND)
+        """
+        self.backend = backend or get_backend()
+        self.model_names = list(model_names)
+        self.window = int(os.getenv('GEMINI_ROUTER_WINDOW', '50'))
+        self.error_threshold = float(os.getenv('GEMINI_ROUTER_ERROR_THRESHOLD', '0.5'))
+        self.min_samples = int(os.getenv('GEMINI_ROUTER_MIN_SAMPLES', '5'))
+        self.cooldown_seconds = float(os.getenv('GEMINI_ROUTER_COOLDOWN', '60'))
+        # Hedge delay used until a model has enough latency samples
+        self.default_hedge_delay = float(os.getenv('GEMINI_HEDGE_DELAY', '8'))
+
+        self._lock = threading.Lock()
+        self._models: Dict[str, Any] = {}
+        self._health: Dict[str, ModelHealth] = {}
+        self.hedges_fired = 0
+        self.hedges_won = 0
+
+    def register(self, model_name: str, model: Any, fallbacks: Optional[List[str]] = None) -> None:
+        """
+        Make a resolved model the preferred route.
+
+        Args:
+            model_name: Name the registry resolved
+            model: The shared model handle for that name
+            fallbacks: Verified models to route to when it is unhealthy, in
+                preference order (replaces the current fallbacks if given)
+        """
+        with self._lock:
+            self._models[model_name] = model
+            if fallbacks is not None:
+                self.model_names = list(fallbacks)
+            if model_name in self.model_names:
+                self.model_names.remove(model_name)
+            self.model_names.insert(0, model_name)
+
+    def route(self, count: int = 1) -> List[str]:
+        """
+        Pick models for a request, healthiest route first.
+
+        Args:
+            count: How many distinct models the caller may use
+
+        Returns:
+            Up to count model names whose circuits allow traffic, in preference
+            order; if every circuit is open, the model whose cooldown ends first
+        """
+        now = time.monotonic()
+        with self._lock:
+            chosen = [name for name in self.model_names if self._health_of(name).available(now)][:count]
+            if not chosen:
+                chosen = [min(self.model_names, key=lambda name: self._health_of(name).open_until)]
+            for name in chosen:
+                health = self._health_of(name)
+                if health.state == 'half_open':
+                    health.trial_in_flight = True
+            return chosen
+
+    def model(self, model_name: str) -> Any:
+        """Get the model handle for a name, creating it on first use."""
+        with self._lock:
+            model = self._models.get(model_name)
+            if model is None:
+                model = self.backend.create_model(model_name)
+                self._models[model_name] = model
+            return model
+
+    def record(self, model_name: str, seconds: float, error: Optional[BaseException] = None) -> None:
+        """
+        Feed one finished call into the model's statistics.
+
+        Args:
+            model_name: Model that served the call
+            seconds: Wall time of the call
+            error: Exception the call raised, if any
+        """
+        error_class = classify_error(error) if error is not None else None
+        unavailable = error is not None and is_model_unavailable(error)
+        if error_class == TERMINAL and not unavailable:
+            # Safety blocks and invalid requests say nothing about the model's health
+            error = None
+        rate_limited = error_class == RATE_LIMITED
+        with self._lock:
+            health = self._health_of(model_name)
+            was_open = health.state == 'open'
+            health.record(seconds, error is None, rate_limited, time.monotonic(), unavailable)
+            opened = health.state == 'open' and not was_open
+            error_rate = health.error_rate()
+        if opened:
+            if unavailable:
+                reason = 'model unavailable'
+            else:
+                reason = 'rate limited' if rate_limited else f'error rate {error_rate:.0%}'
+            logger.warning(f"Circuit opened for {model_name} ({reason}); "
+                           f"routing around it for {self.cooldown_seconds:.0f}s")
+
+    def release(self, model_name: str) -> None:
+        """Give back a route whose call ended without an outcome (cancelled or never sent)."""
+        with self._lock:
+            self._health_of(model_name).trial_in_flight = False
+
+    def has_healthy_route(self) -> bool:
+        """Whether any model currently accepts traffic."""
+        now = time.monotonic()
+        with self._lock:
+            return any(self._health_of(name).available(now) for name in self.model_names)
+
+    def hedge_delay(self, model_name: str) -> float:
+        """Seconds to wait for a model before hedging: its p95 latency once known."""
+        with self._lock:
+            p95 = self._health_of(model_name).latency_percentile(0.95, self.min_samples)
+        return p95 if p95 is not None else self.default_hedge_delay
+
+    async def generate_async(self, prompt: str, generation_config: Optional[Dict[str, Any]] = None,
+                             hedge: bool = False, tokens: int = 0) -> Tuple[str, Any]:
+        """
+        Send a prompt through the router.
+
+        Args:
+            prompt: The prompt to send
+            generation_config: Generation configuration for the call
+            hedge: Fire a second request to another model once the first is slower than its p95
+            tokens: Estimated prompt tokens, reserved with the rate limiter for a hedged request
+
+        A model that turns out to be missing (404) or forbidden has its
+        circuit opened and the prompt goes to the next healthy model at once.
+
+        Returns:
+            Tuple of the model name that answered and its response
+
+        Raises:
+            Exception: Whatever the model raised, once no request can still answer
+        """
+        while True:
+            try:
+                return await self._generate_once(prompt, generation_config, hedge, tokens)
+            except Exception as e:
+                if not is_model_unavailable(e) or not self.has_healthy_route():
+                    raise
+                logger.warning(f"Rerouting after an unavailable model: {str(e)[:200]}")
+                await get_rate_limiter().acquire_async(tokens)
+
+    async def _generate_once(self, prompt: str, generation_config: Optional[Dict[str, Any]], hedge: bool,
+                             tokens: int) -> Tuple[str, Any]:
+        """Send a prompt to the preferred route, hedged with the next one if requested."""
+        routes = self.route(2 if hedge else 1)
+        if len(routes) < 2:
+            return await self._call(routes[0], prompt, generation_config)
+
+        primary = asyncio.ensure_future(self._call(routes[0], prompt, generation_config))
+        pending = {primary}
+        hedged = False
+        try:
+            done, pending = await asyncio.wait(pending, timeout=self.hedge_delay(routes[0]))
+            if done:
+                return primary.result()
+
+            await get_rate_limiter().acquire_async(tokens)
+            with self._lock:
+                self.hedges_fired += 1
+            logger.info(f"Hedging slow {routes[0]} with {routes[1]}")
+            hedged = True
+            pending.add(asyncio.ensure_future(self._call(routes[1], prompt, generation_config)))
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for finished in done:
+                    if finished.exception() is None:
+                        if finished is not primary:
+                            with self._lock:
+                                self.hedges_won += 1
+                        return finished.result()
+                    error = error or finished.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+            if not hedged:
+                self.release(routes[1])
+
+    async def stream_async(self, prompt: str, generation_config: Optional[Dict[str, Any]] = None
+                           ) -> Tuple[str, Any]:
+        """
+        Open a streaming response on the preferred healthy model.
+
+        The caller reports the outcome with record() once the stream has been
+        consumed, since failures can surface while chunks are read.
+
+        Returns:
+            Tuple of the model name and its streaming response
+        """
+        while True:
+            name = self.route()[0]
+            start = time.monotonic()
+            try:
+                return name, await self.model(name).generate_content_async(
+                    prompt, generation_config=generation_config, stream=True
+                )
+            except Exception as e:
+                self.record(name, time.monotonic() - start, e)
+                if not is_model_unavailable(e) or not self.has_healthy_route():
+                    raise
+                logger.warning(f"Rerouting stream after an unavailable model: {str(e)[:200]}")
+                await get_rate_limiter().acquire_async()
+
+    async def _call(self, model_name: str, prompt: str, generation_config: Optional[Dict[str, Any]]
+                    ) -> Tuple[str, Any]:
+        start = time.monotonic()
+        try:
+            response = await self.model(model_name).generate_content_async(prompt, generation_config=generation_config)
+        except asyncio.CancelledError:
+            # A hedge loser says nothing about the model's health
+            self.release(model_name)
+            raise
+        except Exception as e:
+            self.record(model_name, time.monotonic() - start, e)
+            raise
+        self.record(model_name, time.monotonic() - start)
+        return model_name, response
+
+    def _health_of(self, model_name: str) -> ModelHealth:
+        health = self._health.get(model_name)
+        if health is None:
+            health = ModelHealth(self.window, self.error_threshold, self.min_samples, self.cooldown_seconds)
+            self._health[model_name] = health
+        return health
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get routing statistics per model.
+
+        Returns:
+            Dictionary keyed by model name with circuit state, call and failure
+            counts, error rate and p50/p95 latency, plus hedge counters under '_hedges'
+        """
+        with self._lock:
+            stats: Dict[str, Dict[str, Any]] = {
+                name: {
+                    'state': health.state,
+                    'calls': health.calls,
+                    'failures': health.failures,
+                    'error_rate': round(health.error_rate(), 3),
+                    'p50_seconds': health.latency_percentile(0.5),
+                    'p95_seconds': health.latency_percentile(0.95)
+                }
+                for name, health in self._health.items()
+            }
+            stats['_hedges'] = {'fired': self.hedges_fired, 'won': self.hedges_won}
+            return stats
+
+
+def hedge_mode() -> str:
+    """Get the configured hedging mode ('off', 'interactive' or 'all')."""
+    return os.getenv('GEMINI_HEDGE', 'off').lower()
+
+
+_routers: Dict[Tuple[str, str], ModelRouter] = {}
+_routers_lock = threading.Lock()
+
+def get_model_router(api_key: str) -> ModelRouter:
+    """
+    Get the process-wide router for the current backend and API key.
+
+    Args:
+        api_key: Google API key the models are configured for
+
+    Returns:
+        Router over the models the registry verified for the key, created on
+        first use
+    """
+    from .model_registry import get_model_registry
+
+    backend = get_backend()
+    key = (backend.name, api_key)
+    with _routers_lock:
+        router = _routers.get(key)
+        if router is None:
+            router = ModelRouter(get_model_registry().verified_models(api_key), backend)
+            _routers[key] = router
+        return router
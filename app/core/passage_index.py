@@ -0,0 +1,144 @@
+"""
+Passage Index Module
+In-memory BM25 index over document passages for query-driven prompt excerpts
+"""
+
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Tuple
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+SENTENCE_END_PATTERN = re.compile(r"(?<=[.!?])\s+")
+
+class PassageIndex:
+    """
+    BM25 index over the paragraphs of one document.
+
+    Paragraphs longer than max_passage_chars are split into groups of whole
+    sentences so a single long block cannot crowd out every other passage.
+    """
+
+    def __init__(self, text: str, max_passage_chars: int = 800, k1: float = 1.5, b: float = 0.75):
+        """
+        Build the index.
+
+        Args:
+            text: Extracted document text
+            max_passage_chars: Target maximum passage size in characters
+            k1: BM25 term frequency saturation
+            b: BM25 length normalization
+        """
+        self.text = text
+        self.k1 = k1
+        self.b = b
+        self.passages = self._split_passages(text, max_passage_chars)
+
+        self._term_freqs: List[Counter] = []
+        self._lengths: List[int] = []
+        document_freqs: Counter = Counter()
+        for passage in self.passages:
+            freqs = Counter(TOKEN_PATTERN.findall(passage.lower()))
+            self._term_freqs.append(freqs)
+            self._lengths.append(sum(freqs.values()))
+            document_freqs.update(freqs.keys())
+
+        count = len(self.passages)
+        self._avg_length = (sum(self._lengths) / count) if count else 0.0
+        self._idf: Dict[str, float] = {
+            term: math.log(1 + (count - df + 0.5) / (df + 0.5)) for term, df in document_freqs.items()
+        }
+        logger.info(f"Built passage index with {count} passages")
+
+    @staticmethod
+    def _split_passages(text: str, max_passage_chars: int) -> List[str]:
+        """Split text into paragraphs, breaking long paragraphs at sentence boundaries."""
+        passages = []
+        for paragraph in re.split(r"\n\s*\n", text):
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+            if len(paragraph) <= max_passage_chars:
+                passages.append(paragraph)
+                continue
+
+            current = ""
+            for sentence in SENTENCE_END_PATTERN.split(paragraph):
+                if current and len(current) + len(sentence) + 1 > max_passage_chars:
+                    passages.append(current)
+                    current = sentence
+                else:
+                    current = f"{current} {sentence}" if current else sentence
+            if current:
+                passages.append(current)
+        return passages
+
+    def search(self, query_terms: List[str], top_k: int = 10) -> List[Tuple[int, float]]:
+        """
+        Rank passages against a query.
+
+        Args:
+            query_terms: Query words or phrases
+            top_k: Maximum number of results
+
+        Returns:
+            List of (passage position, score) with positive scores, best first
+        """
+        query = Counter(TOKEN_PATTERN.findall(" ".join(query_terms).lower()))
+        scores = []
+        for position, freqs in enumerate(self._term_freqs):
+            norm = self.k1 * (1 - self.b + self.b * self._lengths[position] / (self._avg_length or 1))
+            score = 0.0
+            for term, weight in query.items():
+                tf = freqs.get(term)
+                if tf:
+                    score += weight * self._idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            if score > 0:
+                scores.append((position, score))
+
+        scores.sort(key=lambda item: item[1], reverse=True)
+        return scores[:top_k]
+
+    def select_excerpt(self, query_terms: List[str], char_budget: int, include_opening: bool = True) -> str:
+        """
+        Assemble the most relevant passages into an excerpt of at most char_budget characters.
+
+        Passages are chosen by score and then emitted in document order. The
+        opening passage (title/abstract) is kept for orientation when requested,
+        and budget left after the matching passages is filled from the start
+        of the document.
+
+        Args:
+            query_terms: Query words or phrases for the section
+            char_budget: Maximum excerpt size in characters
+            include_opening: Always start with the document's first passage
+
+        Returns:
+            Excerpt text; the document prefix if nothing matches the query
+        """
+        separator = "\n...\n"
+        ranked = self.search(query_terms, top_k=len(self.passages))
+        if not ranked:
+            return self.text[:char_budget]
+
+        chosen = set()
+        used = 0
+        candidates = ([0] if include_opening and self.passages else []) + [position for position, _ in ranked]
+        candidates += range(len(self.passages))
+        for position in candidates:
+            if position in chosen:
+                continue
+            cost = len(self.passages[position]) + (len(separator) if chosen else 0)
+            if used + cost > char_budget:
+                continue
+            chosen.add(position)
+            used += cost
+
+        if not chosen:
+            return self.text[:char_budget]
+        return separator.join(self.passages[position] for position in sorted(chosen))
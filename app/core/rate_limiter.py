@@ -0,0 +1,229 @@
+"""
+Rate Limiting Module
+Process-wide token-bucket limiter and quota scheduler for Gemini API calls
+"""
+
+import asyncio
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional
+import logging
+
+from .token_accounting import get_token_estimator
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class DailyQuotaExceeded(Exception):
+    """Raised when the configured requests-per-day budget is used up."""
+
+
+class TokenBucket:
+    """
+    Token bucket that hands out reservations instead of blocking.
+
+    A reservation may drive the level negative; the caller then waits until
+    the bucket has refilled to zero. Because reservations are taken in order
+    under the limiter lock, callers are served first come, first served.
+    """
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        """
+        Initialize a full bucket.
+
+        Args:
+            capacity: Maximum burst size
+            refill_per_second: Steady-state refill rate
+        """
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, amount: float, now: float) -> float:
+        """
+        Take an amount from the bucket.
+
+        Args:
+            amount: Units to consume (clamped to the bucket capacity)
+            now: Current monotonic time
+
+        Returns:
+            Seconds the caller must wait before using the reservation
+        """
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.refill_per_second)
+        self.updated = now
+        self.level -= min(amount, self.capacity)
+        return 0.0 if self.level >= 0 else -self.level / self.refill_per_second
+
+
+class RateLimiter:
+    """
+    Shared limiter covering requests per minute, tokens per minute and
+    requests per day for every Gemini call in the process.
+
+    Callers reserve capacity up front and sleep only for their own share of
+    the wait, so concurrent sessions queue fairly instead of all sleeping
+    blindly and then retrying into a wall of 429s.
+    """
+
+    def __init__(self, requests_per_minute: Optional[int] = None, tokens_per_minute: Optional[int] = None,
+                 requests_per_day: Optional[int] = None):
+        """
+        Initialize the limiter. A limit of 0 disables that dimension.
+
+        Args:
+            requests_per_minute: Defaults to GEMINI_RPM
+            tokens_per_minute: Defaults to GEMINI_TPM
+            requests_per_day: Defaults to GEMINI_RPD (counted per UTC day)
+        """
+        if requests_per_minute is None:
+            requests_per_minute = int(os.getenv('GEMINI_RPM', '15'))
+        if tokens_per_minute is None:
+            tokens_per_minute = int(os.getenv('GEMINI_TPM', '1000000'))
+        if requests_per_day is None:
+            requests_per_day = int(os.getenv('GEMINI_RPD', '1500'))
+
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.requests_per_day = requests_per_day
+
+        self._lock = threading.Lock()
+        self._request_bucket = TokenBucket(requests_per_minute, requests_per_minute / 60) if requests_per_minute else None
+        self._token_bucket = TokenBucket(tokens_per_minute, tokens_per_minute / 60) if tokens_per_minute else None
+        self._blocked_until = 0.0
+        self._day = self._utc_day()
+        self._day_count = 0
+
+        self.total_requests = 0
+        self.total_tokens = 0
+        self.total_wait_seconds = 0.0
+
+    @staticmethod
+    def _utc_day() -> str:
+        return datetime.now(timezone.utc).strftime('%Y-%m-%d')
+
+    def reserve(self, tokens: int = 0) -> float:
+        """
+        Reserve capacity for one request without sleeping.
+
+        Args:
+            tokens: Estimated tokens the request will consume
+
+        Returns:
+            Seconds the caller must wait before sending the request
+
+        Raises:
+            DailyQuotaExceeded: If the requests-per-day budget is exhausted
+        """
+        with self._lock:
+            today = self._utc_day()
+            if today != self._day:
+                self._day, self._day_count = today, 0
+            if self.requests_per_day and self._day_count >= self.requests_per_day:
+                raise DailyQuotaExceeded(
+                    f"Daily request quota exceeded ({self.requests_per_day} requests per day)"
+                )
+            self._day_count += 1
+
+            now = time.monotonic()
+            wait = max(0.0, self._blocked_until - now)
+            if self._request_bucket:
+                wait = max(wait, self._request_bucket.reserve(1, now))
+            if self._token_bucket and tokens:
+                wait = max(wait, self._token_bucket.reserve(tokens, now))
+
+            self.total_requests += 1
+            self.total_tokens += tokens
+            self.total_wait_seconds += wait
+            return wait
+
+    def acquire(self, tokens: int = 0) -> float:
+        """
+        Block until one request with the given token estimate may be sent.
+
+        Args:
+            tokens: Estimated tokens the request will consume
+
+        Returns:
+            Seconds spent waiting
+        """
+        wait = self.reserve(tokens)
+        if wait > 0:
+            logger.info(f"⏳ Rate limiter queued request for {wait:.1f}s")
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, tokens: int = 0) -> float:
+        """
+        Async variant of acquire that waits without blocking the event loop.
+
+        Args:
+            tokens: Estimated tokens the request will consume
+
+        Returns:
+            Seconds spent waiting
+        """
+        wait = self.reserve(tokens)
+        if wait > 0:
+            logger.info(f"⏳ Rate limiter queued request for {wait:.1f}s")
+            await asyncio.sleep(wait)
+        return wait
+
+    def backoff(self, seconds: float) -> None:
+        """
+        Pause all callers after the server reported rate limiting.
+
+        Args:
+            seconds: How long no new request should be released
+        """
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+        logger.warning(f"Rate limiter paused all Gemini calls for {seconds:.0f}s")
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Get limiter counters for this process.
+
+        Returns:
+            Dictionary with totals, today's request count and configured limits
+        """
+        with self._lock:
+            return {
+                'total_requests': self.total_requests,
+                'total_tokens': self.total_tokens,
+                'total_wait_seconds': round(self.total_wait_seconds, 2),
+                'requests_today': self._day_count,
+                'requests_per_minute': self.requests_per_minute,
+                'tokens_per_minute': self.tokens_per_minute,
+                'requests_per_day': self.requests_per_day
+            }
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Fast local token estimate for rate limiting and pre-flight checks,
+    calibrated against the token counts the API reports.
+
+    Args:
+        text: Prompt text
+
+    Returns:
+        Estimated token count
+    """
+    return get_token_estimator().estimate(text)
+
+
+_shared_limiter: Optional[RateLimiter] = None
+_shared_limiter_lock = threading.Lock()
+
+def get_rate_limiter() -> RateLimiter:
+    """Get the process-wide rate limiter, creating it from the environment on first use."""
+    global _shared_limiter
+    with _shared_limiter_lock:
+        if _shared_limiter is None:
+            _shared_limiter = RateLimiter()
+        return _shared_limiter
@@ -0,0 +1,220 @@
+"""
+LLM Response Cache Module
+Persistent, content-addressed cache for Gemini responses backed by SQLite
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Any
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class ResponseCache:
+    """
+    Disk-backed cache of model responses keyed by a hash of
+    (model name, prompt, generation config).
+
+    Entries are evicted least-recently-used first once the stored text exceeds
+    the size limit, and optionally expire after a time-to-live. Every operation
+    opens its own SQLite connection so the cache can be shared by threads,
+    Streamlit sessions and separate processes.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_size_mb: Optional[float] = None,
+                 ttl_seconds: Optional[int] = None):
+        """
+        Initialize the response cache.
+
+        Args:
+            path: SQLite database file (defaults to GEMINI_CACHE_PATH)
+            max_size_mb: Maximum size of cached text in MB (defaults to GEMINI_CACHE_MAX_MB)
+            ttl_seconds: Entry lifetime in seconds, 0 for no expiry (defaults to GEMINI_CACHE_TTL)
+        """
+        self.path = path or os.getenv('GEMINI_CACHE_PATH', '.cache/gemini_responses.db')
+        if max_size_mb is None:
+            max_size_mb = float(os.getenv('GEMINI_CACHE_MAX_MB', '100'))
+        if ttl_seconds is None:
+            ttl_seconds = int(os.getenv('GEMINI_CACHE_TTL', '0'))
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.ttl_seconds = ttl_seconds
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Open a short-lived connection that waits on locks held by other sessions or processes."""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def make_key(model_name: str, prompt: str, generation_config: Dict[str, Any]) -> str:
+        """
+        Build the content address for a request.
+
+        Args:
+            model_name: Resolved model name
+            prompt: Prompt text
+            generation_config: Generation configuration sent with the prompt
+
+        Returns:
+            SHA-256 hex digest identifying the request
+        """
+        payload = json.dumps(
+            {'model': model_name, 'prompt': prompt, 'config': generation_config},
+            sort_keys=True, ensure_ascii=False, default=str
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a cached response and mark it as recently used.
+
+        Args:
+            key: Key from make_key
+
+        Returns:
+            Cached response text, or None on a miss or expired entry
+        """
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+
+                if row and self.ttl_seconds and now - row[1] > self.ttl_seconds:
+                    conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    row = None
+                elif row:
+                    conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        except sqlite3.Error as e:
+            logger.warning(f"Response cache lookup failed: {e}")
+            row = None
+
+        with self._lock:
+            if row:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return row[0] if row else None
+
+    def set(self, key: str, value: str) -> None:
+        """
+        Store a response and evict least-recently-used entries beyond the size limit.
+
+        Args:
+            key: Key from make_key
+            value: Successful response text
+        """
+        now = time.time()
+        size = len(value.encode('utf-8'))
+        evicted = 0
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, size, created_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, value, size, now, now)
+                )
+
+                total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+                if total > self.max_size_bytes:
+                    for old_key, old_size in conn.execute(
+                        "SELECT key, size FROM responses WHERE key != ? ORDER BY accessed_at", (key,)
+                    ).fetchall():
+                        if total <= self.max_size_bytes:
+                            break
+                        conn.execute("DELETE FROM responses WHERE key = ?", (old_key,))
+                        total -= old_size
+                        evicted += 1
+        except sqlite3.Error as e:
+            logger.warning(f"Response cache write failed: {e}")
+
+        if evicted:
+            with self._lock:
+                self.evictions += evicted
+            logger.info(f"Response cache evicted {evicted} entries")
+
+    def clear(self) -> None:
+        """Remove every cached response."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM responses")
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get cache counters for this process and the current on-disk footprint.
+
+        Returns:
+            Dictionary with hits, misses, evictions, entries and size in bytes
+        """
+        try:
+            with self._connect() as conn:
+                entries, size = conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+                ).fetchone()
+        except sqlite3.Error:
+            entries, size = 0, 0
+
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': entries,
+                'size_bytes': size
+            }
+
+
+_shared_cache: Optional[ResponseCache] = None
+_shared_cache_lock = threading.Lock()
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """
+    Get the process-wide response cache.
+
+    Returns:
+        Shared ResponseCache, or None when GEMINI_CACHE_ENABLED is false
+        or the cache database cannot be opened
+    """
+    global _shared_cache
+    if os.getenv('GEMINI_CACHE_ENABLED', 'true').lower() not in ('1', 'true', 'yes'):
+        return None
+
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            try:
+                _shared_cache = ResponseCache()
+            except (sqlite3.Error, OSError) as e:
+                logger.warning(f"Response cache disabled: {e}")
+                return None
+        return _shared_cache
@@ -0,0 +1,299 @@
+"""
+Retry Policy Module
+Error classification, server retry delays and full-jitter backoff for every Gemini call
+"""
+
+import asyncio
+import contextvars
+import email.utils
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Iterator, Optional, TypeVar
+import logging
+
+from .rate_limiter import DailyQuotaExceeded
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# Error classes
+RETRYABLE = 'retryable'
+RATE_LIMITED = 'rate_limited'
+TERMINAL = 'terminal'
+
+# HTTP status codes that can never succeed on a retry
+_TERMINAL_CODES = {400, 401, 403, 404, 405, 409, 411, 412, 413, 422}
+# Terminal codes that mean the model, not the request, is the problem
+_MODEL_UNAVAILABLE_CODES = {401, 403, 404}
+_RATE_LIMIT_MARKERS = ('429', 'quota', 'rate limit', 'resource exhausted', 'resource has been exhausted')
+_RETRY_DELAY_PATTERNS = [
+    re.compile(r'retry_delay\s*\{\s*seconds:\s*(\d+)(?:\s*nanos:\s*(\d+))?'),
+    re.compile(r'retry in ([\d.]+)\s*s', re.IGNORECASE),
+]
+
+
+class RetryDeadlineExceeded(Exception):
+    """Raised when a call or run has no time left for another attempt."""
+
+
+def is_model_unavailable(error: BaseException) -> bool:
+    """
+    Whether an error says the model itself cannot serve requests.
+
+    A 404 (model not found or retired) or a 401/403 for the model fails every
+    request sent to it, unlike invalid arguments or safety blocks, which are
+    tied to the one request.
+    """
+    if type(error).__name__ in ('NotFound', 'PermissionDenied', 'Unauthenticated'):
+        return True
+    code = getattr(error, 'code', None)
+    try:
+        return code is not None and int(code) in _MODEL_UNAVAILABLE_CODES
+    except (TypeError, ValueError):
+        return False
+
+
+def classify_error(error: BaseException) -> str:
+    """
+    Decide whether an error is worth retrying.
+
+    Args:
+        error: Exception raised by a model call
+
+    Returns:
+        RATE_LIMITED for quota and 429 responses, TERMINAL for errors that
+        will fail again on the same request (invalid arguments, auth, safety
+        blocks, a spent local daily quota) and RETRYABLE otherwise
+    """
+    if isinstance(error, (DailyQuotaExceeded, RetryDeadlineExceeded)):
+        return TERMINAL
+    # Safety blocks surface as these SDK exceptions or as ValueError from response.text
+    if type(error).__name__ in ('BlockedPromptException', 'StopCandidateException'):
+        return TERMINAL
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return RETRYABLE
+
+    code = getattr(error, 'code', None)
+    try:
+        code = int(code) if code is not None else None
+    except (TypeError, ValueError):
+        code = None
+    if code == 429:
+        return RATE_LIMITED
+    if code in _TERMINAL_CODES:
+        return TERMINAL
+    if code is not None and code >= 500:
+        return RETRYABLE
+
+    # Errors without a status code are judged by their message; "Deadline Exceeded" is not a quota error
+    message = str(error).lower()
+    if any(marker in message for marker in _RATE_LIMIT_MARKERS):
+        return RATE_LIMITED
+    if isinstance(error, (ValueError, TypeError, KeyError)):
+        return TERMINAL
+    if any(marker in message for marker in ('safety', 'blocked', 'invalid argument', 'api key not valid',
+                                            'permission denied', 'unauthenticated')):
+        return TERMINAL
+    return RETRYABLE
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """
+    Extract the delay the server asked for before the next attempt.
+
+    Looks at RetryInfo details of Google API errors, a Retry-After header on
+    the error's HTTP response and "retry in Ns" hints in the message.
+
+    Args:
+        error: Exception raised by a model call
+
+    Returns:
+        Seconds to wait, or None if the server gave no hint
+    """
+    for detail in getattr(error, 'details', None) or []:
+        delay = getattr(detail, 'retry_delay', None)
+        if delay is not None and (getattr(delay, 'seconds', 0) or getattr(delay, 'nanos', 0)):
+            return delay.seconds + delay.nanos / 1e9
+
+    response = getattr(error, 'response', None)
+    header = getattr(response, 'headers', {}).get('Retry-After') if response is not None else None
+    if header:
+        try:
+            return max(0.0, float(header))
+        except ValueError:
+            try:
+                return max(0.0, email.utils.parsedate_to_datetime(header).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+
+    message = str(error)
+    for pattern in _RETRY_DELAY_PATTERNS:
+        match = pattern.search(message)
+        if match:
+            nanos = match.group(2) if match.lastindex and match.lastindex > 1 else None
+            return float(match.group(1)) + (int(nanos) / 1e9 if nanos else 0.0)
+    return None
+
+
+_run_deadline: "contextvars.ContextVar[Optional[float]]" = contextvars.ContextVar('gemini_run_deadline',
+                                                                                   default=None)
+
+def new_run_deadline(seconds: Optional[float] = None) -> Optional[float]:
+    """
+    Compute the deadline of a run starting now.
+
+    Args:
+        seconds: Time the run may take (defaults to GEMINI_RUN_DEADLINE, 0 for none)
+
+    Returns:
+        Absolute monotonic deadline, or None
+    """
+    if seconds is None:
+        seconds = float(os.getenv('GEMINI_RUN_DEADLINE', '600'))
+    return time.monotonic() + seconds if seconds > 0 else None
+
+
+@contextmanager
+def run_deadline(deadline: Optional[float]) -> Iterator[None]:
+    """Bound every call made by the current task and the tasks it starts to a run deadline."""
+    token = _run_deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _run_deadline.reset(token)
+
+
+class RetryPolicy:
+    """
+    How a model call is retried.
+
+    Rate-limited and transient errors are retried with full-jitter
+    exponential backoff (a random wait between zero and the capped
+    exponential delay) or the delay the server asked for; terminal errors
+    fail at once. Every attempt must finish inside the call deadline and the
+    deadline of the run the call belongs to.
+    """
+
+    def __init__(self, max_attempts: Optional[int] = None, base_delay: Optional[float] = None,
+                 max_delay: Optional[float] = None, call_deadline: Optional[float] = None):
+        """
+        Args:
+            max_attempts: Attempts per call including the first (defaults to GEMINI_RETRY_MAX_ATTEMPTS)
+            base_delay: First backoff ceiling in seconds (defaults to GEMINI_RETRY_BASE_DELAY)
+            max_delay: Largest backoff ceiling in seconds (defaults to GEMINI_RETRY_MAX_DELAY)
+            call_deadline: Seconds one call may take across all attempts, 0 for
+                none (defaults to GEMINI_CALL_DEADLINE)
+        """
+        if max_attempts is None:
+            max_attempts = int(os.getenv('GEMINI_RETRY_MAX_ATTEMPTS', '6'))
+        if base_delay is None:
+            base_delay = float(os.getenv('GEMINI_RETRY_BASE_DELAY', '1'))
+        if max_delay is None:
+            max_delay = float(os.getenv('GEMINI_RETRY_MAX_DELAY', '40'))
+        if call_deadline is None:
+            call_deadline = float(os.getenv('GEMINI_CALL_DEADLINE', '180'))
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.call_deadline = call_deadline
+
+    def backoff(self, attempt: int, error: BaseException) -> float:
+        """
+        Delay before the next attempt.
+
+        Args:
+            attempt: Zero-based number of the attempt that failed
+            error: The error it raised
+
+        Returns:
+            Server-requested delay if given, otherwise a full-jitter delay
+        """
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        ceiling = min(self.max_delay, self.base_delay * 2 ** attempt)
+        if classify_error(error) == RATE_LIMITED:
+            # Quotas refill per minute, so never retry a 429 almost immediately
+            ceiling = min(self.max_delay, ceiling * 2)
+        return random.uniform(0, ceiling)
+
+    async def call(self, attempt_call: Callable[[], Awaitable[T]], operation_name: str = "API call",
+                   max_attempts: Optional[int] = None,
+                   on_rate_limited: Optional[Callable[[float], float]] = None) -> T:
+        """
+        Run a call under this policy.
+
+        Args:
+            attempt_call: Factory for one attempt's coroutine
+            operation_name: Name of the operation for logging
+            max_attempts: Overrides the policy's attempt count
+            on_rate_limited: Called with the planned delay after a 429; returns
+                the delay this caller should still sleep (for example 0 when the
+                wait is enforced elsewhere or another model can take the retry)
+
+        Returns:
+            Result of the first successful attempt
+
+        Raises:
+            Exception: The last error once it is terminal, attempts are used up
+                or the deadline leaves no time for another attempt
+        """
+        attempts = max(1, max_attempts or self.max_attempts)
+        deadline = time.monotonic() + self.call_deadline if self.call_deadline > 0 else None
+        run_end = _run_deadline.get()
+        if run_end is not None:
+            deadline = run_end if deadline is None else min(deadline, run_end)
+
+        for attempt in range(attempts):
+            remaining = deadline - time.monotonic() if deadline is not None else None
+            if remaining is not None and remaining <= 0:
+                raise RetryDeadlineExceeded(f"{operation_name} ran out of time after {attempt} attempts")
+            try:
+                if remaining is None:
+                    result = await attempt_call()
+                else:
+                    result = await asyncio.wait_for(attempt_call(), timeout=remaining)
+                if attempt > 0:
+                    logger.info(f"✅ {operation_name} succeeded on attempt {attempt + 1}")
+                return result
+            except asyncio.TimeoutError as e:
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise RetryDeadlineExceeded(f"{operation_name} exceeded its deadline") from e
+                error: BaseException = e
+            except Exception as e:
+                error = e
+
+            error_class = classify_error(error)
+            if error_class == TERMINAL or attempt == attempts - 1:
+                raise error
+
+            delay = self.backoff(attempt, error)
+            if error_class == RATE_LIMITED and on_rate_limited is not None:
+                delay = on_rate_limited(delay)
+            if deadline is not None and time.monotonic() + delay >= deadline:
+                raise error
+            logger.warning(f"🔄 {operation_name} {error_class.replace('_', ' ')} "
+                           f"(attempt {attempt + 1}/{attempts}): {str(error)[:200]}. Retrying in {delay:.1f}s...")
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+        raise RetryDeadlineExceeded(f"{operation_name} failed after {attempts} attempts")
+
+
+_policy: Optional[RetryPolicy] = None
+_policy_lock = threading.Lock()
+
+def get_retry_policy() -> RetryPolicy:
+    """Get the process-wide retry policy, created from the environment on first use."""
+    global _policy
+    with _policy_lock:
+        if _policy is None:
+            _policy = RetryPolicy()
+        return _policy
@@ -0,0 +1,186 @@
+"""
+Single-Flight Module
+Coalesces identical in-flight model requests so every waiter shares one call
+"""
+
+import asyncio
+import threading
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+class _Flight:
+    """One in-flight call and the number of callers still waiting for it."""
+
+    def __init__(self, task: "asyncio.Future[Any]"):
+        self.task = task
+        self.waiters = 0
+
+
+class _StreamFlight:
+    """One in-flight stream whose chunks are replayed to every subscriber."""
+
+    def __init__(self):
+        self.chunks: List[Any] = []
+        self.finished = False
+        self.error: Optional[BaseException] = None
+        self.changed = asyncio.Condition()
+        self.subscribers = 0
+        self.task: Optional["asyncio.Future[None]"] = None
+
+
+class SingleFlight:
+    """
+    Process-wide table of requests currently in flight.
+
+    When several sessions send the same request at the same time (for example
+    a class analyzing one shared handout), the first caller runs it and the
+    others wait for its result instead of sending duplicates. The call is only
+    cancelled once every waiter has gone away. Failures are shared too, so
+    each waiter's own retry policy decides what happens next.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Tuple[asyncio.AbstractEventLoop, str], _Flight] = {}
+        self._streams: Dict[Tuple[asyncio.AbstractEventLoop, str], _StreamFlight] = {}
+        self.executed = 0
+        self.coalesced = 0
+        self.streams_executed = 0
+        self.streams_coalesced = 0
+
+    async def do(self, key: str, call: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """
+        Run a call unless an identical one is already in flight.
+
+        Args:
+            key: Request identity (model, prompt and configuration)
+            call: Factory for the coroutine that performs the request
+
+        Returns:
+            Tuple of the result and whether it was shared from another caller's request
+        """
+        slot = (asyncio.get_running_loop(), key)
+        with self._lock:
+            flight = self._calls.get(slot)
+            shared = flight is not None
+            if shared:
+                self.coalesced += 1
+            else:
+                flight = _Flight(asyncio.ensure_future(call()))
+                flight.task.add_done_callback(lambda _: self._forget(self._calls, slot, flight))
+                self._calls[slot] = flight
+                self.executed += 1
+            flight.waiters += 1
+
+        try:
+            return await asyncio.shield(flight.task), shared
+        except asyncio.CancelledError:
+            self._leave(flight)
+            raise
+
+    async def stream(self, key: str, stream: Callable[[], AsyncIterator[T]]) -> AsyncIterator[Tuple[T, bool]]:
+        """
+        Subscribe to a stream, starting it unless an identical one is already in flight.
+
+        Late subscribers first receive every chunk produced so far, then follow
+        the live stream.
+
+        Args:
+            key: Request identity (model, prompt and configuration)
+            stream: Factory for the async iterator that performs the request
+
+        Yields:
+            Tuples of a chunk and whether the stream was shared from another caller
+        """
+        slot = (asyncio.get_running_loop(), key)
+        with self._lock:
+            flight = self._streams.get(slot)
+            shared = flight is not None
+            if shared:
+                self.streams_coalesced += 1
+            else:
+                flight = _StreamFlight()
+                flight.task = asyncio.ensure_future(self._pump(flight, stream))
+                flight.task.add_done_callback(lambda _: self._forget(self._streams, slot, flight))
+                self._streams[slot] = flight
+                self.streams_executed += 1
+            flight.subscribers += 1
+
+        position = 0
+        try:
+            while True:
+                async with flight.changed:
+                    await flight.changed.wait_for(lambda: flight.finished or len(flight.chunks) > position)
+                    chunks = flight.chunks[position:]
+                    finished, error = flight.finished, flight.error
+                for chunk in chunks:
+                    yield chunk, shared
+                position += len(chunks)
+                if finished and position == len(flight.chunks):
+                    if error is not None:
+                        raise error
+                    return
+        finally:
+            with self._lock:
+                flight.subscribers -= 1
+                abandoned = flight.subscribers == 0 and not flight.finished
+            if abandoned:
+                flight.task.cancel()
+
+    async def _pump(self, flight: _StreamFlight, stream: Callable[[], AsyncIterator[Any]]) -> None:
+        try:
+            async for chunk in stream():
+                async with flight.changed:
+                    flight.chunks.append(chunk)
+                    flight.changed.notify_all()
+        except BaseException as e:
+            flight.error = e if not isinstance(e, asyncio.CancelledError) else None
+            if flight.error is None:
+                raise
+        finally:
+            async with flight.changed:
+                flight.finished = True
+                flight.changed.notify_all()
+
+    def _leave(self, flight: _Flight) -> None:
+        """Drop a cancelled waiter and cancel the call once nobody waits for it."""
+        with self._lock:
+            flight.waiters -= 1
+            abandoned = flight.waiters == 0
+        if abandoned and not flight.task.done():
+            flight.task.cancel()
+
+    def _forget(self, table: Dict[Any, Any], slot: Tuple[asyncio.AbstractEventLoop, str], flight: Any) -> None:
+        with self._lock:
+            if table.get(slot) is flight:
+                del table[slot]
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get coalescing counters for this process.
+
+        Returns:
+            Dictionary with requests and streams executed, coalesced into an
+            in-flight one, and currently in flight
+        """
+        with self._lock:
+            return {
+                'executed': self.executed,
+                'coalesced': self.coalesced,
+                'streams_executed': self.streams_executed,
+                'streams_coalesced': self.streams_coalesced,
+                'in_flight': len(self._calls) + len(self._streams)
+            }
+
+
+_single_flight = SingleFlight()
+
+def get_single_flight() -> SingleFlight:
+    """Get the process-wide single-flight table."""
+    return _single_flight
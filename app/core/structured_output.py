@@ -0,0 +1,255 @@
+"""
+Structured Output Module
+Response schemas, typed records and an incremental JSON parser for flashcards and practice questions
+"""
+
+import json
+from typing import Any, Dict, Iterable, List, Optional
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Gemini response schemas (OpenAPI subset) sent as generation_config['response_schema']
+FLASHCARD_SCHEMA = {
+    'type': 'ARRAY',
+    'items': {
+        'type': 'OBJECT',
+        'properties': {
+            'front': {'type': 'STRING'},
+            'back': {'type': 'STRING'},
+        },
+        'required': ['front', 'back'],
+    },
+}
+
+PRACTICE_QUESTION_SCHEMA = {
+    'type': 'ARRAY',
+    'items': {
+        'type': 'OBJECT',
+        'properties': {
+            'type': {'type': 'STRING', 'format': 'enum', 'enum': ['multiple_choice', 'short_answer', 'essay']},
+            'question': {'type': 'STRING'},
+            'options': {'type': 'ARRAY', 'items': {'type': 'STRING'}},
+            'answer': {'type': 'STRING'},
+            'difficulty': {'type': 'STRING', 'format': 'enum', 'enum': ['basic', 'intermediate', 'advanced']},
+        },
+        'required': ['type', 'question', 'answer'],
+    },
+}
+
+class Flashcard:
+    """One flashcard: a question or term on the front and its answer on the back."""
+
+    def __init__(self, front: str, back: str):
+        self.front = front
+        self.back = back
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> Optional["Flashcard"]:
+        """Build a flashcard from a parsed JSON object, or None if it has no front."""
+        front = str(data.get('front') or '').strip()
+        if not front:
+            return None
+        return cls(front, str(data.get('back') or '').strip())
+
+    def to_dict(self) -> Dict[str, str]:
+        return {'front': self.front, 'back': self.back}
+
+
+class PracticeQuestion:
+    """
+    One practice question.
+
+    'answer' holds the correct option letter for multiple choice questions,
+    the model answer for short answers and the key points for essays.
+    """
+
+    KIND_TITLES = {
+        'multiple_choice': 'MULTIPLE CHOICE QUESTIONS',
+        'short_answer': 'SHORT ANSWER QUESTIONS',
+        'essay': 'ESSAY QUESTIONS'
+    }
+
+    def __init__(self, kind: str, question: str, answer: str, options: Optional[List[str]] = None,
+                 difficulty: str = ''):
+        self.kind = kind
+        self.question = question
+        self.answer = answer
+        self.options = options or []
+        self.difficulty = difficulty
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> Optional["PracticeQuestion"]:
+        """Build a question from a parsed JSON object, or None if it has no question text."""
+        question = str(data.get('question') or '').strip()
+        if not question:
+            return None
+        kind = str(data.get('type') or '').strip().lower().replace(' ', '_')
+        options = [str(option).strip() for option in data.get('options') or [] if str(option).strip()]
+        if kind not in cls.KIND_TITLES:
+            kind = 'multiple_choice' if options else 'short_answer'
+        return cls(kind, question, str(data.get('answer') or '').strip(), options,
+                   str(data.get('difficulty') or '').strip().lower())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'type': self.kind, 'question': self.question, 'options': list(self.options),
+                'answer': self.answer, 'difficulty': self.difficulty}
+
+    def to_markdown(self, number: int) -> str:
+        """Render the question in the numbered layout of the practice question sheet."""
+        lines = [f"{number}. {self.question}"]
+        if self.kind == 'multiple_choice':
+            lines += [f"{chr(ord('A') + index)}) {option}" for index, option in enumerate(self.options)]
+            lines.append(f"**Answer: {self.answer}**")
+        elif self.kind == 'short_answer':
+            lines.append(f"**Model Answer:** {self.answer}")
+        else:
+            lines.append(f"**Key Points:** {self.answer}")
+        return "\n".join(lines)
+
+
+def format_flashcards(cards: Iterable[Flashcard]) -> str:
+    """
+    Render flashcards as plain text for export.
+
+    Args:
+        cards: Parsed flashcards
+
+    Returns:
+        Numbered CARD blocks with front and back
+    """
+    return "".join(f"CARD {number}\nFront: {card.front}\nBack: {card.back}\n\n"
+                   for number, card in enumerate(cards, 1))
+
+
+def format_practice_questions(questions: Iterable[PracticeQuestion]) -> str:
+    """
+    Render practice questions as markdown grouped by question type.
+
+    Args:
+        questions: Parsed practice questions
+
+    Returns:
+        Markdown with a heading per question type and numbered questions
+    """
+    sections = []
+    for kind, title in PracticeQuestion.KIND_TITLES.items():
+        group = [question for question in questions if question.kind == kind]
+        if group:
+            body = "\n\n".join(question.to_markdown(number) for number, question in enumerate(group, 1))
+            sections.append(f"## {title}\n\n{body}")
+    return "\n\n".join(sections)
+
+
+class JsonArrayStreamParser:
+    """
+    Incremental parser for a streamed JSON array of objects.
+
+    Text is fed as it arrives and every top-level object is returned as soon
+    as its closing brace is seen, so records can be shown while the rest of
+    the response is still being written. Anything before the opening bracket
+    (such as a markdown code fence) is skipped, brackets and braces inside
+    strings are ignored, and each character is scanned only once.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._position = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._started = False
+        self._object_start: Optional[int] = None
+        self.finished = False
+        self.skipped = 0
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """
+        Add streamed text.
+
+        Args:
+            chunk: Next piece of the response
+
+        Returns:
+            Objects completed by this chunk, in order
+        """
+        self._buffer += chunk
+        completed = []
+        buffer = self._buffer
+        position = self._position
+        while position < len(buffer) and not self.finished:
+            char = buffer[position]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif not self._started:
+                if char == '[':
+                    self._started = True
+                    self._depth = 1
+            elif char == '"':
+                self._in_string = True
+            elif char in '[{':
+                if self._depth == 1 and char == '{':
+                    self._object_start = position
+                self._depth += 1
+            elif char in ']}':
+                self._depth -= 1
+                if self._depth == 1 and char == '}' and self._object_start is not None:
+                    completed += self._decode(buffer[self._object_start:position + 1])
+                    self._object_start = None
+                elif self._depth == 0:
+                    self.finished = True
+            position += 1
+        self._position = position
+
+        # Drop text that no pending object needs so the buffer stays small
+        keep = self._object_start if self._object_start is not None else self._position
+        if keep > 0:
+            self._buffer = self._buffer[keep:]
+            self._position -= keep
+            if self._object_start is not None:
+                self._object_start = 0
+        return completed
+
+    def _decode(self, text: str) -> List[Dict[str, Any]]:
+        try:
+            value = json.loads(text)
+        except ValueError:
+            self.skipped += 1
+            logger.warning(f"Skipped malformed item in streamed JSON array: {text[:80]}")
+            return []
+        return [value] if isinstance(value, dict) else []
+
+
+def parse_flashcards(text: str) -> List[Flashcard]:
+    """
+    Parse a complete flashcard response.
+
+    Args:
+        text: JSON array of {"front", "back"} objects, possibly wrapped in other text
+
+    Returns:
+        Flashcards in response order (empty if none could be parsed)
+    """
+    cards = (Flashcard.from_dict(item) for item in JsonArrayStreamParser().feed(text))
+    return [card for card in cards if card is not None]
+
+
+def parse_practice_questions(text: str) -> List[PracticeQuestion]:
+    """
+    Parse a complete practice question response.
+
+    Args:
+        text: JSON array of question objects, possibly wrapped in other text
+
+    Returns:
+        Practice questions in response order (empty if none could be parsed)
+    """
+    questions = (PracticeQuestion.from_dict(item) for item in JsonArrayStreamParser().feed(text))
+    return [question for question in questions if question is not None]
@@ -0,0 +1,226 @@
+"""
+Token Accounting Module
+Token estimation, per-run usage ledgers and prompt budgets for Gemini calls
+"""
+
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class TokenEstimator:
+    """
+    Fast local token estimate for pre-flight checks.
+
+    Starts from the usual four characters per token and calibrates itself
+    from the prompt token counts the API reports, so budgets converge on the
+    real tokenizer for the kind of documents this process sees.
+    """
+
+    def __init__(self, chars_per_token: float = 4.0):
+        self.default_chars_per_token = chars_per_token
+        self._lock = threading.Lock()
+        self._observed_chars = 0
+        self._observed_tokens = 0
+
+    @property
+    def chars_per_token(self) -> float:
+        """Calibrated characters per token (the default until enough text was observed)."""
+        with self._lock:
+            if self._observed_tokens < 1000:
+                return self.default_chars_per_token
+            return min(8.0, max(2.0, self._observed_chars / self._observed_tokens))
+
+    def estimate(self, text: str) -> int:
+        """
+        Estimate the tokens in a text.
+
+        Args:
+            text: Prompt or response text
+
+        Returns:
+            Estimated token count (at least 1)
+        """
+        return max(1, round(len(text) / self.chars_per_token))
+
+    def chars_for(self, tokens: int) -> int:
+        """Convert a token allowance into a character budget."""
+        return max(0, int(tokens * self.chars_per_token))
+
+    def observe(self, text_chars: int, actual_tokens: int) -> None:
+        """
+        Calibrate with a prompt whose real token count is known.
+
+        Args:
+            text_chars: Characters in the prompt
+            actual_tokens: prompt_token_count reported by the API
+        """
+        if text_chars <= 0 or actual_tokens <= 0:
+            return
+        with self._lock:
+            self._observed_chars += text_chars
+            self._observed_tokens += actual_tokens
+
+
+_estimator = TokenEstimator()
+
+def get_token_estimator() -> TokenEstimator:
+    """Get the process-wide token estimator."""
+    return _estimator
+
+
+class RunLedger:
+    """
+    Token and latency totals for one analysis run, broken down by section.
+
+    Calls are attributed to the section active in the calling task (see
+    section_scope); calls made outside a section are booked under 'other'.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sections: Dict[str, Dict[str, Any]] = {}
+        self.started = time.time()
+
+    def record(self, section: Optional[str], prompt_tokens: int, output_tokens: int, seconds: float,
+               measured: bool, cached: bool = False, coalesced: bool = False) -> None:
+        """
+        Book one model call.
+
+        Args:
+            section: Section key the call belongs to
+            prompt_tokens: Input tokens (reported or estimated)
+            output_tokens: Output tokens (reported or estimated)
+            seconds: Wall time of the call
+            measured: True if the counts came from the response's usage metadata
+            cached: True if the response came from the response cache
+            coalesced: True if the response was shared from an identical request in flight
+        """
+        with self._lock:
+            totals = self._sections.setdefault(section or 'other', {
+                'calls': 0, 'cached_calls': 0, 'coalesced_calls': 0, 'prompt_tokens': 0, 'output_tokens': 0,
+                'estimated_calls': 0, 'seconds': 0.0
+            })
+            totals['calls'] += 1
+            totals['seconds'] = round(totals['seconds'] + seconds, 3)
+            if coalesced:
+                totals['coalesced_calls'] += 1
+                return
+            if cached:
+                totals['cached_calls'] += 1
+                return
+            totals['prompt_tokens'] += prompt_tokens
+            totals['output_tokens'] += output_tokens
+            if not measured:
+                totals['estimated_calls'] += 1
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Get the run's totals.
+
+        Returns:
+            Dictionary with per-section totals under 'sections' and run-wide
+            'prompt_tokens', 'output_tokens', 'total_tokens', 'calls', 'coalesced_calls'
+            and 'seconds'
+        """
+        with self._lock:
+            sections = {key: dict(value) for key, value in self._sections.items()}
+        prompt_tokens = sum(value['prompt_tokens'] for value in sections.values())
+        output_tokens = sum(value['output_tokens'] for value in sections.values())
+        return {
+            'sections': sections,
+            'prompt_tokens': prompt_tokens,
+            'output_tokens': output_tokens,
+            'total_tokens': prompt_tokens + output_tokens,
+            'calls': sum(value['calls'] for value in sections.values()),
+            'coalesced_calls': sum(value['coalesced_calls'] for value in sections.values()),
+            'seconds': round(time.time() - self.started, 3)
+        }
+
+
+class PromptBudget:
+    """
+    Per-run plan of how many document characters and output tokens each
+    section prompt may use so the run stays inside its token budget.
+    """
+
+    def __init__(self, excerpt_chars: Dict[str, int], output_tokens: Dict[str, int], token_budget: int):
+        self.excerpt_chars = excerpt_chars
+        self.output_tokens = output_tokens
+        self.token_budget = token_budget
+
+
+_current_ledger: "contextvars.ContextVar[Optional[RunLedger]]" = contextvars.ContextVar('gemini_run_ledger',
+                                                                                        default=None)
+_current_budget: "contextvars.ContextVar[Optional[PromptBudget]]" = contextvars.ContextVar('gemini_prompt_budget',
+                                                                                           default=None)
+_current_section: "contextvars.ContextVar[Optional[str]]" = contextvars.ContextVar('gemini_section', default=None)
+
+def current_ledger() -> Optional[RunLedger]:
+    """Get the ledger of the run the current task belongs to."""
+    return _current_ledger.get()
+
+
+def current_budget() -> Optional[PromptBudget]:
+    """Get the prompt budget of the run the current task belongs to."""
+    return _current_budget.get()
+
+
+def current_section() -> Optional[str]:
+    """Get the section the current task is working on."""
+    return _current_section.get()
+
+
+@contextmanager
+def run_scope(ledger: RunLedger, budget: Optional[PromptBudget] = None) -> Iterator[RunLedger]:
+    """Make a ledger and budget current for the calling task and the tasks it starts."""
+    ledger_token = _current_ledger.set(ledger)
+    budget_token = _current_budget.set(budget)
+    try:
+        yield ledger
+    finally:
+        _current_budget.reset(budget_token)
+        _current_ledger.reset(ledger_token)
+
+
+@contextmanager
+def section_scope(section: str) -> Iterator[None]:
+    """Attribute the model calls of the calling task to a section."""
+    token = _current_section.set(section)
+    try:
+        yield
+    finally:
+        _current_section.reset(token)
+
+
+_usage_log_lock = threading.Lock()
+
+def append_usage_log(record: Dict[str, Any]) -> None:
+    """
+    Persist one run's token accounting as a line of JSON.
+
+    The log lives at GEMINI_USAGE_LOG (default .cache/token_usage.jsonl);
+    an empty value disables it.
+
+    Args:
+        record: Run summary to store
+    """
+    path = os.getenv('GEMINI_USAGE_LOG', '.cache/token_usage.jsonl')
+    if not path:
+        return
+    line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+    try:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with _usage_log_lock, open(path, 'a', encoding='utf-8') as f:
+            f.write(line)
+    except OSError as e:
+        logger.warning(f"Could not write token usage log: {e}")
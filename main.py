@@ -6,8 +6,7 @@ Supporting both research analysis and student study tools
 
 import streamlit as st
 import os
-import json
-import re
+import time
 from datetime import datetime
 from pathlib import Path
 from dotenv import load_dotenv
@@ -16,8 +15,11 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # Import custom modules (will be created next)
-from app.core.document_processor import DocumentProcessor
-from app.core.gemini_analyzer import GeminiAnalyzer
+from app.core.backends import get_backend
+from app.core.gemini_analyzer import get_shared_analyzer
+from app.core.job_runner import AnalysisJob, get_job_runner
+from app.core.structured_output import (Flashcard, JsonArrayStreamParser, PracticeQuestion, format_flashcards,
+                                        format_practice_questions)
 from app.utils.helpers import format_analysis_results, create_download_link
 from app.utils.report_generator import AdvancedReportGenerator
 
@@ -385,6 +387,48 @@ st.markdown("""
 </script>
 """, unsafe_allow_html=True)
 
+def sync_analysis_job():
+    """Get a snapshot of this session's analysis job, copying its results into the session once it completes."""
+    job_id = st.session_state.get('analysis_job_id')
+    if not job_id:
+        return None
+    job = get_job_runner().get(job_id)
+    if job is None:
+        del st.session_state['analysis_job_id']
+        return None
+    
+    snapshot = job.snapshot()
+    if snapshot['status'] == 'completed' and st.session_state.get('collected_job_id') != job_id:
+        st.session_state['analysis_results'] = snapshot['results']
+        st.session_state['stream_metrics'] = snapshot['metrics']
+        st.session_state['context_usage'] = snapshot['context_usage']
+        st.session_state['token_usage'] = snapshot['token_usage']
+        st.session_state['analyzed_content'] = job.extracted_text
+        st.session_state['paper_name'] = snapshot['document_name']
+        st.session_state['collected_job_id'] = job_id
+    return snapshot
+
+def render_analysis_job(job):
+    """Show the progress, per-section status and outcome of an analysis job."""
+    status = job['status']
+    if status in AnalysisJob.ACTIVE:
+        st.progress(int(job['progress'] * 100))
+        st.text(job['message'])
+        icons = {'pending': '⏳', 'running': '✍️', 'done': '✅'}
+        for section in job['sections'].values():
+            st.markdown(f"{icons[section['status']]} {section['title']}")
+        if not job['cancel_requested'] and st.button("⏹️ Cancel Analysis", key=f"cancel_{job['job_id']}"):
+            get_job_runner().cancel(job['job_id'])
+            st.rerun()
+    elif status == 'completed':
+        st.markdown('<div class="success-message">✅ Analysis complete! Check the Results tab.</div>', unsafe_allow_html=True)
+    elif status == 'failed':
+        st.error(f"❌ Error during analysis: {job['error']}")
+    elif status == 'cancelled':
+        st.warning("⏹️ Analysis cancelled.")
+    else:
+        st.warning(f"⚠️ {job['message']}. Please analyze the document again.")
+
 def main():
     # Main title with modern styling
     st.markdown('<h1 class="main-title">🎓 Academic AI Assistant</h1>', unsafe_allow_html=True)
@@ -427,10 +471,14 @@ def main():
         # Fall back to environment variable (for local development)
         api_key = os.getenv("GOOGLE_API_KEY")
     
-    if not api_key or api_key == "your_google_api_key_here":
+    # The offline fake backend (GEMINI_BACKEND=fake) needs no key
+    if (not api_key or api_key == "your_google_api_key_here") and get_backend().requires_api_key:
         st.error("⚠️ Please configure your Google API key in Streamlit secrets or .env file")
         st.stop()
     
+    # Reattach to this session's background analysis, collecting its results once it is done
+    analysis_job = sync_analysis_job()
+    
     # Main content area
     # Create main tabs
     tab1, tab2, tab3, tab4, tab5 = st.tabs(["📤 Upload & Analyze", "📊 Results", "🔬 Research Tools", "📚 Study Tools", "ℹ️ About"])
@@ -476,6 +524,11 @@ def main():
             include_summary = st.checkbox("📝 Generate Summary", value=True)
             include_keywords = st.checkbox("🏷️ Extract Keywords", value=True)
             detailed_analysis = st.checkbox("📋 Detailed Analysis", value=False)
+            full_document = st.checkbox(
+                "📚 Analyze Full Document",
+                value=os.getenv('GEMINI_LONG_DOCUMENT', 'false').lower() in ('1', 'true', 'yes'),
+                help="Analyze every part of long documents in parallel and merge the results, instead of only the opening pages"
+            )
             
             # Document-specific options
             if document_type == "🔬 Research Paper":
@@ -566,31 +619,7 @@ def main():
             # Analyze button
             if st.button(button_text.get(document_type, "🚀 Analyze Document"), type="primary", use_container_width=True):
                 try:
-                    # Create progress bar
-                    progress_bar = st.progress(0)
-                    status_text = st.empty()
-                    
-                    # Step 1: Initialize processors
-                    status_text.text("🔧 Initializing AI processors...")
-                    progress_bar.progress(10)
-                    document_processor = DocumentProcessor()
-                    analyzer = GeminiAnalyzer()
-                    
-                    # Step 2: Save uploaded file
-                    status_text.text("💾 Saving uploaded file...")
-                    progress_bar.progress(20)
-                    temp_path = f"uploads/{uploaded_file.name}"
-                    with open(temp_path, "wb") as f:
-                        f.write(uploaded_file.read())
-                    
-                    # Step 3: Extract text from document
-                    status_text.text("📄 Extracting text from document...")
-                    progress_bar.progress(40)
-                    extracted_text = document_processor.extract_text(temp_path)
-                    
-                    # Step 4: Prepare analysis options
-                    status_text.text("⚙️ Configuring analysis options...")
-                    progress_bar.progress(50)
+                    # Prepare analysis options
                     analysis_options = {
                         'document_type': document_type,
                         'summary': include_summary,
@@ -614,37 +643,37 @@ def main():
                         'future_work': include_future_work if 'include_future_work' in locals() else False
                     }
                     
-                    # Step 5: AI Analysis (longest step)
-                    status_text.text("🧠 Analyzing with Google Gemini AI... (this may take a moment)")
-                    progress_bar.progress(60)
-                    analysis_results = analyzer.analyze_paper(extracted_text, analysis_options)
-                    progress_bar.progress(85)
-                    
-                    # Step 6: Store results
-                    status_text.text("💾 Saving analysis results...")
-                    progress_bar.progress(95)
-                    st.session_state['analysis_results'] = analysis_results
-                    st.session_state['analyzed_content'] = extracted_text
-                    st.session_state['paper_name'] = uploaded_file.name
-                    
-                    # Step 7: Clean up
-                    status_text.text("🧹 Cleaning up temporary files...")
-                    progress_bar.progress(100)
-                    os.remove(temp_path)
-                    
-                    # Clear progress indicators
-                    progress_bar.empty()
-                    status_text.empty()
-                    
-                    st.markdown('<div class="success-message">✅ Analysis complete! Check the Results tab.</div>', unsafe_allow_html=True)
+                    # Run the analysis on the background worker pool; this session only keeps the job id,
+                    # so reruns and reconnects reattach to it instead of starting over
+                    runner = get_job_runner()
+                    previous_job_id = st.session_state.get('analysis_job_id')
+                    if previous_job_id:
+                        runner.cancel(previous_job_id)
+                    st.session_state['analysis_job_id'] = runner.submit(
+                        uploaded_file.getvalue(), uploaded_file.name, analysis_options, long_document=full_document
+                    )
                     
                 except Exception as e:
                     st.error(f"❌ Error during analysis: {str(e)}")
+                else:
+                    st.rerun()
+        
+        # Progress of the background analysis, shown on every rerun until it finishes
+        if analysis_job:
+            render_analysis_job(analysis_job)
     
     with tab2:
         st.header("Analysis Results")
         
-        if 'analysis_results' in st.session_state:
+        if analysis_job and analysis_job['status'] in AnalysisJob.ACTIVE:
+            # Each section's text as streamed so far
+            st.markdown(f"### ⏳ Analysis in progress: **{analysis_job['document_name']}**")
+            for section in analysis_job['sections'].values():
+                cursor = " ▌" if section['status'] == 'running' else ""
+                with st.expander(section['title'], expanded=section['status'] != 'pending'):
+                    st.markdown(section['text'] + cursor if section['text'] else "_Waiting..._")
+        
+        elif 'analysis_results' in st.session_state:
             results = st.session_state['analysis_results']
             document_name = st.session_state.get('paper_name', 'Unknown Document')
             document_type = results.get('document_type', 'Unknown Type')
@@ -732,6 +761,47 @@ def main():
                 with st.expander("📋 Detailed Analysis"):
                     st.markdown(results['detailed'])
             
+            # Streaming timings recorded during the last analysis
+            stream_metrics = st.session_state.get('stream_metrics')
+            if stream_metrics:
+                with st.expander("⏱️ Response Timing"):
+                    for section, timing in stream_metrics.items():
+                        if timing.get('time_to_first_token') is not None:
+                            st.markdown(
+                                f"**{section.replace('_', ' ').title()}** — first token after "
+                                f"{timing['time_to_first_token']:.1f}s, complete after {timing.get('total_seconds', 0):.1f}s"
+                            )
+                    
+                    context_usage = st.session_state.get('context_usage')
+                    if context_usage and context_usage.get('mode') == 'local':
+                        st.markdown(
+                            f"**Context cache (local stand-in)** — document resent with {context_usage['prompts']} prompts: "
+                            f"~{context_usage['tokens_sent']:,} input tokens; caching it once would save "
+                            f"~{context_usage['projected_tokens_saved']:,} (projection)"
+                        )
+                    elif context_usage:
+                        st.markdown(
+                            f"**Context cache** — document uploaded once for {context_usage['prompts']} prompts: "
+                            f"~{context_usage['tokens_sent']:,} input tokens instead of "
+                            f"~{context_usage['tokens_without_cache']:,} ({context_usage['tokens_saved']:,} saved)"
+                        )
+                    
+                    token_usage = st.session_state.get('token_usage')
+                    if token_usage and token_usage.get('calls'):
+                        budget = token_usage.get('token_budget')
+                        st.markdown(
+                            f"**Token usage** — {token_usage['total_tokens']:,} tokens in {token_usage['calls']} calls "
+                            f"({token_usage['prompt_tokens']:,} input, {token_usage['output_tokens']:,} output)"
+                            + (f" of a {budget:,} token budget" if budget else "")
+                            + (f"; {token_usage['coalesced_calls']} answers shared with identical requests "
+                               f"from other sessions" if token_usage.get('coalesced_calls') else "")
+                        )
+                        for section, totals in token_usage['sections'].items():
+                            st.markdown(
+                                f"- {section.replace('_', ' ').title()}: {totals['prompt_tokens']:,} in / "
+                                f"{totals['output_tokens']:,} out, {totals['seconds']:.1f}s"
+                            )
+            
             # Export options
             st.subheader("📤 Export Results")
             col1, col2 = st.columns(2)
@@ -770,27 +840,29 @@ def main():
             with col1:
                 if st.button("🔍 Find Related Papers", use_container_width=True):
                     with st.spinner("🔍 Analyzing research landscape..."):
-                        analyzer = GeminiAnalyzer()
+                        analyzer = get_shared_analyzer()
                         related_papers = analyzer.suggest_related_papers(st.session_state.analyzed_content)
                         st.session_state['related_papers'] = related_papers
                 
                 if st.button("❓ Generate Research Questions", use_container_width=True):
                     with st.spinner("❓ Generating research questions..."):
-                        analyzer = GeminiAnalyzer()
+                        analyzer = get_shared_analyzer()
                         research_questions = analyzer.generate_research_questions(st.session_state.analyzed_content)
                         st.session_state['research_questions'] = research_questions
             
             with col2:
                 if st.button("💡 Build New Hypotheses", use_container_width=True):
                     with st.spinner("💡 Building hypotheses..."):
-                        analyzer = GeminiAnalyzer()
-                        hypotheses = analyzer.build_hypotheses(st.session_state.analyzed_content)
+                        analyzer = get_shared_analyzer()
+                        hypotheses = analyzer.build_hypotheses(st.session_state.analyzed_content,
+                                                              st.session_state.analysis_results)
                         st.session_state['hypotheses'] = hypotheses
                 
                 if st.button("📋 Draft Research Proposal", use_container_width=True):
                     with st.spinner("📋 Drafting research proposal..."):
-                        analyzer = GeminiAnalyzer()
-                        proposal = analyzer.generate_research_proposal(st.session_state.analyzed_content)
+                        analyzer = get_shared_analyzer()
+                        proposal = analyzer.generate_research_proposal(st.session_state.analyzed_content,
+                                                                      st.session_state.analysis_results)
                         st.session_state['research_proposal'] = proposal
             
             # Display results
@@ -905,11 +977,28 @@ def main():
                 if st.button("📇 Generate Flashcards", use_container_width=True):
                     with st.spinner("🧠 Creating educational flashcards..."):
                         try:
-                            analyzer = GeminiAnalyzer()
-                            flashcards_result = analyzer.generate_flashcards(analyzed_content)
+                            analyzer = get_shared_analyzer()
                             
-                            st.session_state['study_flashcards'] = flashcards_result
-                            st.success("🎉 Flashcards generated successfully!")
+                            # Show each card as soon as the stream completes it, then let the results section render them
+                            live_flashcards = st.empty()
+                            live_cards = live_flashcards.container()
+                            parser = JsonArrayStreamParser()
+                            flashcards = []
+                            response_text = ""
+                            for chunk in analyzer.stream_flashcards(analyzed_content):
+                                response_text += chunk
+                                for item in parser.feed(chunk):
+                                    card = Flashcard.from_dict(item)
+                                    if card:
+                                        flashcards.append(card)
+                                        live_cards.markdown(f"**Card {len(flashcards)}:** {card.front}")
+                            live_flashcards.empty()
+                            
+                            if flashcards:
+                                st.session_state['study_flashcards'] = flashcards
+                                st.success("🎉 Flashcards generated successfully!")
+                            else:
+                                st.error(response_text or "❌ No flashcards were generated")
                             
                         except Exception as e:
                             st.error(f"❌ Error generating flashcards: {str(e)}")
@@ -917,7 +1006,7 @@ def main():
                 if st.button("❓ Create Practice Questions", use_container_width=True):
                     with st.spinner("📝 Creating practice questions..."):
                         try:
-                            analyzer = GeminiAnalyzer()
+                            analyzer = get_shared_analyzer()
                             
                             # Question type selection
                             question_types = st.multiselect(
@@ -928,11 +1017,25 @@ def main():
                             )
                             
                             if question_types:
-                                questions_result = analyzer.create_practice_questions(
-                                    analyzed_content, question_types
-                                )
-                                st.session_state['study_questions'] = questions_result
-                                st.success("🎯 Practice questions created!")
+                                live_questions = st.empty()
+                                live_items = live_questions.container()
+                                parser = JsonArrayStreamParser()
+                                questions = []
+                                response_text = ""
+                                for chunk in analyzer.stream_practice_questions(analyzed_content, question_types):
+                                    response_text += chunk
+                                    for item in parser.feed(chunk):
+                                        question = PracticeQuestion.from_dict(item)
+                                        if question:
+                                            questions.append(question)
+                                            live_items.markdown(question.to_markdown(len(questions)))
+                                live_questions.empty()
+                                
+                                if questions:
+                                    st.session_state['study_questions'] = questions
+                                    st.success("🎯 Practice questions created!")
+                                else:
+                                    st.error(response_text or "❌ No practice questions were generated")
                             
                         except Exception as e:
                             st.error(f"❌ Error creating questions: {str(e)}")
@@ -941,7 +1044,7 @@ def main():
                 if st.button("📖 Build Study Guide", use_container_width=True):
                     with st.spinner("📚 Building comprehensive study guide..."):
                         try:
-                            analyzer = GeminiAnalyzer()
+                            analyzer = get_shared_analyzer()
                             
                             # Get topic name from user or use filename
                             topic_name = st.text_input(
@@ -950,9 +1053,14 @@ def main():
                                 key="study_guide_topic"
                             ) or material_name
                             
-                            study_guide_result = analyzer.build_study_guide(
-                                analyzed_content, topic_name
-                            )
+                            live_guide = st.empty()
+                            study_guide_result = ""
+                            for chunk in analyzer.stream_study_guide(
+                                analyzed_content, topic_name, prior_results=st.session_state.get('analysis_results')
+                            ):
+                                study_guide_result += chunk
+                                live_guide.markdown(study_guide_result + " ▌")
+                            live_guide.empty()
                             st.session_state['study_guide'] = study_guide_result
                             st.success("📋 Study guide created!")
                             
@@ -962,7 +1070,7 @@ def main():
                 if st.button("📊 Analyze Material", use_container_width=True):
                     with st.spinner("🔍 Analyzing class material..."):
                         try:
-                            analyzer = GeminiAnalyzer()
+                            analyzer = get_shared_analyzer()
                             
                             material_type = st.selectbox(
                                 "Material type:",
@@ -986,45 +1094,27 @@ def main():
             # Flashcards Display
             if 'study_flashcards' in st.session_state:
                 with st.expander("📇 Generated Flashcards", expanded=False):
-                    flashcards_text = st.session_state['study_flashcards']
+                    flashcards = st.session_state['study_flashcards']
                     
-                    try:
-                        # Try to parse JSON flashcards
-                        import json
-                        import re
+                    st.success(f"📊 Generated {len(flashcards)} flashcards")
+                    
+                    # Display flashcards in an interactive format
+                    for i, card in enumerate(flashcards, 1):
+                        col1, col2 = st.columns(2)
+                        with col1:
+                            st.markdown(f"**Card {i} - Front:**")
+                            st.info(card.front)
+                        with col2:
+                            st.markdown(f"**Card {i} - Back:**")
+                            st.success(card.back or 'No back text')
                         
-                        # Extract JSON from response
-                        json_match = re.search(r'\[(.*?)\]', flashcards_text, re.DOTALL)
-                        if json_match:
-                            json_str = '[' + json_match.group(1) + ']'
-                            flashcards = json.loads(json_str)
-                            
-                            st.success(f"📊 Generated {len(flashcards)} flashcards")
-                            
-                            # Display flashcards in an interactive format
-                            for i, card in enumerate(flashcards, 1):
-                                col1, col2 = st.columns(2)
-                                with col1:
-                                    st.markdown(f"**Card {i} - Front:**")
-                                    st.info(card.get('front', 'No front text'))
-                                with col2:
-                                    st.markdown(f"**Card {i} - Back:**")
-                                    st.success(card.get('back', 'No back text'))
-                                
-                                if i < len(flashcards):
-                                    st.markdown("---")
-                        else:
-                            st.markdown("**Raw Flashcards:**")
-                            st.markdown(flashcards_text)
-                            
-                    except Exception as e:
-                        st.markdown("**Generated Flashcards:**")
-                        st.markdown(flashcards_text)
+                        if i < len(flashcards):
+                            st.markdown("---")
             
             # Practice Questions Display
             if 'study_questions' in st.session_state:
                 with st.expander("❓ Practice Questions", expanded=False):
-                    st.markdown(st.session_state['study_questions'])
+                    st.markdown(format_practice_questions(st.session_state['study_questions']))
             
             # Study Guide Display
             if 'study_guide' in st.session_state:
@@ -1055,43 +1145,16 @@ def main():
                         if st.button("📇 Export Flashcards", use_container_width=True):
                             try:
                                 # Create downloadable flashcards text file
-                                flashcards_text = st.session_state['study_flashcards']
+                                formatted_text = f"FLASHCARDS - {material_name}\n"
+                                formatted_text += f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+                                formatted_text += format_flashcards(st.session_state['study_flashcards'])
                                 
-                                # Try to format as structured text
-                                try:
-                                    json_match = re.search(r'\[(.*?)\]', flashcards_text, re.DOTALL)
-                                    if json_match:
-                                        json_str = '[' + json_match.group(1) + ']'
-                                        flashcards = json.loads(json_str)
-                                        
-                                        formatted_text = f"FLASHCARDS - {material_name}\n"
-                                        formatted_text += f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
-                                        
-                                        for i, card in enumerate(flashcards, 1):
-                                            formatted_text += f"CARD {i}\n"
-                                            formatted_text += f"Front: {card.get('front', '')}\n"
-                                            formatted_text += f"Back: {card.get('back', '')}\n\n"
-                                        
-                                        st.download_button(
-                                            label="💾 Download Flashcards.txt",
-                                            data=formatted_text,
-                                            file_name=f"flashcards_{material_name.replace('.pdf', '')}.txt",
-                                            mime="text/plain"
-                                        )
-                                    else:
-                                        st.download_button(
-                                            label="💾 Download Flashcards.txt",
-                                            data=flashcards_text,
-                                            file_name=f"flashcards_{material_name.replace('.pdf', '')}.txt",
-                                            mime="text/plain"
-                                        )
-                                except:
-                                    st.download_button(
-                                        label="💾 Download Flashcards.txt",
-                                        data=flashcards_text,
-                                        file_name=f"flashcards_{material_name.replace('.pdf', '')}.txt",
-                                        mime="text/plain"
-                                    )
+                                st.download_button(
+                                    label="💾 Download Flashcards.txt",
+                                    data=formatted_text,
+                                    file_name=f"flashcards_{material_name.replace('.pdf', '')}.txt",
+                                    mime="text/plain"
+                                )
                                 
                             except Exception as e:
                                 st.error(f"❌ Export error: {str(e)}")
@@ -1100,7 +1163,7 @@ def main():
                     if 'study_questions' in st.session_state:
                         if st.button("❓ Export Questions", use_container_width=True):
                             try:
-                                questions_text = st.session_state['study_questions']
+                                questions_text = format_practice_questions(st.session_state['study_questions'])
                                 formatted_questions = f"PRACTICE QUESTIONS - {material_name}\n"
                                 formatted_questions += f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
                                 formatted_questions += questions_text
@@ -1144,11 +1207,11 @@ def main():
                         
                         if 'study_flashcards' in st.session_state:
                             combined_content += "FLASHCARDS\n" + "=" * 20 + "\n"
-                            combined_content += st.session_state['study_flashcards'] + "\n\n"
+                            combined_content += format_flashcards(st.session_state['study_flashcards'])
                         
                         if 'study_questions' in st.session_state:
                             combined_content += "PRACTICE QUESTIONS\n" + "=" * 20 + "\n"
-                            combined_content += st.session_state['study_questions'] + "\n\n"
+                            combined_content += format_practice_questions(st.session_state['study_questions']) + "\n\n"
                         
                         if 'study_guide' in st.session_state:
                             combined_content += "STUDY GUIDE\n" + "=" * 20 + "\n"
@@ -1230,6 +1293,11 @@ def main():
         - **Environment**: Python 3.13, python-dotenv for configuration
         - **Optional APIs**: FastAPI, Uvicorn for REST capabilities
         """)
+    
+    # Keep polling while the analysis runs so progress and streamed text stay current
+    if analysis_job and analysis_job['status'] in AnalysisJob.ACTIVE:
+        time.sleep(1)
+        st.rerun()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
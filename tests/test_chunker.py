@@ -0,0 +1,87 @@
+"""Behaviour of the linear-time chunker."""
+
+import random
+
+import pytest
+
+from app.core.chunker import TextChunker
+
+
+def _random_text(rng, size):
+    pieces = ["word", "sentence.", "end!", "\n", "\n\n", "   ", "x" * 300, "| 0.31 | 0.29 |"]
+    parts = []
+    while sum(len(part) for part in parts) < size:
+        parts.append(rng.choice(pieces))
+        parts.append(" ")
+    return "".join(parts)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_chunks_are_bounded_ordered_trimmed_spans(seed):
+    rng = random.Random(seed)
+    text = _random_text(rng, rng.randint(1, 20000))
+    chunker = TextChunker(max_chars=rng.randint(50, 2000))
+
+    chunks = chunker.chunk(text)
+    for number, chunk in enumerate(chunks):
+        assert chunk.index == number
+        assert 0 < len(chunk) <= chunker.max_chars
+        span = chunk.text_of(text)
+        assert span == text[chunk.start:chunk.end] == span.strip()
+    # Without overlap, chunks never overlap and only whitespace falls between them
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert previous.end <= chunk.start
+        assert not text[previous.end:chunk.start].strip()
+    assert "".join(text.split()) == "".join("".join(chunk.text_of(text).split()) for chunk in chunks)
+
+
+def test_prefers_paragraph_then_sentence_boundaries():
+    text = "First paragraph here.\n\nSecond one follows. It has two sentences."
+    chunks = TextChunker(max_chars=40).split(text)
+    assert chunks[0] == "First paragraph here."
+    assert chunks[1].startswith("Second one follows.")
+
+
+def test_text_without_whitespace_is_cut_at_the_budget():
+    assert TextChunker(max_chars=100).split("x" * 1000) == ["x" * 100] * 10
+
+
+def test_whitespace_only_text_has_no_chunks():
+    assert TextChunker(max_chars=10).chunk(" \n\n \t " * 10) == []
+
+
+def test_overlap_repeats_the_end_of_the_previous_chunk():
+    text = " ".join(f"w{number}" for number in range(400))
+    chunks = TextChunker(max_chars=200, overlap_chars=40).chunk(text)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert previous.end - 40 <= chunk.start < previous.end
+        # Overlaps start on a word, not inside one
+        assert text[chunk.start - 1] == " "
+
+
+def test_overlap_is_capped_at_a_quarter_of_the_budget():
+    assert TextChunker(max_chars=100, overlap_chars=90).overlap_chars == 25
+
+
+def test_chunks_report_the_pages_they_cover():
+    pages = ["a" * 50, "b" * 50, "c" * 50]
+    text = "\n\n".join(pages)
+    offsets = [0, 52, 104]
+    chunks = TextChunker(max_chars=60).chunk(text, offsets)
+    for chunk in chunks:
+        covered = {text[position] for position in range(chunk.start, chunk.end) if not text[position].isspace()}
+        assert {"abc"[page] for page in range(chunk.first_page, chunk.last_page + 1)} >= covered
+        assert chunk.page == chunk.first_page
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_streamed_chunks_match_chunks_of_the_joined_pages(seed):
+    rng = random.Random(seed)
+    pages = [_random_text(rng, rng.randint(0, 3000)) for _ in range(rng.randint(1, 8))]
+    chunker = TextChunker(max_chars=rng.randint(100, 1500), overlap_chars=rng.randint(0, 200))
+    text = "\n\n".join(pages)
+
+    streamed = list(chunker.iter_chunks(iter(pages)))
+    expected = chunker.chunk(text)
+    assert [(chunk.start, chunk.end) for chunk in streamed] == [(chunk.start, chunk.end) for chunk in expected]
+    assert all(chunk.text == text[chunk.start:chunk.end] for chunk in streamed)
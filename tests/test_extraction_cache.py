@@ -0,0 +1,101 @@
+"""Document model and the content-addressed extraction cache."""
+
+import sqlite3
+
+import pytest
+
+from app.core.document_processor import DocumentProcessor
+from app.core.extraction_cache import ExtractedDocument, ExtractionCache
+
+PAPER_PAGES = [
+    "Abstract\nWe study retention. See Figure 1 and Table 2.",
+    "Introduction\nPrior work [1] exists.\n\nMethods\nWe measured recall [2, 3].",
+    "Results\nRetention improved (Fig. 3).\n\nReferences\n[1] A. Author. 2020.",
+]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ExtractionCache(str(tmp_path / "extractions.db"), max_size_mb=1)
+
+
+def test_pages_are_joined_with_their_offsets():
+    document = ExtractedDocument.from_pages(["  first", "second", "third  "], '.txt')
+    assert document.text == "first\n\nsecond\n\nthird"
+    assert document.page_count == 3
+    assert document.pages == ["first", "second", "third"]
+
+
+def test_sections_and_statistics_are_computed_with_the_document():
+    document = ExtractedDocument.from_pages(PAPER_PAGES, '.pdf')
+    assert document.section_text('abstract') == "We study retention. See Figure 1 and Table 2."
+    assert document.section_text('methods') == "We measured recall [2, 3]."
+    assert document.section_text('discussion') is None
+    stats = document.stats()
+    assert stats['page_count'] == 3
+    assert stats['reference_count'] == 3
+    assert stats['figure_mention_count'] == 2
+    assert stats['table_mention_count'] == 1
+
+
+def test_round_trip_keeps_the_whole_document(cache):
+    document = ExtractedDocument.from_pages(PAPER_PAGES, '.pdf', {'title': 'Retention'}, [[1, 'Abstract', 1]])
+    cache.set('key', document)
+    cached = cache.get('key')
+    assert cached.to_dict() == document.to_dict()
+    assert cache.stats()['hits'] == 1
+
+
+def test_miss_returns_none(cache):
+    assert cache.get('unknown') is None
+    assert cache.stats()['misses'] == 1
+
+
+def test_least_recently_used_documents_are_evicted(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "small.db"), max_size_mb=0.001)  # about 1 KB
+    for key in ('a', 'b', 'c'):
+        cache.set(key, ExtractedDocument.from_pages([key * 400]))
+        if key == 'b':
+            cache.get('a')
+    assert cache.get('b') is None
+    assert cache.get('c') is not None
+    assert cache.stats()['evictions'] >= 1
+
+
+def test_documents_larger_than_the_cache_are_not_stored(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "small.db"), max_size_mb=0.001)
+    cache.set('big', ExtractedDocument.from_pages(["x" * 5000]))
+    assert cache.get('big') is None
+
+
+def test_databases_without_details_are_migrated(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE extractions (key TEXT PRIMARY KEY, text TEXT NOT NULL, page_offsets TEXT NOT NULL, "
+                 "file_type TEXT NOT NULL, size INTEGER NOT NULL, created_at REAL NOT NULL, "
+                 "accessed_at REAL NOT NULL)")
+    conn.execute("INSERT INTO extractions VALUES ('old', 'one\n\ntwo', '[0, 5]', '.txt', 8, 0, 0)")
+    conn.commit()
+    conn.close()
+
+    cache = ExtractionCache(path)
+    old = cache.get('old')
+    assert old.pages == ["one", "two"]
+    assert old.stats()['word_count'] == 2
+
+
+def test_repeated_content_is_extracted_once(cache, monkeypatch):
+    monkeypatch.setenv('EXTRACTION_CACHE_ENABLED', 'false')
+    processor = DocumentProcessor()
+    processor.cache = cache
+    data = "\n\n".join(PAPER_PAGES).encode('utf-8')
+    first = processor.extract_document('paper.txt', data)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("cached content was extracted again")
+
+    monkeypatch.setattr(processor, 'iter_pages', fail)
+    assert processor.extract_document('renamed.txt', data).to_dict() == first.to_dict()
+    # The key depends on content and extractor, not on the file name
+    assert processor.document_key('a.txt', data) == processor.document_key('b.txt', data)
+    assert processor.document_key('a.txt', data) != processor.document_key('a.txt', data + b"!")
@@ -0,0 +1,55 @@
+"""In-flight accounting and failure injection of the fake backend."""
+
+import asyncio
+import random
+
+import pytest
+
+from app.core.fake_backend import (FakeGenerativeModel, FakeModelProfile, FakeNotFoundError,
+                                   FakeRateLimitError)
+
+
+def make_model(**settings):
+    profile = FakeModelProfile(latency="fixed:0", tokens_per_second=0, **settings)
+    return FakeGenerativeModel("models/fake", profile, random.Random(0))
+
+
+def test_concurrency_limit_rejects_requests_while_a_stream_is_open():
+    model = make_model(max_concurrency=1)
+    stream = model.generate_content("Hello", stream=True)
+    next(stream)
+    with pytest.raises(FakeRateLimitError):
+        model.generate_content("Hello")
+    list(stream)
+    assert model.generate_content("Hello").text == "Hello!"
+
+
+def test_dropped_streams_do_not_hold_a_slot():
+    model = make_model(max_concurrency=1)
+    for _ in range(3):
+        model.generate_content("Hello", stream=True)
+        asyncio.run(model.generate_content_async("Hello", stream=True))
+    assert model._in_flight == 0
+    assert model.generate_content("Hello").text == "Hello!"
+
+
+def test_closed_streams_release_their_slot():
+    model = make_model(max_concurrency=1)
+    stream = model.generate_content("Hello", stream=True)
+    next(stream)
+    stream.close()
+
+    async def partial_async_stream():
+        stream = await model.generate_content_async("Hello", stream=True)
+        await stream.__anext__()
+        await stream.aclose()
+
+    asyncio.run(partial_async_stream())
+    assert model._in_flight == 0
+
+
+def test_unavailable_model_raises_not_found():
+    model = make_model(unavailable=True)
+    with pytest.raises(FakeNotFoundError) as raised:
+        model.generate_content("Hello")
+    assert raised.value.code == 404
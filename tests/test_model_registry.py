@@ -0,0 +1,119 @@
+"""Model resolution and probe sharing of the model registry."""
+
+import threading
+
+import pytest
+
+from app.core import model_registry, rate_limiter
+from app.core.model_registry import ModelRegistry
+from app.core.rate_limiter import RateLimiter
+
+FIRST, SECOND = ModelRegistry.WORKING_MODELS[:2]
+
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubModel:
+    def __init__(self, name, working=True):
+        self.name = name
+        self.working = working
+
+    def generate_content(self, prompt, generation_config=None):
+        if not self.working:
+            raise RuntimeError("404 model not found")
+        return StubResponse("Hello!")
+
+
+class StubBackend:
+    """Backend whose model listing waits for ``release`` so probes can be held open."""
+
+    name = "stub"
+
+    def __init__(self, listed, broken=()):
+        self.listed = listed
+        self.broken = set(broken)
+        self.release = threading.Event()
+        self.release.set()
+        self.listings = 0
+
+    def configure(self, api_key):
+        pass
+
+    def list_models(self):
+        self.listings += 1
+        self.release.wait(5)
+        return list(self.listed)
+
+    def create_model(self, model_name):
+        return StubModel(model_name, model_name not in self.broken)
+
+
+@pytest.fixture(autouse=True)
+def unlimited_requests(monkeypatch):
+    monkeypatch.setattr(rate_limiter, '_shared_limiter', RateLimiter(0, 0, 0))
+
+
+def _use(monkeypatch, backend):
+    monkeypatch.setattr(model_registry, 'get_backend', lambda: backend)
+    return backend
+
+
+def test_first_listed_working_model_is_resolved_with_listed_fallbacks(monkeypatch):
+    _use(monkeypatch, StubBackend([FIRST, SECOND.replace('models/', '')], broken=[FIRST]))
+    registry = ModelRegistry(ttl_seconds=60)
+
+    name, model = registry.resolve("key", FIRST)
+
+    assert name == model.name == SECOND
+    assert registry.verified_models("key") == [SECOND]
+    assert registry.is_valid("key", SECOND)
+
+
+def test_resolved_model_is_reused_until_invalidated(monkeypatch):
+    backend = _use(monkeypatch, StubBackend([FIRST, SECOND]))
+    registry = ModelRegistry(ttl_seconds=60)
+
+    registry.resolve("key", FIRST)
+    registry.resolve("key", FIRST)
+    assert backend.listings == 1
+
+    registry.invalidate(FIRST)
+    assert not registry.is_valid("key", FIRST)
+    registry.resolve("key", FIRST)
+    assert backend.listings == 2
+
+
+def test_concurrent_resolves_share_one_probe_without_blocking_readers(monkeypatch):
+    backend = _use(monkeypatch, StubBackend([FIRST, SECOND]))
+    backend.release.clear()
+    registry = ModelRegistry(ttl_seconds=60)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.resolve("key", FIRST)))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+
+    # Readers answer while the probe is stuck on the network
+    assert not registry.is_valid("key", FIRST)
+    assert registry.verified_models("key") == []
+    registry.invalidate()
+
+    backend.release.set()
+    for thread in threads:
+        thread.join(5)
+    assert backend.listings == 1
+    assert [name for name, _ in results] == [FIRST] * 4
+
+
+def test_failed_probe_is_not_cached(monkeypatch):
+    backend = _use(monkeypatch, StubBackend([FIRST], broken=[FIRST]))
+    registry = ModelRegistry(ttl_seconds=60)
+
+    with pytest.raises(Exception, match="No working model found"):
+        registry.resolve("key", FIRST)
+
+    backend.broken.clear()
+    assert registry.resolve("key", FIRST)[0] == FIRST
@@ -0,0 +1,158 @@
+"""Routing, circuit breakers and hedging of the model router."""
+
+import asyncio
+import time
+
+import pytest
+
+from app.core import rate_limiter
+from app.core.model_router import ModelRouter
+from app.core.rate_limiter import RateLimiter
+
+
+class APIError(Exception):
+    def __init__(self, message, code):
+        super().__init__(message)
+        self.code = code
+
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubModel:
+    """Model that raises queued errors (or always_error), then answers after a delay."""
+
+    def __init__(self, name, errors=(), always_error=None, latency=0.0):
+        self.name = name
+        self.errors = list(errors)
+        self.always_error = always_error
+        self.latency = latency
+        self.calls = 0
+
+    async def generate_content_async(self, prompt, generation_config=None, stream=False):
+        self.calls += 1
+        if self.always_error is not None:
+            raise self.always_error
+        if self.errors:
+            raise self.errors.pop(0)
+        await asyncio.sleep(self.latency)
+        return StubResponse(f"{self.name}: {prompt}")
+
+
+class StubBackend:
+    name = "stub"
+
+    def __init__(self, *models):
+        self.models = {model.name: model for model in models}
+
+    def create_model(self, model_name):
+        return self.models[model_name]
+
+
+@pytest.fixture(autouse=True)
+def router_settings(monkeypatch):
+    monkeypatch.setattr(rate_limiter, '_shared_limiter', RateLimiter(0, 0, 0))
+    monkeypatch.setenv('GEMINI_ROUTER_MIN_SAMPLES', '4')
+    monkeypatch.setenv('GEMINI_ROUTER_ERROR_THRESHOLD', '0.5')
+    monkeypatch.setenv('GEMINI_ROUTER_COOLDOWN', '60')
+
+
+def _router(*models):
+    return ModelRouter([model.name for model in models], StubBackend(*models))
+
+
+def _generate(router, prompt="hi", **kwargs):
+    return asyncio.run(router.generate_async(prompt, **kwargs))
+
+
+def test_calls_go_to_the_preferred_model():
+    router = _router(StubModel("a"), StubModel("b"))
+    assert _generate(router)[0] == "a"
+    assert router.stats()['a']['calls'] == 1
+
+
+def test_rate_limited_model_is_routed_around():
+    primary = StubModel("a", errors=[APIError("Resource has been exhausted", 429)])
+    router = _router(primary, StubModel("b"))
+    with pytest.raises(APIError):
+        _generate(router)
+    assert router.stats()['a']['state'] == 'open'
+    assert _generate(router)[0] == "b"
+
+
+def test_missing_fallback_opens_its_circuit_and_the_prompt_moves_on():
+    primary = StubModel("a", errors=[APIError("Resource has been exhausted", 429)])
+    retired = StubModel("b", always_error=APIError("404 models/b is not found", 404))
+    healthy = StubModel("c")
+    router = _router(primary, retired, healthy)
+    with pytest.raises(APIError):
+        _generate(router)
+
+    assert [_generate(router)[0] for _ in range(3)] == ["c", "c", "c"]
+    assert retired.calls == 1
+    stats = router.stats()
+    assert (stats['b']['state'], stats['b']['failures']) == ('open', 1)
+    assert (stats['c']['calls'], stats['c']['failures']) == (3, 0)
+
+
+def test_error_when_every_model_is_missing():
+    router = _router(StubModel("a", always_error=APIError("not found", 404)),
+                     StubModel("b", always_error=APIError("not found", 404)))
+    with pytest.raises(APIError):
+        _generate(router)
+    assert not router.has_healthy_route()
+
+
+def test_invalid_requests_do_not_count_against_the_model():
+    router = _router(StubModel("a", errors=[APIError("Invalid argument", 400)]), StubModel("b"))
+    with pytest.raises(APIError):
+        _generate(router)
+    stats = router.stats()['a']
+    assert (stats['state'], stats['failures']) == ('closed', 0)
+
+
+def test_deadline_exceeded_is_not_a_rate_limit():
+    router = _router(StubModel("a", errors=[APIError("504 Deadline Exceeded", 504)]), StubModel("b"))
+    with pytest.raises(APIError):
+        _generate(router)
+    stats = router.stats()['a']
+    assert (stats['state'], stats['failures']) == ('closed', 1)
+
+
+def test_high_error_rate_opens_the_circuit():
+    router = _router(StubModel("a", errors=[APIError("Internal error", 500)] * 4), StubModel("b"))
+    for _ in range(4):
+        # Transient errors only open the circuit once GEMINI_ROUTER_MIN_SAMPLES calls were seen
+        assert router.stats().get('a', {}).get('state', 'closed') == 'closed'
+        with pytest.raises(APIError):
+            _generate(router)
+    assert router.stats()['a']['state'] == 'open'
+    assert _generate(router)[0] == "b"
+
+
+def test_open_circuit_allows_one_trial_after_the_cooldown(monkeypatch):
+    monkeypatch.setenv('GEMINI_ROUTER_COOLDOWN', '0.05')
+    router = _router(StubModel("a", errors=[APIError("Resource has been exhausted", 429)]), StubModel("b"))
+    with pytest.raises(APIError):
+        _generate(router)
+    time.sleep(0.06)
+    assert router.route(2) == ["a", "b"]
+    # The trial is in flight, so no second request may use the half-open model
+    assert router.route(1) == ["b"]
+    router.record("a", 0.1)
+    assert router.stats()['a']['state'] == 'closed'
+
+
+def test_register_puts_the_resolved_model_before_its_verified_fallbacks():
+    router = _router(StubModel("a"), StubModel("b"), StubModel("c"))
+    router.register("c", router.model("c"), ["a", "c"])
+    assert router.model_names == ["c", "a"]
+
+
+def test_slow_model_is_hedged(monkeypatch):
+    monkeypatch.setenv('GEMINI_HEDGE_DELAY', '0.01')
+    router = _router(StubModel("a", latency=0.5), StubModel("b"))
+    assert _generate(router, hedge=True)[0] == "b"
+    assert router.stats()['_hedges'] == {'fired': 1, 'won': 1}
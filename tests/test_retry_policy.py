@@ -0,0 +1,148 @@
+"""Error classification, server retry delays and the retry loop."""
+
+import asyncio
+
+import pytest
+
+from app.core.rate_limiter import DailyQuotaExceeded
+from app.core.retry_policy import (RATE_LIMITED, RETRYABLE, TERMINAL, RetryDeadlineExceeded, RetryPolicy,
+                                   classify_error, is_model_unavailable, retry_after_seconds)
+
+
+class APIError(Exception):
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        self.code = code
+
+
+class BlockedPromptException(Exception):
+    pass
+
+
+class NotFound(Exception):
+    pass
+
+
+@pytest.mark.parametrize("error, expected", [
+    (APIError("Resource has been exhausted", 429), RATE_LIMITED),
+    (APIError("429 Quota exceeded for metric"), RATE_LIMITED),
+    (APIError("rate limit reached"), RATE_LIMITED),
+    (APIError("Deadline Exceeded", 504), RETRYABLE),
+    (APIError("504 Deadline Exceeded"), RETRYABLE),
+    (APIError("Internal error", 500), RETRYABLE),
+    (TimeoutError(), RETRYABLE),
+    (ConnectionError("reset"), RETRYABLE),
+    (APIError("Invalid argument", 400), TERMINAL),
+    (APIError("Model not found", 404), TERMINAL),
+    (ValueError("response.text requires a valid Part"), TERMINAL),
+    (BlockedPromptException("blocked"), TERMINAL),
+    (DailyQuotaExceeded("daily quota"), TERMINAL),
+    (RetryDeadlineExceeded("out of time"), TERMINAL),
+])
+def test_classify_error(error, expected):
+    assert classify_error(error) == expected
+
+
+@pytest.mark.parametrize("error, expected", [
+    (APIError("Model not found", 404), True),
+    (APIError("Permission denied", 403), True),
+    (APIError("Unauthenticated", 401), True),
+    (NotFound("models/gemini-1.5-flash-latest is not found"), True),
+    (APIError("Invalid argument", 400), False),
+    (BlockedPromptException("blocked"), False),
+    (APIError("Resource has been exhausted", 429), False),
+])
+def test_is_model_unavailable(error, expected):
+    assert is_model_unavailable(error) is expected
+
+
+def test_retry_after_from_retry_info_details():
+    class Delay:
+        seconds, nanos = 7, 500_000_000
+
+    class Detail:
+        retry_delay = Delay()
+
+    error = APIError("429", 429)
+    error.details = [Detail()]
+    assert retry_after_seconds(error) == 7.5
+
+
+def test_retry_after_from_response_header():
+    class Response:
+        headers = {'Retry-After': '12'}
+
+    error = APIError("429", 429)
+    error.response = Response()
+    assert retry_after_seconds(error) == 12.0
+
+
+def test_retry_after_from_message():
+    assert retry_after_seconds(APIError("Quota exceeded. Please retry in 3.5s.")) == 3.5
+    assert retry_after_seconds(APIError("Internal error")) is None
+
+
+def test_backoff_stays_under_the_ceiling_and_honours_the_server():
+    policy = RetryPolicy(max_attempts=3, base_delay=1, max_delay=10, call_deadline=0)
+    for attempt in range(6):
+        assert 0 <= policy.backoff(attempt, APIError("boom", 500)) <= min(10, 2 ** attempt)
+    assert policy.backoff(0, APIError("Please retry in 4s")) == 4
+    assert policy.backoff(0, APIError("Please retry in 90s")) == 10
+
+
+def _flaky(errors, result="ok"):
+    calls = []
+
+    async def attempt():
+        calls.append(len(calls))
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+
+    return attempt, calls
+
+
+def test_transient_errors_are_retried():
+    policy = RetryPolicy(max_attempts=4, base_delay=0, max_delay=0, call_deadline=0)
+    attempt, calls = _flaky([APIError("boom", 500), TimeoutError()])
+    assert asyncio.run(policy.call(attempt)) == "ok"
+    assert len(calls) == 3
+
+
+def test_terminal_errors_fail_at_once():
+    policy = RetryPolicy(max_attempts=4, base_delay=0, max_delay=0, call_deadline=0)
+    attempt, calls = _flaky([APIError("Invalid argument", 400)])
+    with pytest.raises(APIError):
+        asyncio.run(policy.call(attempt))
+    assert len(calls) == 1
+
+
+def test_last_error_is_raised_when_attempts_run_out():
+    policy = RetryPolicy(max_attempts=2, base_delay=0, max_delay=0, call_deadline=0)
+    attempt, calls = _flaky([APIError("first", 500), APIError("second", 500), APIError("third", 500)])
+    with pytest.raises(APIError, match="second"):
+        asyncio.run(policy.call(attempt))
+    assert len(calls) == 2
+
+
+def test_rate_limit_hook_decides_the_delay():
+    policy = RetryPolicy(max_attempts=3, base_delay=30, max_delay=30, call_deadline=0)
+    delays = []
+
+    def on_rate_limited(delay):
+        delays.append(delay)
+        return 0.0
+
+    attempt, calls = _flaky([APIError("Resource has been exhausted", 429)])
+    assert asyncio.run(policy.call(attempt, on_rate_limited=on_rate_limited)) == "ok"
+    assert len(delays) == 1 and len(calls) == 2
+
+
+def test_call_deadline_stops_slow_attempts():
+    policy = RetryPolicy(max_attempts=5, base_delay=0, max_delay=0, call_deadline=0.05)
+
+    async def attempt():
+        await asyncio.sleep(1)
+
+    with pytest.raises(RetryDeadlineExceeded):
+        asyncio.run(policy.call(attempt))
@@ -0,0 +1,57 @@
+"""Golden outputs and stage selection of the text normalization engine."""
+
+import pytest
+
+from app.core.text_normalizer import STAGES, TextNormalizer
+
+# Inputs and the output of TextNormalizer() with every stage enabled
+GOLDEN_CASES = [
+    ("", ""),
+    ("  Leading and trailing  ", "Leading and trailing"),
+    ("tabs\tand   runs \t of  spaces", "tabs and runs of spaces"),
+    ("line one   \n   line two", "line one\nline two"),
+    ("para one\n\n\n\n  para two\n \n\npara three", "para one\n\npara two\n\npara three"),
+    ("Windows\r\nline endings\r\n\r\nnext", "Windows\nline endings\n\nnext"),
+    ("See Figure1 and Table12.", "See Figure 1 and Table 12."),
+    ("As in Fig.3b, Eq.5 and section2", "As in Fig. 3b, Eq. 5 and section 2"),
+    ("resnet50 and python3 and covid19", "resnet50 and python3 and covid19"),
+    ("In 2020The results changed", "In 2020 The results changed"),
+    ("H2O, CO2, COVID19, mp3, log2 and 3D stay intact", "H2O, CO2, COVID19, mp3, log2 and 3D stay intact"),
+    ("Years 2019-2023 and p<0.05", "Years 2019-2023 and p<0.05"),
+    ("“Quoted” ‘text’ — with dashes – here", "\"Quoted\" 'text' - with dashes - here"),
+    ("eﬃcient ﬁeld deﬂection", "efficient field deflection"),
+    ("soft\u00adhyphen and zero\u200bwidth", "softhyphen and zerowidth"),
+    ("bullets • and ■ boxes", "bullets and boxes"),
+    ("non\u00a0breaking\u2009spaces", "non breaking spaces"),
+    ("naïve café über α-helix", "naïve café über α-helix"),
+    ("email a@b.com, 50% (n=12) [1] {x}", "email a@b.com, 50% (n=12) [1] {x}"),
+    ("under_score and back\\slash | pipe", "under_score and backslash pipe"),
+]
+
+
+@pytest.mark.parametrize("source, expected", GOLDEN_CASES)
+def test_golden_output(source, expected):
+    assert TextNormalizer(STAGES).normalize(source) == expected
+
+
+@pytest.mark.parametrize("source, expected", GOLDEN_CASES)
+def test_ascii_and_unicode_paths_agree(source, expected):
+    # A non-ASCII character that survives cleaning forces the regex path instead of str.translate
+    assert TextNormalizer(STAGES).normalize(source + " é") == (expected + " é").strip()
+
+
+def test_stages_run_independently():
+    text = "See  Figure1 •"
+    assert TextNormalizer(['whitespace']).normalize(text) == "See Figure1 •"
+    assert TextNormalizer(['spacing']).normalize(text) == "See  Figure 1 •"
+    assert TextNormalizer(['artifacts']).normalize(text) == "See  Figure1 "
+
+
+def test_stages_come_from_environment(monkeypatch):
+    monkeypatch.setenv('TEXT_CLEAN_STAGES', 'whitespace, spacing')
+    assert TextNormalizer().stages == ('whitespace', 'spacing')
+
+
+def test_unknown_stage_is_rejected():
+    with pytest.raises(ValueError):
+        TextNormalizer(['whitespace', 'stemming'])